@@ -1,5 +1,7 @@
 from app.config import logger
-from app.extensions import db
+from app.extensions import configure_engine, db
+from app.sql import job_queue, scheduler
+from app.sql.migrations import run_migrations
 from flask_cors import CORS
 
 from flask import Flask
@@ -17,12 +19,16 @@ def create_app():
     db.init_app(app)
 
     with app.app_context():
+        configure_engine(db.engine)
         db.create_all()
+        run_migrations(db.engine)
 
     # Import blueprints from routes/teller.py and charts
     from app.routes.charts import charts
+    from app.routes.jobs import jobs
     from app.routes.plaid_investments import plaid_investments
     from app.routes.plaid_transactions import plaid_transactions
+    from app.routes.plaid_webhooks import plaid_webhooks
     from app.routes.teller_transactions import teller_transactions
 
     # Register blueprints with appropriate URL prefixes
@@ -30,6 +36,12 @@ def create_app():
     app.register_blueprint(teller_transactions, url_prefix="/api/teller/transactions")
     app.register_blueprint(plaid_transactions, url_prefix="/api/plaid/transactions")
     app.register_blueprint(plaid_investments, url_prefix="/api/plaid/investments")
+    app.register_blueprint(plaid_webhooks, url_prefix="/api/plaid/webhooks")
+    app.register_blueprint(jobs, url_prefix="/api/jobs")
+
+    # Start background refresh workers once the job handlers are registered
+    job_queue.init_app(app)
+    scheduler.init_app(app)
 
     logger.debug(
         "Blueprints registered: charts under '/api/charts', teller endpoints under '/api/transactions/teller', plaid transactions under '/api/transactions/plaid' and plaid investments at '/api/investments/plaid'"
@@ -1,3 +1,26 @@
+from app.config import SQLITE_PRAGMAS, logger
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 db = SQLAlchemy()
+
+
+def configure_engine(engine):
+    """
+    Apply SQLITE_PRAGMAS to every connection the engine opens.
+    Engines for other databases are left alone.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = {name: value for name, value in SQLITE_PRAGMAS.items() if value != ""}
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    logger.debug(f"SQLite connection pragmas: {pragmas}")
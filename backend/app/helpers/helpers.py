@@ -41,11 +41,13 @@ def exchange_public_token(public_token: str):
 
     try:
         response = requests.post(url, json=payload, headers=headers)
-        logger.debug(f"Response: {response.status_code} - {response.text}")
+        logger.debug(f"Response: {response.status_code}")
         if response.status_code == 200:
             exchange_data = response.json()
             access_token = exchange_data.get("access_token")
-            logger.info(f"Access token generated: {access_token}")
+            logger.info(
+                f"Access token generated for item {exchange_data.get('item_id')}"
+            )
             return {
                 "access_token": access_token,
                 "item_id": exchange_data.get("item_id"),
@@ -0,0 +1,140 @@
+"""
+Incremental JSON parsing for large provider responses.
+
+Provider transaction payloads are read from the HTTP stream in chunks instead
+of being loaded with resp.json(), so the full body text and its decoded copy
+never sit in memory at once. StreamingJSONParser walks the top level of the
+document itself and hands every element of the selected arrays to the caller
+one at a time; everything else at the top level is decoded normally and kept
+in `fields`.
+"""
+
+import codecs
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_END = re.compile(r"[,\]}\s]")
+
+
+class StreamingJSONParser:
+    """
+    Parse a JSON document from an iterable of byte (or str) chunks.
+
+    A top-level array is streamed element by element (key None). For a
+    top-level object, the arrays under `stream_keys` are streamed and the
+    other members are collected in `fields` once items() is exhausted.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._exhausted = False
+        self.fields = {}
+
+    @classmethod
+    def from_response(cls, resp, chunk_size=CHUNK_SIZE):
+        """
+        Parse a requests response sent with stream=True.
+        """
+        return cls(resp.iter_content(chunk_size=chunk_size))
+
+    def _fill(self):
+        """
+        Read the next chunk into the buffer. Returns False at end of input.
+        """
+        if self._exhausted:
+            return False
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._exhausted = True
+            chunk = self._text_decoder.decode(b"", final=True)
+        else:
+            if isinstance(chunk, bytes):
+                chunk = self._text_decoder.decode(chunk)
+        # Drop what has already been consumed so the buffer stays chunk-sized.
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        """
+        Skip whitespace and return the next character, or None at end of input.
+        """
+        while True:
+            while self._pos < len(self._buffer):
+                char = self._buffer[self._pos]
+                if char not in _WHITESPACE:
+                    return char
+                self._pos += 1
+            if not self._fill():
+                return None
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char is None or char not in chars:
+            raise ValueError(
+                f"Expected one of {chars!r} in JSON stream, found {char!r}"
+            )
+        self._pos += 1
+        return char
+
+    def _value(self):
+        """
+        Decode the next complete JSON value, reading more input as needed.
+        """
+        char = self._peek()
+        if char is not None and (char == "-" or char.isdigit()):
+            # A bare number is only complete once its delimiter has arrived,
+            # otherwise "12" could still turn into "12.5" in the next chunk.
+            while not _NUMBER_END.search(self._buffer, self._pos) and self._fill():
+                pass
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            self._pos = end
+            return value
+
+    def _array(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(",]") == "]":
+                return
+
+    def items(self, stream_keys=()):
+        """
+        Yield (key, element) pairs for every element of the streamed arrays.
+        """
+        if self._peek() == "[":
+            for element in self._array():
+                yield None, element
+            return
+
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key in stream_keys and self._peek() == "[":
+                for element in self._array():
+                    yield key, element
+            else:
+                self.fields[key] = self._value()
+            if self._expect(",}") == "}":
+                return
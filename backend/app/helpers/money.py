@@ -0,0 +1,42 @@
+"""
+Money amounts (balances, transaction amounts) are stored as integer minor
+units, i.e. cents, so sums computed in SQL are exact. In Python they are
+Decimals with two places; they only become floats when serialized to JSON.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+CENT = Decimal("0.01")
+
+
+def to_decimal(value):
+    """
+    Convert a provider or user supplied amount (number or numeric string) to
+    a Decimal rounded to cents. Raises ValueError if it is not a finite number.
+    """
+    if isinstance(value, Decimal):
+        amount = value
+    else:
+        try:
+            # str() first so floats keep their shortest repr (0.1, not 0.1000...)
+            amount = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise ValueError(f"Not a money amount: {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"Not a money amount: {value!r}")
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_minor_units(value):
+    return int(to_decimal(value).scaleb(2))
+
+
+def from_minor_units(units):
+    return Decimal(int(units)).scaleb(-2)
+
+
+def to_json(value):
+    """
+    Serialize an amount as a JSON number; None becomes 0.
+    """
+    return float(value) if value is not None else 0
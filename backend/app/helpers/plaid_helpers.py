@@ -1,5 +1,20 @@
-import requests
-from app.config import PLAID_BASE_URL, PLAID_CLIENT_ID, PLAID_SECRET, logger
+import hashlib
+import hmac
+import time
+
+import jwt
+from app.config import (
+    PLAID_BASE_URL,
+    PLAID_CLIENT_ID,
+    PLAID_SECRET,
+    PLAID_WEBHOOK_MAX_AGE,
+    PLAID_WEBHOOK_URL,
+    logger,
+)
+from app.helpers.provider_client import plaid_client
+
+# Plaid webhook verification keys (JWKs) by key id
+_webhook_keys = {}
 
 
 def generate_link_token(user_id, products=["transactions"]):
@@ -15,9 +30,11 @@ def generate_link_token(user_id, products=["transactions"]):
         "language": "en",
         "user": {"client_user_id": user_id},
     }
+    if PLAID_WEBHOOK_URL:
+        payload["webhook"] = PLAID_WEBHOOK_URL
     url = f"{PLAID_BASE_URL}/link/token/create"
-    logger.debug(f"Generating Plaid link token with payload: {payload}")
-    response = requests.post(url, json=payload)
+    logger.debug(f"Generating Plaid link token for user {user_id} ({products})")
+    response = plaid_client().post(url, json=payload)
     response.raise_for_status()
     return response.json().get("link_token")
 
@@ -34,7 +51,7 @@ def exchange_public_token(public_token):
     }
     url = f"{PLAID_BASE_URL}/item/public_token/exchange"
     logger.debug("Exchanging Plaid public token for access token")
-    response = requests.post(url, json=payload)
+    response = plaid_client().post(url, json=payload)
     response.raise_for_status()
     return response.json()
 
@@ -50,7 +67,7 @@ def get_accounts(access_token):
     }
     url = f"{PLAID_BASE_URL}/accounts/get"
     logger.debug("Fetching Plaid accounts")
-    response = requests.post(url, json=payload)
+    response = plaid_client().post(url, json=payload, rate_key=access_token)
     response.raise_for_status()
     return response.json()
 
@@ -68,7 +85,7 @@ def get_transactions(access_token, start_date, end_date):
     }
     url = f"{PLAID_BASE_URL}/transactions/get"
     logger.debug("Fetching Plaid transactions")
-    response = requests.post(url, json=payload)
+    response = plaid_client().post(url, json=payload, rate_key=access_token)
     response.raise_for_status()
     return response.json()
 
@@ -84,6 +101,63 @@ def get_investments(access_token):
     }
     url = f"{PLAID_BASE_URL}/investments/holdings/get"
     logger.debug("Fetching Plaid investments holdings")
-    response = requests.post(url, json=payload)
+    response = plaid_client().post(url, json=payload, rate_key=access_token)
     response.raise_for_status()
     return response.json()
+
+
+def get_webhook_verification_key(key_id):
+    """
+    Return the JWK Plaid signs webhooks with for key_id, fetched from
+    /webhook_verification_key/get once and cached. Expired keys are refetched
+    so a revoked key is noticed.
+    """
+    key = _webhook_keys.get(key_id)
+    if key is None or key.get("expired_at"):
+        payload = {
+            "client_id": PLAID_CLIENT_ID,
+            "secret": PLAID_SECRET,
+            "key_id": key_id,
+        }
+        url = f"{PLAID_BASE_URL}/webhook_verification_key/get"
+        logger.debug(f"Fetching Plaid webhook verification key {key_id}")
+        response = plaid_client().post(url, json=payload)
+        response.raise_for_status()
+        key = _webhook_keys[key_id] = response.json()["key"]
+    return key
+
+
+def verify_webhook(body, token):
+    """
+    Check the Plaid-Verification header of a webhook: an ES256 JWT signed
+    with one of Plaid's webhook keys, issued at most PLAID_WEBHOOK_MAX_AGE
+    seconds ago, whose request_body_sha256 claim matches the raw body.
+    Raises ValueError if the webhook cannot be verified.
+    """
+    if not token:
+        raise ValueError("Missing Plaid-Verification header")
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.InvalidTokenError as e:
+        raise ValueError(f"Malformed Plaid-Verification header: {e}")
+    if header.get("alg") != "ES256" or not header.get("kid"):
+        raise ValueError("Plaid-Verification header is not an ES256 JWT with a kid")
+
+    key = get_webhook_verification_key(header["kid"])
+    if key.get("expired_at"):
+        raise ValueError(f"Plaid webhook key {header['kid']} has expired")
+    try:
+        claims = jwt.decode(
+            token,
+            jwt.PyJWK(key).key,
+            algorithms=["ES256"],
+            options={"require": ["iat"]},
+        )
+    except jwt.InvalidTokenError as e:
+        raise ValueError(f"Invalid Plaid webhook signature: {e}")
+    if time.time() - claims["iat"] > PLAID_WEBHOOK_MAX_AGE:
+        raise ValueError("Plaid webhook is too old")
+
+    digest = hashlib.sha256(body).hexdigest()
+    if not hmac.compare_digest(digest, str(claims.get("request_body_sha256", ""))):
+        raise ValueError("Plaid webhook body does not match its signature")
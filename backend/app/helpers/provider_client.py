@@ -0,0 +1,181 @@
+"""
+Shared, pooled HTTP clients for the provider APIs (Teller and Plaid).
+
+Each provider gets one requests.Session with a sized connection pool, so
+refreshes reuse keep-alive TCP/TLS connections per host instead of opening a
+new handshake for every call. The Teller client carries the mTLS client
+certificate on the session. Sessions are created lazily and shared by all
+threads; requests' connection pools are thread-safe. Every request is paced
+by app.helpers.rate_limiter.
+"""
+
+import threading
+
+import requests
+from app.config import (
+    FILES,
+    PROVIDER_POOL_CONNECTIONS,
+    PROVIDER_POOL_MAXSIZE,
+    PROVIDER_TIMEOUT,
+    logger,
+)
+from app.helpers import rate_limiter
+from requests.adapters import HTTPAdapter
+
+
+class ProviderClient:
+    """
+    A thin wrapper around a pooled requests.Session that applies a default
+    timeout, client-side rate limiting and keeps simple request counters.
+    """
+
+    def __init__(
+        self,
+        name,
+        cert=None,
+        pool_connections=PROVIDER_POOL_CONNECTIONS,
+        pool_maxsize=PROVIDER_POOL_MAXSIZE,
+        timeout=PROVIDER_TIMEOUT,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        if cert:
+            self.session.cert = cert
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._throttled = 0
+
+    def _send(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._requests += 1
+
+    def request(self, method, url, rate_key=None, max_retries=3, backoff=1, **kwargs):
+        """
+        Send a request paced by the shared rate limiter for this provider and
+        rate_key (typically the access token). A 429 response pauses the
+        matching limiter for Retry-After seconds, or a jittered exponential
+        backoff starting at `backoff`, and the request is retried up to
+        max_retries attempts in total. A Retry-After longer than the
+        provider's max_backoff is not waited out: the 429 is returned at once.
+        The last response is always returned, unless the limiter would make
+        the request wait longer than max_backoff before sending it, in which
+        case rate_limiter.RateLimited (a requests.RequestException) is raised.
+        """
+        for attempt in range(1, max_retries + 1):
+            rate_limiter.acquire(self.name, rate_key)
+            resp = self._send(method, url, **kwargs)
+            if resp.status_code != 429:
+                return resp
+            with self._lock:
+                self._throttled += 1
+            delay = rate_limiter.throttle(
+                self.name,
+                rate_key,
+                rate_limiter.parse_retry_after(resp.headers.get("Retry-After")),
+                attempt - 1,
+                backoff,
+            )
+            if attempt == max_retries:
+                break
+            if delay > rate_limiter.max_backoff(self.name):
+                logger.warning(
+                    f"Received 429 (rate-limit) from {self.name} for {url} with "
+                    f"Retry-After {delay:.0f}s; not retrying."
+                )
+                break
+            # Release the connection of a streamed response before retrying.
+            resp.close()
+            logger.warning(
+                f"Received 429 (rate-limit) from {self.name} on attempt {attempt} for {url}. "
+                f"Pausing {delay:.1f} seconds before retry."
+            )
+        return resp
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """
+        Return request counters plus per-host connection counts taken from
+        the urllib3 pools. A connection is reused whenever a host served more
+        requests than connections it had to open.
+        """
+        hosts = {}
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            entry = hosts.setdefault(host, {"connections_opened": 0, "requests": 0})
+            entry["connections_opened"] += pool.num_connections
+            entry["requests"] += pool.num_requests
+        for entry in hosts.values():
+            entry["reused"] = max(entry["requests"] - entry["connections_opened"], 0)
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "errors": self._errors,
+                "throttled": self._throttled,
+                "hosts": hosts,
+            }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _build_client(name):
+    if name == "teller":
+        cert = (str(FILES["TELLER_DOT_CERT"]), str(FILES["TELLER_DOT_KEY"]))
+        return ProviderClient("teller", cert=cert)
+    if name == "plaid":
+        return ProviderClient("plaid")
+    raise ValueError(f"Unknown provider client '{name}'")
+
+
+def get_client(name):
+    """
+    Return the shared client for a provider ("teller" or "plaid").
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                logger.debug(f"Creating pooled HTTP client for {name}")
+                client = _clients[name] = _build_client(name)
+    return client
+
+
+def teller_client():
+    return get_client("teller")
+
+
+def plaid_client():
+    return get_client("plaid")
+
+
+def get_client_stats():
+    """
+    Connection reuse statistics for every provider client created so far.
+    """
+    return {name: client.stats() for name, client in list(_clients.items())}
@@ -0,0 +1,179 @@
+"""
+Client-side rate limiting for provider APIs.
+
+Outgoing requests are paced with token buckets shared by every thread: one
+bucket per provider and one per (provider, access token), so a refresh
+spreads its calls out before the provider starts answering 429. When a 429
+does come back, the matching bucket is paused for the Retry-After period (or
+a jittered exponential backoff) so other accounts on the same token wait too.
+Nobody sleeps longer than the provider's max_backoff: an acquire() that would
+wait longer raises RateLimited instead.
+"""
+
+import hashlib
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from app.config import RATE_LIMITS, logger
+
+
+class RateLimited(requests.RequestException):
+    """
+    Raised when a request would have to wait longer than allowed for the
+    rate limiter; `retry_after` is the remaining wait in seconds.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket refilled at `rate` tokens per second, holding
+    at most `capacity` tokens. pause() blocks all acquirers until a deadline.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self, max_wait=None):
+        """
+        Take one token, sleeping until one is available. Returns the number
+        of seconds spent waiting. If max_wait is given and the total wait
+        would exceed it, raises RateLimited without taking a token.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            if max_wait is not None and waited + delay > max_wait:
+                raise RateLimited(
+                    f"Rate limited for another {delay:.1f}s", retry_after=delay
+                )
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """
+        Stop handing out tokens for `seconds` (never shortens an existing pause).
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def _token_key(token):
+    # Never keep raw access tokens around as dict keys or in log lines.
+    return hashlib.sha256(token.encode()).hexdigest()[:12]
+
+
+def get_bucket(provider, token=None):
+    """
+    Return the shared bucket for a provider, or for one access token of it.
+    """
+    key = (provider, _token_key(token) if token else None)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        limits = RATE_LIMITS[provider]
+        rate, burst = (
+            (limits["token_rate"], limits["token_burst"])
+            if token
+            else (limits["rate"], limits["burst"])
+        )
+        with _buckets_lock:
+            bucket = _buckets.setdefault(key, TokenBucket(rate, burst))
+    return bucket
+
+
+def acquire(provider, token=None):
+    """
+    Wait for permission to send one request for provider (and token, if given).
+    Raises RateLimited rather than waiting longer than max_backoff(provider).
+    """
+    max_wait = max_backoff(provider)
+    waited = get_bucket(provider).acquire(max_wait)
+    if token:
+        waited += get_bucket(provider, token).acquire(max_wait - waited)
+    if waited > 0.5:
+        logger.debug(f"Rate limiter delayed {provider} request by {waited:.2f}s")
+    return waited
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header (delta seconds or HTTP date) into seconds.
+    Returns None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def backoff_delay(attempt, base, cap):
+    """
+    Full-jitter exponential backoff: a random delay in [0, min(cap, base * 2^attempt)].
+    """
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+def max_backoff(provider):
+    """
+    Longest pause (seconds) a client should sleep through before retrying.
+    """
+    return RATE_LIMITS[provider]["max_backoff"]
+
+
+def throttle(provider, token, retry_after, attempt, base):
+    """
+    Record a rate-limit response: pause the token's bucket (or the provider's
+    bucket when no token is known) so every caller's next acquire() waits,
+    and return the delay in seconds. A Retry-After sent by the provider is
+    returned in full, since retrying inside the provider's window just earns
+    another 429; the computed backoff is capped at max_backoff.
+
+    A token's bucket is paused for the whole delay, so its callers fail fast
+    with RateLimited until the window ends. The provider-wide bucket is never
+    paused beyond max_backoff, so one untokened call cannot lock every
+    account of the provider out for a long Retry-After.
+    """
+    cap = max_backoff(provider)
+    if retry_after is not None:
+        delay = retry_after
+    else:
+        delay = backoff_delay(attempt, base, cap)
+    get_bucket(provider, token).pause(delay if token else min(delay, cap))
+    return delay
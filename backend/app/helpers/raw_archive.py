@@ -0,0 +1,143 @@
+"""
+Append-only archive of raw provider payloads.
+
+Refreshes hand each decoded provider response to archive(), which only puts it
+on a bounded queue; a single background thread serializes the records as
+compact NDJSON and appends them, gzip-compressed, to
+ARCHIVE_DIR/raw/<provider>/<YYYY-MM-DD>.ndjson.gz (UTC fetch date). Every
+record carries provider, kind, account_id/item_id and fetched_at, so the files
+form a replayable history; read them back with read_archive().
+"""
+
+import atexit
+import gzip
+import json
+import queue
+import threading
+from datetime import datetime
+
+from app.config import (
+    DIRECTORIES,
+    RAW_ARCHIVE_ENABLED,
+    RAW_ARCHIVE_QUEUE_SIZE,
+    logger,
+)
+
+RAW_ARCHIVE_DIR = DIRECTORIES["ARCHIVE_DIR"] / "raw"
+
+_STOP = object()
+_queue = queue.Queue(maxsize=RAW_ARCHIVE_QUEUE_SIZE)
+_writer = []
+_writer_lock = threading.Lock()
+
+
+def archive_path(provider, day):
+    return RAW_ARCHIVE_DIR / provider / f"{day.isoformat()}.ndjson.gz"
+
+
+def _write_batch(records):
+    """
+    Append records to their provider/day files, one gzip member per file per
+    batch (gzip readers treat concatenated members as one stream).
+    """
+    by_file = {}
+    for record in records:
+        day = datetime.fromisoformat(record["fetched_at"]).date()
+        by_file.setdefault(archive_path(record["provider"], day), []).append(record)
+    for path, file_records in by_file.items():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for record in file_records:
+                f.write(json.dumps(record, separators=(",", ":"), default=str))
+                f.write("\n")
+
+
+def _writer_loop():
+    while True:
+        records = [_queue.get()]
+        # Drain whatever else is waiting so each file is opened once per batch.
+        while len(records) < 500:
+            try:
+                records.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        stop = any(record is _STOP for record in records)
+        records = [record for record in records if record is not _STOP]
+        try:
+            if records:
+                _write_batch(records)
+        except Exception as e:
+            logger.error(f"Error writing raw payload archive: {e}", exc_info=True)
+        finally:
+            for _ in range(len(records) + stop):
+                _queue.task_done()
+        if stop:
+            return
+
+
+def _ensure_writer():
+    if _writer:
+        return
+    with _writer_lock:
+        if not _writer:
+            thread = threading.Thread(
+                target=_writer_loop, name="raw-archive-writer", daemon=True
+            )
+            thread.start()
+            _writer.append(thread)
+            atexit.register(shutdown)
+
+
+def archive(provider, kind, payload, account_id=None, item_id=None):
+    """
+    Queue a raw provider payload for archiving. Returns immediately; blocks
+    only if RAW_ARCHIVE_QUEUE_SIZE records are already waiting.
+    """
+    if not RAW_ARCHIVE_ENABLED:
+        return
+    _ensure_writer()
+    _queue.put(
+        {
+            "provider": provider,
+            "kind": kind,
+            "account_id": account_id,
+            "item_id": item_id,
+            "fetched_at": datetime.utcnow().isoformat(),
+            "payload": payload,
+        }
+    )
+
+
+def flush():
+    """
+    Wait until every queued record has been written.
+    """
+    if _writer:
+        _queue.join()
+
+
+def shutdown(timeout=5):
+    """
+    Write out pending records and stop the writer thread.
+    """
+    if _writer and _writer[0].is_alive():
+        _queue.put(_STOP)
+        _writer[0].join(timeout)
+
+
+def read_archive(provider, day, kind=None, account_id=None):
+    """
+    Yield archived records for a provider and UTC date, optionally filtered
+    by kind and account_id, oldest first.
+    """
+    path = archive_path(provider, day)
+    if not path.exists():
+        return
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if kind and record["kind"] != kind:
+                continue
+            if account_id and record["account_id"] != account_id:
+                continue
+            yield record
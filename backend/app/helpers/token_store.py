@@ -0,0 +1,175 @@
+"""
+Cached, indexed access to the provider token files (TellerDotTokens.json,
+PlaidTokens.json).
+
+The file is parsed once and kept in memory together with user_id and item_id
+indexes; it is only re-read when its mtime or size changes, so resolving the
+tokens for a refresh of N accounts costs N dict lookups and no file I/O.
+Writes take an exclusive lock on a sidecar .lock file, re-read the current
+contents, and replace the file atomically (temp file + os.replace), so
+concurrent writers in other processes never lose updates or leave a partial
+file behind.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from app.config import FILES, logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+_UNLOADED = object()
+
+
+class TokenStore:
+    """
+    A list of token records ({"user_id", "access_token", optional "item_id"})
+    stored as a JSON array in `path`.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.RLock()
+        self._signature = _UNLOADED
+        self._tokens = []
+        self._by_user = {}
+        self._by_item = {}
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read_file(self):
+        try:
+            with open(self.path, "r") as f:
+                tokens = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"Tokens file not found at {self.path}, using empty list.")
+            return []
+        except json.JSONDecodeError as e:
+            logger.error(f"Error decoding tokens file at {self.path}: {e}")
+            return []
+        return tokens if isinstance(tokens, list) else []
+
+    def _index(self, tokens, signature):
+        by_user, by_item = {}, {}
+        for token in tokens:
+            if not token.get("access_token"):
+                continue
+            # The first token stored for a user wins, as with the old linear scans.
+            if token.get("user_id"):
+                by_user.setdefault(token["user_id"], token["access_token"])
+            if token.get("item_id"):
+                by_item[token["item_id"]] = token["access_token"]
+        self._tokens, self._by_user, self._by_item = tokens, by_user, by_item
+        self._signature = signature
+
+    def _refresh(self):
+        signature = self._file_signature()
+        with self._lock:
+            if signature != self._signature:
+                logger.debug(f"Loading tokens from {self.path}")
+                self._index(self._read_file(), signature)
+
+    def all(self):
+        """
+        Return a copy of every stored token record.
+        """
+        self._refresh()
+        return [dict(token) for token in self._tokens]
+
+    def by_user(self):
+        """
+        Return a user_id -> access_token mapping.
+        """
+        self._refresh()
+        return dict(self._by_user)
+
+    def get_for_user(self, user_id):
+        self._refresh()
+        return self._by_user.get(user_id)
+
+    def get_for_item(self, item_id):
+        self._refresh()
+        return self._by_item.get(item_id)
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_file(self, tokens):
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(tokens, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def add(self, user_id, access_token, item_id=None):
+        """
+        Store a token record. A record with the same access token is replaced
+        in place rather than duplicated.
+        """
+        record = {"user_id": user_id, "access_token": access_token}
+        if item_id:
+            record["item_id"] = item_id
+        with self._write_lock():
+            tokens = self._read_file()
+            for i, token in enumerate(tokens):
+                if token.get("access_token") == access_token:
+                    tokens[i] = record
+                    break
+            else:
+                tokens.append(record)
+            self._write_file(tokens)
+            self._index(tokens, self._file_signature())
+        logger.debug(f"Saved token for user {user_id} to {self.path}")
+        return record
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path):
+    """
+    Return the shared TokenStore for a token file.
+    """
+    path = str(path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = TokenStore(path)
+        return store
+
+
+def teller_tokens():
+    return get_store(FILES["TELLER_TOKENS"])
+
+
+def plaid_tokens():
+    return get_store(FILES["PLAID_TOKENS"])
@@ -1,6 +1,25 @@
 from datetime import datetime
 
 from app.extensions import db
+from app.helpers.money import from_minor_units, to_minor_units
+
+
+class Money(db.TypeDecorator):
+    """
+    A money amount stored as an integer number of cents (see
+    app/helpers/money.py). Accepts Decimals, ints, floats and numeric strings;
+    loads as a two-place Decimal. SQL aggregates typed as Money (e.g. SUM of a
+    Money column) load the same way.
+    """
+
+    impl = db.BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_minor_units(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_minor_units(value)
 
 
 class Account(db.Model):
@@ -14,9 +33,13 @@ class Account(db.Model):
     subtype = db.Column(db.String(64))
     status = db.Column(db.String(64))
     institution_name = db.Column(db.String(128))
-    balance = db.Column(db.Float, default=0)
+    balance = db.Column(Money, default=0)
+    iso_currency_code = db.Column(db.String(8))
     last_refreshed = db.Column(db.DateTime, default=datetime.utcnow)
+    # When the scheduler last queued a refresh, successful or not.
+    last_refresh_attempt = db.Column(db.DateTime)
     link_type = db.Column(db.String(64), default="InsertProvider")
+    refresh_ttl_minutes = db.Column(db.Integer)  # Overrides the provider TTL
     details = db.relationship("AccountDetails", backref="account", uselist=False)
     history = db.relationship("AccountHistory", backref="account", lazy=True)
 
@@ -37,6 +60,7 @@ class PlaidItem(db.Model):
     product = db.Column(
         db.String(32), nullable=False
     )  # e.g. "transactions" or "investments"
+    sync_cursor = db.Column(db.Text)  # Plaid /transactions/sync cursor
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -54,28 +78,146 @@ class AccountDetails(db.Model):
     )
     enrollment_id = db.Column(db.String(64))
     refresh_links = db.Column(db.Text)  # Stored as JSON string
+    # Newest transaction seen for incremental Teller fetches
+    txn_watermark_id = db.Column(db.String(64))
+    txn_watermark_date = db.Column(db.Date)
 
 
 class AccountHistory(db.Model):
     __tablename__ = "account_history"
+    # One balance per account and day; also serves per-account range reads.
+    __table_args__ = (
+        db.Index("uq_account_history_account_date", "account_id", "date", unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     account_id = db.Column(
         db.String(64), db.ForeignKey("accounts.account_id"), nullable=False
     )
     date = db.Column(db.Date, nullable=False)
-    balance = db.Column(db.Float, default=0)
+    balance = db.Column(Money, default=0)
 
 
 class Transaction(db.Model):
     __tablename__ = "transactions"
+    # Each index covers the columns its queries read, so SQLite can answer
+    # them from the index alone:
+    #   date, amount      - date-range charts (cash flow, daily net)
+    #   date, id          - keyset pagination of the listing
+    #   account_id, date  - per-account listings and date ranges
+    #   category, amount  - category breakdown (grouped in index order)
+    # and the listing's sort keys and equality filters (see account_logic):
+    #   amount, id                 - sorted by amount
+    #   category|merchant_name, id - sorted by category / merchant
+    #   ..., date, id              - filtered by category / merchant, by date
+    __table_args__ = (
+        db.Index("ix_transactions_date_amount", "date", "amount"),
+        db.Index("ix_transactions_date_id", "date", "id"),
+        db.Index("ix_transactions_account_date", "account_id", "date"),
+        db.Index("ix_transactions_category_amount", "category", "amount"),
+        db.Index("ix_transactions_amount_id", "amount", "id"),
+        db.Index("ix_transactions_category_id", "category", "id"),
+        db.Index("ix_transactions_merchant_id", "merchant_name", "id"),
+        db.Index("ix_transactions_category_date", "category", "date", "id"),
+        db.Index("ix_transactions_merchant_date", "merchant_name", "date", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     transaction_id = db.Column(db.String(64), unique=True, nullable=False)
     account_id = db.Column(db.String(64), db.ForeignKey("accounts.account_id"))
-    amount = db.Column(db.Float, default=0)
-    date = db.Column(db.String(64))  # For production, consider a proper DateTime
+    amount = db.Column(Money, default=0)
+    iso_currency_code = db.Column(db.String(8))
+    date = db.Column(db.Date)
+    posted_at = db.Column(db.DateTime)  # UTC, when the provider reports a time
     description = db.Column(db.String(256))
     category = db.Column(db.String(128), default="Unknown")
     merchant_name = db.Column(db.String(128), default="Unknown")
     merchant_typ = db.Column(db.String(64), default="Unknown")
+    # SHA-1 of the normalized provider fields as last ingested; refreshes skip
+    # rows whose hash has not changed.
+    content_hash = db.Column(db.String(40))
     user_modified = db.Column(db.Boolean, default=False)
     user_modified_fields = db.Column(db.Text)  # Could store a JSON representation
+
+
+class Security(db.Model):
+    """
+    A Plaid security (stock, fund, cash, ...) referenced by holdings.
+    """
+
+    __tablename__ = "securities"
+
+    id = db.Column(db.Integer, primary_key=True)
+    security_id = db.Column(db.String(64), unique=True, nullable=False)
+    name = db.Column(db.String(256))
+    ticker_symbol = db.Column(db.String(32))
+    type = db.Column(db.String(64))  # e.g. "equity", "etf", "mutual fund", "cash"
+    cusip = db.Column(db.String(16))
+    isin = db.Column(db.String(16))
+    iso_currency_code = db.Column(db.String(8))
+    close_price = db.Column(db.Float)
+    close_price_as_of = db.Column(db.Date)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class Holding(db.Model):
+    """
+    One position in an investment account on a snapshot date. Each holdings
+    refresh replaces that day's snapshot, so older dates form the history.
+    """
+
+    __tablename__ = "holdings"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "account_id", "security_id", "snapshot_date", name="uq_holdings_snapshot"
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.String(64), nullable=False)
+    account_id = db.Column(db.String(64), nullable=False)
+    account_name = db.Column(db.String(128))
+    security_id = db.Column(
+        db.String(64), db.ForeignKey("securities.security_id"), nullable=False
+    )
+    snapshot_date = db.Column(db.Date, nullable=False)
+    quantity = db.Column(db.Float, default=0)
+    institution_price = db.Column(db.Float)
+    institution_value = db.Column(db.Float, default=0)
+    cost_basis = db.Column(db.Float)
+    iso_currency_code = db.Column(db.String(8))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class RefreshJob(db.Model):
+    """
+    A background refresh job. Jobs are persisted so queued work survives
+    restarts; params, progress and result are stored as JSON strings.
+    """
+
+    __tablename__ = "refresh_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(32), nullable=False)  # e.g. "teller_refresh"
+    status = db.Column(
+        db.String(16), nullable=False, default="queued"
+    )  # queued, running, succeeded, failed
+    params = db.Column(db.Text)
+    progress = db.Column(db.Text)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    # Jobs with the same dedupe_key are coalesced while one is still queued
+    dedupe_key = db.Column(db.String(128))
+    run_after = db.Column(db.DateTime)  # Not claimed before this time
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    # Process running the job, and its last heartbeat; a running job whose
+    # heartbeat is older than JOB_LEASE_SECONDS belongs to a dead process
+    owner = db.Column(db.String(64))
+    heartbeat_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<RefreshJob(id={self.id}, type={self.job_type}, status={self.status})>"
@@ -5,13 +5,20 @@ from datetime import datetime, timedelta
 
 from app.config import logger
 from app.extensions import db
-from app.models import Account, Transaction
+from app.helpers.money import to_json
+from app.models import Account, Money, Transaction
+from app.sql.dialect import date_bucket
 from sqlalchemy import case, func
 
 from flask import Blueprint, jsonify, request
 
 charts = Blueprint("charts", __name__)
 
+# Money-typed expressions, so SQL sums stay in integer cents and load as Decimals.
+ABS_AMOUNT = func.abs(Transaction.amount, type_=Money)
+INCOME = case((Transaction.amount > 0, Transaction.amount), else_=0)
+EXPENSES = case((Transaction.amount < 0, ABS_AMOUNT), else_=0)
+
 
 @charts.route("/category_breakdown", methods=["GET"])
 def get_category_breakdown():
@@ -20,20 +27,18 @@ def get_category_breakdown():
     amounts, and return the top 10 spending categories.
     """
     try:
+        total = func.sum(ABS_AMOUNT).label("total")
         result = (
-            db.session.query(
-                Transaction.category,
-                func.sum(func.abs(Transaction.amount)).label("total"),
-            )
+            db.session.query(Transaction.category, total)
             .filter(Transaction.amount < 0)
             .group_by(Transaction.category)
-            .order_by(func.sum(func.abs(Transaction.amount)).desc())
+            .order_by(total.desc())
             .limit(10)
             .all()
         )
 
         breakdown = [
-            {"category": cat if cat else "Uncategorized", "amount": round(total, 2)}
+            {"category": cat if cat else "Uncategorized", "amount": to_json(total)}
             for cat, total in result
         ]
         return jsonify({"status": "success", "data": breakdown}), 200
@@ -66,20 +71,14 @@ def get_cash_flow():
             datetime.strptime(end_date_str, "%Y-%m-%d").date() if end_date_str else None
         )
 
-        if granularity == "daily":
-            group_expr = func.strftime("%Y-%m-%d", Transaction.date)
-        else:
-            group_expr = func.strftime("%m-%Y", Transaction.date)
-        period_label = group_expr.label("period")
+        period_label = date_bucket(
+            Transaction.date, "day" if granularity == "daily" else "month"
+        ).label("period")
 
         query = db.session.query(
             period_label,
-            func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0)).label(
-                "income"
-            ),
-            func.sum(
-                case((Transaction.amount < 0, func.abs(Transaction.amount)), else_=0)
-            ).label("expenses"),
+            func.sum(INCOME).label("income"),
+            func.sum(EXPENSES).label("expenses"),
         )
         if start_date:
             query = query.filter(Transaction.date >= start_date)
@@ -89,11 +88,11 @@ def get_cash_flow():
         results = query.all()
 
         data = [
-            {"date": period, "income": income, "expenses": expenses}
+            {"date": period, "income": to_json(income), "expenses": to_json(expenses)}
             for period, income, expenses in results
         ]
-        total_income = sum(item["income"] for item in data)
-        total_expenses = sum(item["expenses"] for item in data)
+        total_income = sum(income for _, income, _ in results)
+        total_expenses = sum(expenses for _, _, expenses in results)
         total_transactions = (
             db.session.query(Transaction).filter(Transaction.date >= start_date)
             if start_date
@@ -109,8 +108,8 @@ def get_cash_flow():
                     "status": "success",
                     "data": data,
                     "metadata": {
-                        "total_income": total_income,
-                        "total_expenses": total_expenses,
+                        "total_income": to_json(total_income),
+                        "total_expenses": to_json(total_expenses),
                         "total_transactions": total_transactions,
                     },
                 }
@@ -131,8 +130,7 @@ def get_net_assets():
     over the past 7 months.
     """
     try:
-        accounts = Account.query.all()
-        net = sum(acc.balance if acc.balance is not None else 0 for acc in accounts)
+        net = db.session.query(func.sum(Account.balance)).scalar() or 0
 
         base_date = datetime.now().replace(day=1)
         running = net - random.randint(500, 5000)
@@ -143,9 +141,7 @@ def get_net_assets():
             running += variation
             if m == 0:
                 running = net
-            data.append(
-                {"date": dt.strftime("%Y-%m-%d"), "netWorth": round(running, 2)}
-            )
+            data.append({"date": dt.strftime("%Y-%m-%d"), "netWorth": to_json(running)})
         return jsonify({"status": "success", "data": data}), 200
 
     except Exception as e:
@@ -169,16 +165,10 @@ def get_daily_net():
 
         query = (
             db.session.query(
-                func.strftime("%Y-%m-%d", Transaction.date).label("day"),
+                date_bucket(Transaction.date, "day").label("day"),
                 func.sum(Transaction.amount).label("net"),
-                func.sum(
-                    case((Transaction.amount > 0, Transaction.amount), else_=0)
-                ).label("income"),
-                func.sum(
-                    case(
-                        (Transaction.amount < 0, func.abs(Transaction.amount)), else_=0
-                    )
-                ).label("expenses"),
+                func.sum(INCOME).label("income"),
+                func.sum(EXPENSES).label("expenses"),
                 func.count(Transaction.transaction_id).label("transaction_count"),
             )
             .filter(Transaction.date >= start_date)
@@ -210,9 +200,9 @@ def get_daily_net():
             data.append(
                 {
                     "date": day_str,
-                    "net": round(daily["net"], 2),
-                    "income": round(daily["income"], 2),
-                    "expenses": round(daily["expenses"], 2),
+                    "net": to_json(daily["net"]),
+                    "income": to_json(daily["income"]),
+                    "expenses": to_json(daily["expenses"]),
                     "transaction_count": daily["transaction_count"],
                 }
             )
@@ -0,0 +1,36 @@
+# File: app/routes/jobs.py
+
+from app.config import logger
+from app.sql import job_queue
+
+from flask import Blueprint, jsonify, request
+
+jobs = Blueprint("jobs", __name__)
+
+
+@jobs.route("/<int:job_id>", methods=["GET"])
+def get_job_status(job_id):
+    """
+    Return a background job's status, per-account progress and final result.
+    """
+    try:
+        job = job_queue.get_job(job_id)
+        if not job:
+            return jsonify({"status": "error", "message": "Job not found"}), 404
+        return jsonify({"status": "success", "data": job}), 200
+    except Exception as e:
+        logger.error(f"Error fetching job {job_id}: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@jobs.route("/", methods=["GET"])
+def list_jobs():
+    """
+    Return the most recent background jobs (newest first).
+    """
+    try:
+        limit = int(request.args.get("limit", 20))
+        return jsonify({"status": "success", "data": job_queue.list_jobs(limit)}), 200
+    except Exception as e:
+        logger.error(f"Error listing jobs: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": str(e)}), 500
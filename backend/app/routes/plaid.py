@@ -1,16 +1,14 @@
 # File: app/routes/plaid.py
 
-import json
-
-import requests
 from app.config import (
-    FILES,
     PLAID_BASE_URL,
     PLAID_CLIENT_ID,
     PLAID_SECRET,
     PRODUCTS,
     logger,
 )
+from app.helpers.provider_client import plaid_client
+from app.helpers.token_store import plaid_tokens
 from app.sql import account_logic
 
 from flask import Blueprint, jsonify, request
@@ -31,6 +29,7 @@ def transform_plaid_account(plaid_account):
         "subtype": plaid_account.get("subtype") or "Unknown",
         # Plaid returns a nested "balances" object; we extract "current".
         "balance": {"current": plaid_account.get("balances", {}).get("current", 0)},
+        "currency": plaid_account.get("balances", {}).get("iso_currency_code"),
         "status": "active",  # Plaid does not provide a status; default to active.
         "institution": {"name": plaid_account.get("institution_name", "Unknown")},
         "enrollment_id": "",  # Not applicable for Plaid; leave empty.
@@ -58,13 +57,13 @@ def generate_link_token():
             "user": {"client_user_id": user_id},
         }
         url = f"{PLAID_BASE_URL}/link/token/create"
-        logger.debug(f"Plaid generate_link_token: POST {url} with payload: {payload}")
-        resp = requests.post(url, json=payload)
+        logger.debug(f"Plaid generate_link_token: POST {url}")
+        resp = plaid_client().post(url, json=payload)
         if resp.status_code != 200:
             logger.error(f"Error generating Plaid link token: {resp.text}")
             return jsonify({"status": "error", "message": resp.text}), resp.status_code
         link_token = resp.json().get("link_token")
-        logger.debug(f"Plaid link token generated: {link_token}")
+        logger.debug("Plaid link token generated.")
         return jsonify({"status": "success", "link_token": link_token}), 200
     except Exception as e:
         logger.error(
@@ -91,8 +90,8 @@ def exchange_public_token():
             "public_token": public_token,
         }
         url = f"{PLAID_BASE_URL}/item/public_token/exchange"
-        logger.debug(f"Plaid exchange_public_token: POST {url} with payload: {payload}")
-        resp = requests.post(url, json=payload)
+        logger.debug(f"Plaid exchange_public_token: POST {url}")
+        resp = plaid_client().post(url, json=payload)
         if resp.status_code != 200:
             logger.error(f"Error exchanging Plaid public token: {resp.text}")
             return jsonify({"status": "error", "message": resp.text}), resp.status_code
@@ -102,20 +101,8 @@ def exchange_public_token():
         item_id = exchange_data.get("item_id")
         user_id = data.get("user_id", "default_user")
 
-        # For demonstration, we store the Plaid token in the same file used for Teller tokens.
-        # In a production app, consider using a dedicated database table for tokens.
-        tokens_file = FILES.get("PLAID_TOKENS", FILES["TELLER_TOKENS"])
-        try:
-            with open(tokens_file, "r") as f:
-                tokens = json.load(f)
-        except Exception:
-            tokens = []
-        tokens.append(
-            {"user_id": user_id, "item_id": item_id, "access_token": access_token}
-        )
-        with open(tokens_file, "w") as f:
-            json.dump(tokens, f, indent=4)
-        logger.debug(f"Plaid token exchange successful: {exchange_data}")
+        plaid_tokens().add(user_id, access_token, item_id=item_id)
+        logger.debug(f"Plaid token exchange successful for item {item_id}")
         return (
             jsonify(
                 {"status": "success", "access_token": access_token, "item_id": item_id}
@@ -136,12 +123,7 @@ def get_accounts():
     """
     try:
         # For simplicity, we retrieve the first Plaid token.
-        tokens_file = FILES.get("PLAID_TOKENS", FILES["TELLER_TOKENS"])
-        try:
-            with open(tokens_file, "r") as f:
-                tokens = json.load(f)
-        except Exception:
-            tokens = []
+        tokens = plaid_tokens().all()
         if not tokens:
             return jsonify({"status": "error", "message": "No Plaid tokens found"}), 400
 
@@ -154,8 +136,8 @@ def get_accounts():
             "secret": PLAID_SECRET,
             "access_token": access_token,
         }
-        logger.debug(f"Plaid get_accounts: POST {url} with payload: {payload}")
-        resp = requests.post(url, json=payload)
+        logger.debug(f"Plaid get_accounts: POST {url}")
+        resp = plaid_client().post(url, json=payload)
         if resp.status_code != 200:
             logger.error(f"Error fetching Plaid accounts: {resp.text}")
             return jsonify({"status": "error", "message": resp.text}), resp.status_code
@@ -164,7 +146,7 @@ def get_accounts():
         # Transform each Plaid account object to our expected format.
         transformed_accounts = [transform_plaid_account(acc) for acc in accounts_data]
         # Use your existing upsert logic to insert/update accounts in the DB.
-        account_logic.upsert_accounts(user_id, transformed_accounts)
+        account_logic.upsert_accounts(user_id, transformed_accounts, provider="Plaid")
         logger.debug("Plaid accounts fetched and processed successfully.")
         return jsonify({"status": "success", "data": transformed_accounts}), 200
     except Exception as e:
@@ -180,12 +162,7 @@ def refresh_accounts():
     """
     try:
         logger.debug("Wrong modules. this is plaid.py")
-        tokens_file = FILES.get("PLAID_TOKENS", FILES["TELLER_TOKENS"])
-        try:
-            with open(tokens_file, "r") as f:
-                tokens = json.load(f)
-        except Exception:
-            tokens = []
+        tokens = plaid_tokens().all()
         if not tokens:
             return jsonify({"status": "error", "message": "No Plaid tokens found"}), 400
 
@@ -199,8 +176,8 @@ def refresh_accounts():
                 "secret": PLAID_SECRET,
                 "access_token": access_token,
             }
-            logger.debug(f"Plaid refresh_accounts: POST {url} with payload: {payload}")
-            resp = requests.post(url, json=payload)
+            logger.debug(f"Plaid refresh_accounts: POST {url}")
+            resp = plaid_client().post(url, json=payload)
             if resp.status_code != 200:
                 logger.error(f"Error refreshing Plaid accounts: {resp.text}")
                 continue
@@ -208,7 +185,9 @@ def refresh_accounts():
             transformed_accounts = [
                 transform_plaid_account(acc) for acc in accounts_data
             ]
-            account_logic.upsert_accounts(user_id, transformed_accounts)
+            account_logic.upsert_accounts(
+                user_id, transformed_accounts, provider="Plaid"
+            )
             updated_items.append(token.get("item_id", "unknown"))
         return jsonify({"status": "success", "updated_items": updated_items}), 200
     except Exception as e:
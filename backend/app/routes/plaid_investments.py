@@ -1,9 +1,9 @@
+from datetime import datetime
+
 from app.config import logger
-from app.helpers.plaid_helpers import (
-    exchange_public_token,
-    generate_link_token,
-    get_investments,
-)
+from app.helpers.plaid_helpers import exchange_public_token, generate_link_token
+from app.models import PlaidItem
+from app.sql import investment_logic
 from app.sql.account_logic import save_plaid_item
 
 from flask import Blueprint, jsonify, request
@@ -74,30 +74,32 @@ def exchange_public_token_investments():
 @plaid_investments.route("/refresh", methods=["POST"])
 def refresh_investments_endpoint():
     """
-    Refresh investments holdings for a linked investments item.
-    Expects JSON with "user_id" and "item_id".
+    Refresh investments holdings and store them as today's snapshot.
+    Accepts JSON with optional "user_id" and "item_id" to limit which
+    investments items are refreshed; by default all of them are.
     """
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     user_id = data.get("user_id")
     item_id = data.get("item_id")
-    if not user_id or not item_id:
-        return jsonify({"error": "Missing user_id or item_id"}), 400
     try:
-        from app.models import PlaidItem
-
-        item = PlaidItem.query.filter_by(
-            item_id=item_id, user_id=user_id, product="investments"
-        ).first()
-        if not item:
+        query = PlaidItem.query.filter_by(product="investments")
+        if user_id:
+            query = query.filter_by(user_id=user_id)
+        if item_id:
+            query = query.filter_by(item_id=item_id)
+        items = query.all()
+        if not items:
             return jsonify({"error": "Investments item not found"}), 404
-        investments_data = get_investments(item.access_token)
-        # Process and save investments data as needed.
-        # For example, you might call account_logic.process_investments(user_id, investments_data)
+        results = {
+            item.item_id: investment_logic.refresh_investments_item(item)
+            for item in items
+        }
         return (
             jsonify(
                 {
                     "status": "success",
-                    "holdings_fetched": len(investments_data.get("holdings", [])),
+                    "holdings_fetched": sum(r["holdings"] for r in results.values()),
+                    "items": results,
                 }
             ),
             200,
@@ -105,3 +107,70 @@ def refresh_investments_endpoint():
     except Exception as e:
         logger.error(f"Error refreshing investments: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
+
+
+def _snapshot_date_arg():
+    # Raises ValueError (a 400) for anything but YYYY-MM-DD.
+    value = request.args.get("date")
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}'; expected YYYY-MM-DD")
+
+
+@plaid_investments.route("/holdings", methods=["GET"])
+def get_holdings():
+    """
+    Return stored holdings from each item's latest snapshot (as of
+    ?date=YYYY-MM-DD, if given), optionally filtered by user_id and
+    account_id. Never calls Plaid.
+    """
+    try:
+        holdings = investment_logic.get_holdings(
+            user_id=request.args.get("user_id"),
+            account_id=request.args.get("account_id"),
+            snapshot_date=_snapshot_date_arg(),
+        )
+        return jsonify({"status": "success", "data": holdings}), 200
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error fetching holdings: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@plaid_investments.route("/composition", methods=["GET"])
+def get_composition():
+    """
+    Return portfolio composition from the stored snapshot, grouped by
+    ?group_by=type (default), security or account.
+    """
+    try:
+        composition = investment_logic.get_composition(
+            user_id=request.args.get("user_id"),
+            group_by=request.args.get("group_by", "type"),
+            snapshot_date=_snapshot_date_arg(),
+        )
+        return jsonify({"status": "success", "data": composition}), 200
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error computing investments composition: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@plaid_investments.route("/history", methods=["GET"])
+def get_value_history():
+    """
+    Return the total stored holdings value per snapshot date.
+    """
+    try:
+        history = investment_logic.get_value_history(
+            user_id=request.args.get("user_id")
+        )
+        return jsonify({"status": "success", "data": history}), 200
+    except Exception as e:
+        logger.error(f"Error fetching investments history: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": str(e)}), 500
@@ -1,16 +1,17 @@
 # File: app/routes/plaid_transactions.py
 
-from datetime import datetime
-
 from app.config import PLAID_BASE_URL, logger
-from app.extensions import db
 from app.helpers.plaid_helpers import (
     exchange_public_token,
     generate_link_token,
     get_accounts,
 )
 from app.models import Account
-from app.sql import account_logic  # for upserting accounts and processing transactions
+from app.sql import (  # for upserting accounts and processing transactions
+    account_logic,
+    job_queue,
+    refresh_engine,
+)
 
 from flask import Blueprint, jsonify, request
 
@@ -81,6 +82,7 @@ def exchange_public_token_endpoint():
                     "type": acct.get("type") or "Unknown",
                     "subtype": acct.get("subtype") or "Unknown",
                     "balance": {"current": acct.get("balances", {}).get("current", 0)},
+                    "currency": acct.get("balances", {}).get("iso_currency_code"),
                     "status": "active",
                     "institution": {"name": institution_name},
                     "access_token": access_token,
@@ -109,44 +111,44 @@ def exchange_public_token_endpoint():
 def refresh_plaid_accounts():
     """
     Refresh Plaid-linked accounts using tokens stored in the Accounts table.
-    Expects JSON payload with "user_id" (optional, defaults to "Brayden@PlaidLink").
+    Expects JSON payload with "user_id" (optional, defaults to "Brayden@PlaidLink")
+    and "mode" (optional): "get" re-downloads the last 30 days of transactions,
+    "sync" pulls only deltas through /transactions/sync using each item's cursor.
+    With "background": true the refresh is queued as a job and the job id is
+    returned immediately; poll /api/jobs/<job_id> for progress.
     """
     try:
         logger.debug("Refreshing Plaid accounts from database.")
-        user_id = request.get_json().get("user_id", "Brayden@PlaidLink")
+        data = request.get_json() or {}
+        user_id = data.get("user_id", "Brayden@PlaidLink")
+        mode = data.get("mode", "get")
+        if mode not in ("get", "sync"):
+            return (
+                jsonify({"status": "error", "message": f"Unknown mode '{mode}'"}),
+                400,
+            )
+        if data.get("background"):
+            job = job_queue.enqueue("plaid_refresh", {"user_id": user_id, "mode": mode})
+            return jsonify({"status": "queued", "job_id": job.id}), 202
         # Query only accounts for the given user that are linked via Plaid.
         accounts = Account.query.filter_by(user_id=user_id, link_type="Plaid").all()
         if not accounts:
             logger.warning(f"No Plaid-linked accounts found for user {user_id}")
-        updated_accounts = []
-
-        for account in accounts:
-            access_token = (
-                account.access_token
-            )  # Access token stored in the Account record
-            if not access_token:
-                logger.warning(
-                    f"No Plaid access token found for account {account.account_id} (user {account.user_id})"
-                )
-                continue
-
-            logger.debug(
-                f"Refreshing Plaid account {account.account_id} using token: {access_token}"
-            )
-            updated = account_logic.refresh_data_for_plaid_account(
-                account, access_token, PLAID_BASE_URL
-            )
-            if updated:
-                updated_accounts.append(account.name)
-                account.last_refreshed = datetime.utcnow()
-        db.session.commit()
+        results = refresh_engine.refresh_plaid_accounts(
+            accounts, PLAID_BASE_URL, mode=mode
+        )
+        updated_accounts = [
+            r["account_name"] for r in results if r["status"] == "updated"
+        ]
         logger.debug(f"Refresh complete. Updated accounts: {updated_accounts}")
         return (
             jsonify(
                 {
                     "status": "success",
-                    "message": "Teller account data refreshed",
+                    "message": "Plaid account data refreshed",
                     "updated_accounts": updated_accounts,
+                    "summary": refresh_engine.summarize_results(results),
+                    "results": results,
                 }
             ),
             200,
@@ -0,0 +1,93 @@
+# File: app/routes/plaid_webhooks.py
+
+from app.config import PLAID_WEBHOOK_DEBOUNCE, PLAID_WEBHOOK_VERIFY, logger
+from app.helpers.plaid_helpers import verify_webhook
+from app.models import PlaidItem
+from app.sql import job_queue
+
+from flask import Blueprint, jsonify, request
+
+plaid_webhooks = Blueprint("plaid_webhooks", __name__)
+
+# (webhook_type, webhook_code) -> product refreshed for the item
+WEBHOOK_PRODUCTS = {
+    ("TRANSACTIONS", "SYNC_UPDATES_AVAILABLE"): "transactions",
+    ("TRANSACTIONS", "DEFAULT_UPDATE"): "transactions",
+    ("TRANSACTIONS", "INITIAL_UPDATE"): "transactions",
+    ("TRANSACTIONS", "HISTORICAL_UPDATE"): "transactions",
+    ("HOLDINGS", "DEFAULT_UPDATE"): "investments",
+}
+
+
+@plaid_webhooks.route("/", methods=["POST"])
+def receive_webhook():
+    """
+    Receive a Plaid webhook and queue a refresh of only the affected item.
+
+    Transactions updates queue an incremental /transactions/sync and holdings
+    updates an investments snapshot. Webhooks for the same item and product
+    arriving within PLAID_WEBHOOK_DEBOUNCE seconds share one queued job.
+    Other webhooks are acknowledged and ignored.
+
+    The Plaid-Verification header is checked against Plaid's webhook keys
+    and unverified requests get a 401. When no job workers run in this
+    process the job is stored but reported as "not_running" rather than
+    queued. With PLAID_WEBHOOK_VERIFY=false (local testing only), try it with:
+
+        curl -X POST localhost:5000/api/plaid/webhooks/ \\
+          -H 'Content-Type: application/json' \\
+          -d '{"webhook_type": "TRANSACTIONS",
+               "webhook_code": "SYNC_UPDATES_AVAILABLE", "item_id": "<item_id>"}'
+    """
+    try:
+        if PLAID_WEBHOOK_VERIFY:
+            try:
+                verify_webhook(
+                    request.get_data(), request.headers.get("Plaid-Verification")
+                )
+            except ValueError as e:
+                logger.warning(f"Rejected Plaid webhook: {e}")
+                return jsonify({"status": "error", "message": str(e)}), 401
+        data = request.get_json(silent=True) or {}
+        webhook_type = data.get("webhook_type")
+        webhook_code = data.get("webhook_code")
+        item_id = data.get("item_id")
+        logger.info(f"Plaid webhook {webhook_type}/{webhook_code} for item {item_id}")
+
+        product = WEBHOOK_PRODUCTS.get((webhook_type, webhook_code))
+        if product is None:
+            return jsonify({"status": "ignored", "reason": "unhandled webhook"}), 200
+        if data.get("error"):
+            logger.warning(
+                f"Plaid webhook for item {item_id} reported: {data['error']}"
+            )
+        # Plaid retries non-2xx responses, so unknown items are acknowledged too.
+        if not item_id or not PlaidItem.query.filter_by(item_id=item_id).first():
+            return jsonify({"status": "ignored", "reason": "unknown item"}), 200
+
+        job = job_queue.enqueue(
+            "plaid_item_refresh",
+            {"item_id": item_id, "product": product},
+            dedupe_key=f"plaid_item_refresh:{item_id}:{product}",
+            delay=PLAID_WEBHOOK_DEBOUNCE,
+        )
+        if not job_queue.workers_running():
+            logger.warning(
+                f"Stored refresh job {job.id} for item {item_id}, but no job "
+                "workers are running (JOB_WORKERS=0)."
+            )
+            return (
+                jsonify(
+                    {
+                        "status": "not_running",
+                        "job_id": job.id,
+                        "message": "No job workers are running; the refresh "
+                        "waits until a process with JOB_WORKERS > 0 starts.",
+                    }
+                ),
+                200,
+            )
+        return jsonify({"status": "queued", "job_id": job.id}), 202
+    except Exception as e:
+        logger.error(f"Error handling Plaid webhook: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": str(e)}), 500
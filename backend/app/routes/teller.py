@@ -1,8 +1,11 @@
 import json
+from datetime import datetime
 
-import requests
 from app.config import FILES, TELLER_APP_ID, logger
 from app.extensions import db
+from app.helpers.money import to_decimal
+from app.helpers.provider_client import teller_client
+from app.helpers.token_store import teller_tokens
 from app.models import Account, Transaction
 from app.sql import account_logic
 from app.sql.account_logic import get_accounts_from_db
@@ -12,7 +15,6 @@ from flask import Blueprint, jsonify, request
 # Define file paths and API endpoints
 TELLER_DOT_KEY = FILES["TELLER_DOT_KEY"]
 TELLER_DOT_CERT = FILES["TELLER_DOT_CERT"]
-TELLER_TOKENS = FILES["TELLER_TOKENS"]
 TELLER_ACCOUNTS = FILES["TELLER_ACCOUNTS"]
 TELLER_API_BASE_URL = "https://api.teller.io"
 
@@ -22,35 +24,6 @@ main_teller = Blueprint("main_teller", __name__)
 transactions_bp = Blueprint("transactions", __name__)
 
 
-def load_tokens():
-    try:
-        logger.debug(f"Attempting to load tokens from {TELLER_TOKENS}")
-        with open(TELLER_TOKENS, "r") as f:
-            tokens = json.load(f)
-            logger.debug(f"Loaded tokens: {tokens}")
-            return tokens
-    except FileNotFoundError:
-        logger.warning(
-            f"Tokens file not found at {TELLER_TOKENS}, returning empty list."
-        )
-        return []
-    except json.JSONDecodeError as e:
-        logger.error(
-            f"Error decoding tokens file at {TELLER_TOKENS}: {e}", exc_info=True
-        )
-        return []
-
-
-def save_tokens(tokens):
-    try:
-        logger.debug(f"Saving tokens to {TELLER_TOKENS}: {tokens}")
-        with open(TELLER_TOKENS, "w") as f:
-            json.dump(tokens, f, indent=4)
-        logger.debug("Tokens saved successfully.")
-    except Exception as e:
-        logger.error(f"Error saving tokens to {TELLER_TOKENS}: {e}", exc_info=True)
-
-
 def extract_accounts(data):
     logger.debug(f"Extracting accounts from data: {data}")
     if isinstance(data, dict) and "accounts" in data:
@@ -75,9 +48,9 @@ def generate_link_token():
             "user_id": "Brayden@Teller",
             "products": ["transactions", "balance"],
         }
-        logger.debug(f"POST {url} with headers={headers} and payload={payload}")
-        resp = requests.post(url, headers=headers, json=payload)
-        logger.debug(f"Response status: {resp.status_code}, response body: {resp.text}")
+        logger.debug(f"POST {url}")
+        resp = teller_client().post(url, headers=headers, json=payload)
+        logger.debug(f"Response status: {resp.status_code}")
         if resp.status_code != 200:
             logger.error(f"Error generating link token: {resp.json()}")
             return (
@@ -85,7 +58,7 @@ def generate_link_token():
                 resp.status_code,
             )
         link_token = resp.json().get("link_token")
-        logger.debug(f"Successfully generated link token: {link_token}")
+        logger.debug("Successfully generated link token.")
         return jsonify({"status": "success", "link_token": link_token}), 200
     except Exception as e:
         logger.error(f"Unexpected error generating link token: {e}", exc_info=True)
@@ -96,7 +69,7 @@ def generate_link_token():
 def get_item_details():
     try:
         logger.debug("Fetching initial account information.")
-        tokens = load_tokens()
+        tokens = teller_tokens().all()
         if not tokens:
             logger.warning("No access tokens found.")
             return (
@@ -105,19 +78,16 @@ def get_item_details():
             )
 
         access_token = tokens[0].get("access_token")
-        logger.debug(f"Using access token: {access_token}")
         if not access_token:
             logger.error("Access token is invalid or missing.")
             return jsonify({"status": "error", "message": "Invalid access token"}), 400
 
         url = f"{TELLER_API_BASE_URL}/accounts"
-        logger.debug(
-            f"GET {url} with cert=({TELLER_DOT_CERT}, {TELLER_DOT_KEY}) and auth=({access_token}, '')"
-        )
-        resp = requests.get(
+        logger.debug(f"GET {url}")
+        resp = teller_client().get(
             url, cert=(TELLER_DOT_CERT, TELLER_DOT_KEY), auth=(access_token, "")
         )
-        logger.debug(f"Response status: {resp.status_code}, response body: {resp.text}")
+        logger.debug(f"Response status: {resp.status_code}")
         if resp.status_code != 200:
             logger.error(f"Failed to fetch accounts: {resp.text}")
             return (
@@ -169,7 +139,6 @@ def exchange_public_token():
     try:
         logger.debug("Exchanging public token for access token.")
         data = request.json
-        logger.debug(f"Request JSON: {data}")
         public_token = data.get("public_token")
         if not public_token:
             logger.error("Missing public token in request.")
@@ -178,21 +147,17 @@ def exchange_public_token():
         url = f"{TELLER_API_BASE_URL}/link_tokens/exchange"
         headers = {"Authorization": f"Bearer {TELLER_DOT_KEY}"}
         payload = {"public_token": public_token}
-        logger.debug(f"POST {url} with headers={headers} and payload={payload}")
-        resp = requests.post(url, headers=headers, json=payload)
-        logger.debug(f"Response status: {resp.status_code}, response body: {resp.text}")
+        logger.debug(f"POST {url}")
+        resp = teller_client().post(url, headers=headers, json=payload)
+        logger.debug(f"Response status: {resp.status_code}")
         if resp.status_code != 200:
             logger.error(f"Error exchanging public token: {resp.json()}")
             return jsonify({"error": resp.json()}), resp.status_code
 
         access_token = resp.json().get("access_token")
         user_id = resp.json().get("user", {}).get("id")
-        logger.debug(
-            f"Exchange successful: access_token={access_token}, user_id={user_id}"
-        )
-        tokens = load_tokens()
-        tokens.append({"user_id": user_id, "access_token": access_token})
-        save_tokens(tokens)
+        logger.debug(f"Exchange successful for user {user_id}")
+        teller_tokens().add(user_id, access_token)
         return (
             jsonify(
                 {"status": "success", "access_token": access_token, "user_id": user_id}
@@ -209,7 +174,6 @@ def link_account():
     try:
         logger.debug("Linking account with public token.")
         data = request.json
-        logger.debug(f"Request JSON: {data}")
         public_token = data.get("public_token")
         if not public_token:
             logger.error("Missing public token in link_account request.")
@@ -218,13 +182,11 @@ def link_account():
         url_exchange = f"{TELLER_API_BASE_URL}/link_tokens/exchange"
         headers = {"Authorization": f"Bearer {TELLER_DOT_KEY}"}
         payload = {"public_token": public_token}
-        logger.debug(
-            f"Exchanging public token: POST {url_exchange} with payload={payload}"
-        )
-        resp_exchange = requests.post(url_exchange, headers=headers, json=payload)
-        logger.debug(
-            f"Exchange response status: {resp_exchange.status_code}, body: {resp_exchange.text}"
+        logger.debug(f"Exchanging public token: POST {url_exchange}")
+        resp_exchange = teller_client().post(
+            url_exchange, headers=headers, json=payload
         )
+        logger.debug(f"Exchange response status: {resp_exchange.status_code}")
         if resp_exchange.status_code != 200:
             logger.error(f"Exchange failed: {resp_exchange.json()}")
             return (
@@ -234,25 +196,17 @@ def link_account():
 
         access_token = resp_exchange.json().get("access_token")
         user_id = resp_exchange.json().get("user", {}).get("id")
-        logger.debug(
-            f"Exchange successful: access_token={access_token}, user_id={user_id}"
-        )
-        tokens = load_tokens()
-        tokens.append({"user_id": user_id, "access_token": access_token})
-        save_tokens(tokens)
+        logger.debug(f"Exchange successful for user {user_id}")
+        teller_tokens().add(user_id, access_token)
 
         url_accounts = f"{TELLER_API_BASE_URL}/accounts"
-        logger.debug(
-            f"Fetching accounts: GET {url_accounts} with cert=({TELLER_DOT_CERT}, {TELLER_DOT_KEY}) and auth=({access_token}, '')"
-        )
-        resp_accounts = requests.get(
+        logger.debug(f"Fetching accounts: GET {url_accounts}")
+        resp_accounts = teller_client().get(
             url_accounts,
             cert=(TELLER_DOT_CERT, TELLER_DOT_KEY),
             auth=(access_token, ""),
         )
-        logger.debug(
-            f"Accounts response status: {resp_accounts.status_code}, body: {resp_accounts.text}"
-        )
+        logger.debug(f"Accounts response status: {resp_accounts.status_code}")
         if resp_accounts.status_code != 200:
             logger.error(f"Failed to fetch accounts: {resp_accounts.text}")
             return (
@@ -269,7 +223,7 @@ def link_account():
         logger.debug(f"Accounts response JSON: {data_resp}")
         accounts_data = extract_accounts(data_resp)
         logger.debug(f"Extracted accounts data: {accounts_data}")
-        account_logic.upsert_accounts(user_id, accounts_data)
+        account_logic.upsert_accounts(user_id, accounts_data, provider="Teller")
         logger.debug("Account linking and saving completed successfully.")
         return (
             jsonify(
@@ -293,25 +247,15 @@ def refresh_accounts():
         accounts = Account.query.all()
         logger.debug(f"Found {len(accounts)} accounts to refresh.")
         updated_accounts = []
-        tokens = load_tokens()
-        logger.debug(f"Loaded tokens: {tokens}")
+        tokens_by_user = teller_tokens().by_user()
         for account in accounts:
-            access_token = None
-            for token in tokens:
-                if token.get("user_id") == account.user_id:
-                    access_token = token.get("access_token")
-                    logger.debug(
-                        f"Found access token for user_id {account.user_id}: {access_token}"
-                    )
-                    break
+            access_token = tokens_by_user.get(account.user_id)
             if not access_token:
                 logger.warning(
                     f"No access token found for account user_id: {account.user_id}"
                 )
                 continue
-            logger.debug(
-                f"Refreshing account {account.account_id} using access token: {access_token}"
-            )
+            logger.debug(f"Refreshing account {account.account_id}")
             updated = account_logic.refresh_account_data_for_account(
                 account,
                 access_token,
@@ -353,7 +297,7 @@ def refresh_balances():
     try:
         accounts = get_accounts_from_db()  # Fetch account details
         updated_accounts = []
-        tokens = load_tokens()  # Assumes tokens are stored and retrievable
+        tokens_by_user = teller_tokens().by_user()
 
         for acc in accounts:
             # Find the corresponding Account object
@@ -363,12 +307,7 @@ def refresh_balances():
                 continue
 
             # Find the access token for the account's user.
-            access_token = None
-            for token in tokens:
-                if token.get("user_id") == acc["user_id"]:
-                    access_token = token.get("access_token")
-                    break
-
+            access_token = tokens_by_user.get(acc["user_id"])
             if not access_token:
                 logger.warning(f"No access token found for account {acc['account_id']}")
                 continue
@@ -460,9 +399,21 @@ def update_transaction():
 
         # Update only the allowed fields if they are provided.
         if "amount" in data:
-            txn.amount = float(data["amount"])
+            try:
+                txn.amount = to_decimal(data["amount"])
+            except ValueError:
+                return (
+                    jsonify({"status": "error", "message": "amount must be a number"}),
+                    400,
+                )
         if "date" in data:
-            txn.date = data["date"]
+            try:
+                txn.date = datetime.strptime(data["date"], "%Y-%m-%d").date()
+            except (TypeError, ValueError):
+                return (
+                    jsonify({"status": "error", "message": "date must be YYYY-MM-DD"}),
+                    400,
+                )
         if "description" in data:
             txn.description = data["description"]
         if "category" in data:
@@ -2,53 +2,25 @@
 import json
 from datetime import datetime
 
-import requests
 from app.config import FILES, TELLER_API_BASE_URL, logger
 from app.extensions import db
+from app.helpers.money import to_decimal
+from app.helpers.provider_client import teller_client
+from app.helpers.token_store import teller_tokens
 from app.models import (  # TellerItem is our new table for Teller-specific data
     Account,
     Transaction,
 )
-from app.sql import account_logic
+from app.sql import account_logic, job_queue, refresh_engine
 
 from flask import Blueprint, jsonify, request
 
 # Define file paths and API endpoints
 TELLER_DOT_KEY = FILES["TELLER_DOT_KEY"]
 TELLER_DOT_CERT = FILES["TELLER_DOT_CERT"]
-TELLER_TOKENS = FILES["TELLER_TOKENS"]
 TELLER_ACCOUNTS = FILES["TELLER_ACCOUNTS"]
 
 
-def load_tokens():
-    try:
-        logger.debug(f"Attempting to load tokens from {TELLER_TOKENS}")
-        with open(TELLER_TOKENS, "r") as f:
-            tokens = json.load(f)
-            logger.debug(f"Loaded tokens: {tokens}")
-            return tokens
-    except FileNotFoundError:
-        logger.warning(
-            f"Tokens file not found at {TELLER_TOKENS}, returning empty list."
-        )
-        return []
-    except json.JSONDecodeError as e:
-        logger.error(
-            f"Error decoding tokens file at {TELLER_TOKENS}: {e}", exc_info=True
-        )
-        return []
-
-
-def save_tokens(tokens):
-    try:
-        logger.debug(f"Saving tokens to {TELLER_TOKENS}: {tokens}")
-        with open(TELLER_TOKENS, "w") as f:
-            json.dump(tokens, f, indent=4)
-        logger.debug("Tokens saved successfully.")
-    except Exception as e:
-        logger.error(f"Error saving tokens to {TELLER_TOKENS}: {e}", exc_info=True)
-
-
 teller_transactions = Blueprint("teller_transactions", __name__)
 
 
@@ -68,24 +40,15 @@ def teller_exchange_public_token():
         url = f"{TELLER_API_BASE_URL}/link_tokens/exchange"
         headers = {"Authorization": f"Bearer {FILES['TELLER_DOT_KEY']}"}
         payload = {"public_token": public_token}
-        logger.debug(f"Teller exchange payload: {payload}")
-        resp = requests.post(url, headers=headers, json=payload)
-        logger.debug(f"Teller exchange response: {resp.status_code} - {resp.text}")
+        resp = teller_client().post(url, headers=headers, json=payload)
+        logger.debug(f"Teller exchange response: {resp.status_code}")
         if resp.status_code != 200:
             logger.error(f"Error exchanging public token: {resp.json()}")
             return jsonify({"error": resp.json()}), resp.status_code
 
         access_token = resp.json().get("access_token")
         user_id = resp.json().get("user", {}).get("id")
-        # (For now we store tokens in a JSON file; later you may migrate these to the DB.)
-        try:
-            with open(FILES["TELLER_TOKENS"], "r") as f:
-                tokens = json.load(f)
-        except Exception:
-            tokens = []
-        tokens.append({"user_id": user_id, "access_token": access_token})
-        with open(FILES["TELLER_TOKENS"], "w") as f:
-            json.dump(tokens, f, indent=4)
+        teller_tokens().add(user_id, access_token)
         return (
             jsonify(
                 {"status": "success", "access_token": access_token, "user_id": user_id}
@@ -102,47 +65,37 @@ def teller_refresh_accounts():
     """
     Refresh Teller accounts and transactions.
     For each account in the database, use the Teller token.
-    Updated data is stored in the Accounts table.
+    Accounts are fetched in parallel; updated data is stored in the Accounts table.
+    With JSON {"background": true} the refresh is queued as a job and the job
+    id is returned immediately; poll /api/jobs/<job_id> for progress.
     """
     try:
+        data = request.get_json(silent=True) or {}
+        if data.get("background"):
+            job = job_queue.enqueue(
+                "teller_refresh", {"account_ids": data.get("account_ids")}
+            )
+            return jsonify({"status": "queued", "job_id": job.id}), 202
         logger.debug("Refreshing Teller accounts from database.")
         accounts = Account.query.all()
-        updated_accounts = []
-        try:
-            with open(FILES["TELLER_TOKENS"], "r") as f:
-                tokens = json.load(f)
-        except Exception:
-            tokens = []
-        for account in accounts:
-            access_token = None
-            for token in tokens:
-                if token.get("user_id") == account.user_id:
-                    access_token = token.get("access_token")
-                    break
-            if not access_token:
-                logger.warning(f"No access token found for user {account.user_id}")
-                continue
-            logger.debug(
-                f"Refreshing Teller account {account.name} {account.account_id} using token: {access_token}"
-            )
-            updated = account_logic.refresh_data_for_teller_account(
-                account,
-                access_token,
-                FILES["TELLER_DOT_CERT"],
-                FILES["TELLER_DOT_KEY"],
-                TELLER_API_BASE_URL,
-            )
-            if updated:
-                updated_accounts.append(account.name)
-                # Update the Account record's last_refreshed timestamp
-                account.last_refreshed = datetime.utcnow()
-        db.session.commit()
+        results = refresh_engine.refresh_teller_accounts(
+            accounts,
+            teller_tokens().by_user(),
+            FILES["TELLER_DOT_CERT"],
+            FILES["TELLER_DOT_KEY"],
+            TELLER_API_BASE_URL,
+        )
+        updated_accounts = [
+            r["account_name"] for r in results if r["status"] == "updated"
+        ]
         return (
             jsonify(
                 {
                     "status": "success",
                     "message": "Teller account data refreshed",
                     "updated_accounts": updated_accounts,
+                    "summary": refresh_engine.summarize_results(results),
+                    "results": results,
                 }
             ),
             200,
@@ -155,14 +108,44 @@ def teller_refresh_accounts():
 @teller_transactions.route("/get_transactions", methods=["GET"])
 def teller_get_transactions():
     """
-    Return paginated Teller transactions.
+    Return paginated transactions, newest first.
+
+    Filters: start_date, end_date, account_id, category, merchant_name,
+    min_amount, max_amount, user_modified. Ordering: sort (date, amount,
+    category, merchant_name) and order (asc|desc, default desc).
+
+    Cursor mode (recommended): pass mode=cursor, or a cursor from a previous
+    response, plus direction=next|prev. The response carries next_cursor and
+    prev_cursor; the total is only counted with include_total=true (cached).
+    Without either, the legacy page/page_size offset mode is used.
+    page_size is clamped to 1..200 and page to at least 1.
     """
     try:
-        page = int(request.args.get("page", 1))
-        page_size = int(request.args.get("page_size", 15))
-        transactions_list, total = account_logic.get_paginated_transactions(
-            page, page_size
-        )
+        include_total = request.args.get("include_total", "").lower() == "true"
+        cursor = request.args.get("cursor")
+        sort = request.args.get("sort", "date")
+        order = request.args.get("order", "desc")
+        try:
+            page_size = min(max(int(request.args.get("page_size", 15)), 1), 200)
+            filters = account_logic.parse_transaction_filters(request.args)
+            if cursor or request.args.get("mode") == "cursor":
+                data = account_logic.get_transactions_page(
+                    page_size,
+                    cursor=cursor,
+                    direction=request.args.get("direction", "next"),
+                    include_total=include_total,
+                    filters=filters,
+                    sort=sort,
+                    order=order,
+                )
+                return jsonify({"status": "success", "data": data}), 200
+
+            page = max(int(request.args.get("page", 1)), 1)
+            transactions_list, total = account_logic.get_paginated_transactions(
+                page, page_size, filters=filters, sort=sort, order=order
+            )
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
         return (
             jsonify(
                 {
@@ -177,6 +160,34 @@ def teller_get_transactions():
         return jsonify({"error": str(e)}), 500
 
 
+@teller_transactions.route("/search", methods=["GET"])
+def search_transactions():
+    """
+    Full-text search over transaction descriptions and merchants. q is
+    matched word by word as prefixes; results are ranked, each with a
+    snippet with the matched words in [brackets]. Accepts limit (max 200),
+    offset, include_total=true and the same filters as /get_transactions.
+    """
+    try:
+        try:
+            limit = min(max(int(request.args.get("limit", 50)), 1), 200)
+            offset = max(int(request.args.get("offset", 0)), 0)
+            filters = account_logic.parse_transaction_filters(request.args)
+            data = account_logic.search_transactions(
+                request.args.get("q", ""),
+                limit=limit,
+                offset=offset,
+                filters=filters,
+                include_total=request.args.get("include_total", "").lower() == "true",
+            )
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        return jsonify({"status": "success", "data": data}), 200
+    except Exception as e:
+        logger.error(f"Error searching transactions: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 @teller_transactions.route("/get_accounts", methods=["GET"])
 def get_accounts():
     try:
@@ -197,40 +208,19 @@ def refresh_balances():
     updates the historical balances (AccountHistory) in the DB.
     """
     try:
-        accounts = account_logic.get_accounts_from_db()  # Fetch account details
-        updated_accounts = []
-        tokens = load_tokens()  # Assumes tokens are stored and retrievable
-
-        for acc in accounts:
-            # Find the corresponding Account object
-            account = Account.query.filter_by(account_id=acc["account_id"]).first()
-            if not account:
-                logger.warning(f"Account {acc['account_id']} not found in DB.")
-                continue
-
-            # Find the access token for the account's user.
-            access_token = None
-            for token in tokens:
-                if token.get("user_id") == acc["user_id"]:
-                    access_token = token.get("access_token")
-                    break
-
-            if not access_token:
-                logger.warning(f"No access token found for account {acc['account_id']}")
-                continue
-
-            # Use our existing refresh logic to fetch balances & update history.
-            updated = account_logic.refresh_data_for_teller_account(
-                account,
-                access_token,
-                TELLER_DOT_CERT,
-                TELLER_DOT_KEY,
-                TELLER_API_BASE_URL,
-            )
-            if updated:
-                updated_accounts.append({"account_name": acc["name"]})
-
-        db.session.commit()
+        accounts = Account.query.all()
+        results = refresh_engine.refresh_teller_accounts(
+            accounts,
+            teller_tokens().by_user(),
+            TELLER_DOT_CERT,
+            TELLER_DOT_KEY,
+            TELLER_API_BASE_URL,
+        )
+        updated_accounts = [
+            {"account_name": r["account_name"]}
+            for r in results
+            if r["status"] == "updated"
+        ]
         logger.debug(f"Balances refreshed for accounts: {updated_accounts}")
         return (
             jsonify(
@@ -238,6 +228,8 @@ def refresh_balances():
                     "status": "success",
                     "message": "Balances refreshed",
                     "updated_accounts": updated_accounts,
+                    "summary": refresh_engine.summarize_results(results),
+                    "results": results,
                 }
             ),
             200,
@@ -265,10 +257,22 @@ def update_transaction():
         # Track changed fields
         changed_fields = {}
         if "amount" in data:
-            txn.amount = float(data["amount"])
+            try:
+                txn.amount = to_decimal(data["amount"])
+            except ValueError:
+                return (
+                    jsonify({"status": "error", "message": "amount must be a number"}),
+                    400,
+                )
             changed_fields["amount"] = True
         if "date" in data:
-            txn.date = data["date"]
+            try:
+                txn.date = datetime.strptime(data["date"], "%Y-%m-%d").date()
+            except (TypeError, ValueError):
+                return (
+                    jsonify({"status": "error", "message": "date must be YYYY-MM-DD"}),
+                    400,
+                )
             changed_fields["date"] = True
         if "description" in data:
             txn.description = data["description"]
@@ -295,6 +299,7 @@ def update_transaction():
         txn.user_modified_fields = json.dumps(existing_fields)
 
         db.session.commit()
+        account_logic.invalidate_transaction_counts()
         return jsonify({"status": "success"}), 200
     except Exception as e:
         logger.error(...)
@@ -1,14 +1,36 @@
+import base64
+import hashlib
 import json
+import threading
 import time
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlencode
 
-import requests
-from app.config import FILES, PLAID_CLIENT_ID, PLAID_SECRET, logger
+from app.config import (
+    PLAID_CLIENT_ID,
+    PLAID_SECRET,
+    TELLER_PENDING_WINDOW_DAYS,
+    TELLER_TXN_PAGE_SIZE,
+    TRANSACTION_COUNT_CACHE_TTL,
+    logger,
+)
 from app.extensions import db
+from app.helpers import raw_archive
+from app.helpers.json_stream import StreamingJSONParser
+from app.helpers.money import to_decimal, to_json
+from app.helpers.provider_client import plaid_client, teller_client
 from app.models import Account, AccountDetails, AccountHistory, PlaidItem, Transaction
-
-TRANSACTIONS_RAW = FILES["TRANSACTIONS_RAW"]
-TRANSACTIONS_RAW_ENRICHED = FILES["TRANSACTIONS_RAW_ENRICHED"]
+from app.sql import pg_copy, transaction_search
+from sqlalchemy import (
+    and_,
+    delete,
+    func,
+    insert,
+    literal_column,
+    select,
+    tuple_,
+    update,
+)
 
 
 def save_plaid_item(user_id, item_id, access_token, institution_name, product):
@@ -37,10 +59,15 @@ def upsert_accounts(user_id, accounts_data, provider, batch_size=100):
     """
     Inserts or updates account information from the provided accounts_data.
     For liability accounts like credit cards, the balance sign is reversed.
+
+    Works in batches of batch_size accounts: existing accounts, details and
+    today's history rows are prefetched with one query each per batch, then
+    written with bulk INSERT/UPDATE statements, so the number of round trips
+    does not grow with the number of accounts in a batch.
     """
-    logger.debug(f"Upserting accounts for user {user_id}: {accounts_data}")
+    logger.debug("Upserting %d accounts for user %s", len(accounts_data), user_id)
     processed_ids = set()
-    count = 0
+    rows = []
 
     for account in accounts_data:
         account_id = account.get("id")
@@ -55,150 +82,562 @@ def upsert_accounts(user_id, accounts_data, provider, batch_size=100):
             continue
         processed_ids.add(account_id)
 
-        name = account.get("name") or "Unnamed Account"
         acc_type = account.get("type") or "Unknown"
         # Normalize the account type to ensure consistent matching
         normalized_type = acc_type.strip().lower()
-        balance = account.get("balance", {}).get("current", 0) or 0
+        balance = to_decimal(account.get("balance", {}).get("current", 0) or 0)
 
         # Check if the account type indicates a liability (e.g., credit or credit card)
         if normalized_type in ["credit", "credit card", "credit_card", "liability"]:
             credit_balance = -balance
             logger.debug(
-                f"Account {account_id} is {normalized_type}; inverting balance from {balance} to {credit_balance}."
+                "Account %s is %s; inverting its balance.", account_id, normalized_type
             )
             balance = credit_balance
 
         unformatted_subtype = account.get("subtype") or "Unknown"
-
-        subtype = unformatted_subtype.capitalize()
-
-        status = account.get("status") or "Unknown"
         institution = account.get("institution", {}) or {}
-        institution_name = institution.get("name") or "Unknown"
-        enrollment_id = account.get("enrollment_id") or ""
-        refresh_links = account.get("links") or {}
-        access_token = account.get("access_token") or ""
 
-        logger.debug(f"Processing account id: {account_id}")
-        existing = Account.query.filter_by(account_id=account_id).first()
+        rows.append(
+            {
+                "account_id": account_id,
+                "name": account.get("name") or "Unnamed Account",
+                "access_token": account.get("access_token") or "",
+                "type": acc_type,
+                "balance": balance,
+                "iso_currency_code": account.get("currency"),
+                "subtype": unformatted_subtype.capitalize(),
+                "status": account.get("status") or "Unknown",
+                "institution_name": institution.get("name") or "Unknown",
+                "link_type": provider,
+                # Details columns
+                "enrollment_id": account.get("enrollment_id") or "",
+                "refresh_links": json.dumps(account.get("links") or {}),
+            }
+        )
+
+    today = date.today()
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        batch_ids = [row["account_id"] for row in batch]
         now = datetime.utcnow()
-        if existing:
-            logger.debug(f"Updating account {name}, {account_id}")
-            existing.name = name
-            existing.access_token = access_token
-            existing.type = acc_type
-            existing.balance = balance
-            existing.subtype = subtype
-            existing.status = status
-            existing.institution_name = institution_name
-            existing.last_refreshed = now
-            existing.link_type = provider
-            if existing.details:
-                existing.details.enrollment_id = enrollment_id
-                existing.details.refresh_links = json.dumps(refresh_links)
+
+        # Prefetch everything this batch needs with one query per table.
+        existing_accounts = dict(
+            db.session.execute(
+                select(Account.account_id, Account.id).where(
+                    Account.account_id.in_(batch_ids)
+                )
+            ).all()
+        )
+        existing_details = dict(
+            db.session.execute(
+                select(AccountDetails.account_id, AccountDetails.id).where(
+                    AccountDetails.account_id.in_(batch_ids)
+                )
+            ).all()
+        )
+        history_today = set(
+            db.session.execute(
+                select(AccountHistory.account_id).where(
+                    AccountHistory.account_id.in_(batch_ids),
+                    AccountHistory.date == today,
+                )
+            ).scalars()
+        )
+
+        account_inserts, account_updates = [], []
+        details_inserts, details_updates = [], []
+        history_inserts = []
+        for row in batch:
+            account_id = row["account_id"]
+            account_values = {
+                key: row[key]
+                for key in row
+                if key not in ("enrollment_id", "refresh_links")
+            }
+            account_values["last_refreshed"] = now
+            details_values = {
+                "account_id": account_id,
+                "enrollment_id": row["enrollment_id"],
+                "refresh_links": row["refresh_links"],
+            }
+
+            if account_id in existing_accounts:
+                logger.debug("Updating account %s", account_id)
+                account_updates.append(
+                    {"id": existing_accounts[account_id], **account_values}
+                )
             else:
-                details = AccountDetails(
-                    account_id=account_id,
-                    enrollment_id=enrollment_id,
-                    refresh_links=json.dumps(refresh_links),
+                logger.debug("Inserting new account %s", account_id)
+                account_inserts.append({"user_id": user_id, **account_values})
+
+            if account_id in existing_details:
+                details_updates.append(
+                    {"id": existing_details[account_id], **details_values}
+                )
+            else:
+                details_inserts.append(details_values)
+
+            # Insert a historical record if not already present for today.
+            if account_id not in history_today:
+                history_inserts.append(
+                    {"account_id": account_id, "date": today, "balance": row["balance"]}
                 )
-                db.session.add(details)
-        else:
-            logger.debug(f"Inserting new account {account_id}")
-            new_account = Account(
-                account_id=account_id,
-                user_id=user_id,
-                access_token=access_token,
-                name=name,
-                type=acc_type,
-                balance=balance,
-                subtype=subtype,
-                status=status,
-                institution_name=institution_name,
-                last_refreshed=now,
-                link_type=provider,
-            )
-            db.session.add(new_account)
-            db.session.flush()  # Ensure new_account gets an ID before adding details.
-            details = AccountDetails(
-                account_id=account_id,
-                enrollment_id=enrollment_id,
-                refresh_links=json.dumps(refresh_links),
-            )
-            db.session.add(details)
-
-        # Insert a historical record if not already present for today.
-        today = date.today()
-        existing_history = AccountHistory.query.filter_by(
-            account_id=account_id, date=today
-        ).first()
-        if not existing_history:
-            history_record = AccountHistory(
-                account_id=account_id, date=today, balance=balance
-            )
-            db.session.add(history_record)
 
-        count += 1
-        if count % batch_size == 0:
-            db.session.commit()
-            logger.debug(f"Committed batch of {batch_size} accounts.")
+        if account_inserts:
+            db.session.execute(insert(Account), account_inserts)
+        if account_updates:
+            db.session.execute(update(Account), account_updates)
+        if details_inserts:
+            db.session.execute(insert(AccountDetails), details_inserts)
+        if details_updates:
+            db.session.execute(update(AccountDetails), details_updates)
+        if history_inserts:
+            db.session.execute(insert(AccountHistory), history_inserts)
+
+        db.session.commit()
+        logger.debug(
+            "Committed batch of %d accounts (%d inserted, %d updated).",
+            len(batch),
+            len(account_inserts),
+            len(account_updates),
+        )
 
-    db.session.commit()  # Commit any remaining accounts
     logger.debug("Finished upserting accounts.")
 
 
-def fetch_url_with_backoff(url, cert, auth, max_retries=3, initial_delay=10):
+TRANSACTION_FIELDS = (
+    "account_id",
+    "amount",
+    "iso_currency_code",
+    "date",
+    "posted_at",
+    "description",
+    "category",
+    "merchant_name",
+    "merchant_typ",
+)
+
+
+def parse_date(value):
     """
-    Perform a GET request with exponential backoff if we receive a 429 (rate-limit) response.
+    Parse a provider date ("YYYY-MM-DD", anything after it is ignored).
+    Returns None for empty or malformed values.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        logger.warning(f"Unparseable date {value!r}")
+        return None
 
-    :param url: URL to request
-    :param cert: A tuple (cert_file, key_file) or None
-    :param auth: A tuple (username, password) or (token, '')
-    :param max_retries: Maximum number of total attempts before giving up
-    :param initial_delay: How many seconds to wait for the first backoff; doubles each time
-    :return: The final response object (even if not 200 OK)
+
+def parse_timestamp(value):
+    """
+    Parse a provider ISO 8601 timestamp into a naive UTC datetime.
+    Returns None for empty or malformed values.
     """
-    wait_time = initial_delay
-    for attempt in range(1, max_retries + 1):
-        resp = requests.get(url, cert=cert, auth=auth)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        logger.warning(f"Unparseable timestamp {value!r}")
+        return None
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
 
-        # If no rate-limit error, return immediately
-        if resp.status_code != 429:
-            return resp
 
-        # Otherwise, handle 429
+def transaction_content_hash(row):
+    """
+    Return a stable hash of a normalized transaction row's TRANSACTION_FIELDS.
+    """
+    content = json.dumps([row[field] for field in TRANSACTION_FIELDS], default=str)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def normalize_teller_transaction(txn, account_id):
+    """
+    Map a raw Teller transaction onto Transaction column values.
+    Returns None if the transaction has no id.
+    """
+    txn_id = txn.get("id")
+    if not txn_id:
         logger.warning(
-            f"Received 429 (rate-limit) on attempt {attempt} for {url}. "
-            f"Sleeping {wait_time} seconds before retry."
+            "Encountered a transaction without an 'id'; skipping this transaction."
         )
-        time.sleep(wait_time)
-        wait_time *= 2  # Exponential backoff
+        return None
 
-    # Return the last response after exhausting retries
-    return resp
+    # Process transaction details.
+    details = txn.get("details", {}) or {}
+    category = details.get("category")
+    if isinstance(category, list) and category:
+        category = category[-1] or "Unknown"
+    else:
+        category = category or "Unknown"
 
+    counterparty = details.get("counterparty")
+    merchant_name = "Unknown"
+    merchant_typ = "Unknown"
+    if isinstance(counterparty, list):
+        if counterparty and isinstance(counterparty[0], dict):
+            merchant_name = counterparty[0].get("name", "Unknown")
+            merchant_typ = counterparty[0].get("type", "Unknown")
+    elif isinstance(counterparty, dict):
+        merchant_name = counterparty.get("name", "Unknown")
+        merchant_typ = counterparty.get("type", "Unknown")
 
-def refresh_data_for_teller_account(
-    account, access_token, teller_dot_cert, teller_dot_key, teller_api_base_url
+    return {
+        "transaction_id": txn_id,
+        "account_id": account_id,
+        "amount": to_decimal(txn.get("amount") or 0),
+        # Teller only connects US institutions and sends no currency.
+        "iso_currency_code": "USD",
+        "date": parse_date(txn.get("date")),
+        "posted_at": None,
+        "description": txn.get("description") or "",
+        "category": category,
+        "merchant_name": merchant_name,
+        "merchant_typ": merchant_typ,
+    }
+
+
+def normalize_plaid_transaction(txn, account_id):
+    """
+    Map a raw Plaid transaction onto Transaction column values.
+    Returns None if the transaction has no transaction_id.
+    """
+    txn_id = txn.get("transaction_id")
+    if not txn_id:
+        logger.warning(
+            "Encountered a transaction without a 'transaction_id'; skipping."
+        )
+        return None
+
+    # Process category: if a list is provided, use the last element.
+    category_list = txn.get("category")
+    if isinstance(category_list, list) and category_list:
+        category = category_list[-1] or "Unknown"
+    else:
+        category = "Unknown"
+
+    # Process merchant details:
+    merchant_typ = "Unknown"
+    counterparties = txn.get("counterparties")
+    if isinstance(counterparties, list) and counterparties:
+        merchant_typ = counterparties[0].get("type", "Unknown")
+
+    return {
+        "transaction_id": txn_id,
+        "account_id": account_id,
+        "amount": to_decimal(txn.get("amount") or 0),
+        "iso_currency_code": txn.get("iso_currency_code")
+        or txn.get("unofficial_currency_code"),
+        "date": parse_date(txn.get("date") or txn.get("authorized_date")),
+        "posted_at": parse_timestamp(
+            txn.get("datetime") or txn.get("authorized_datetime")
+        ),
+        # Use the 'name' field as description if available; fallback to merchant_name.
+        "description": txn.get("name") or txn.get("merchant_name") or "",
+        "category": category,
+        "merchant_name": txn.get("merchant_name") or "Unknown",
+        "merchant_typ": merchant_typ,
+    }
+
+
+def bulk_upsert_transactions(rows, chunk_size=500):
+    """
+    Insert or update normalized transaction rows in a handful of statements.
+
+    Each row is hashed with transaction_content_hash and the stored hashes of
+    existing rows are fetched with one batched IN query per chunk. Rows whose
+    hash matches are skipped without being loaded or written; the rest go out
+    as a bulk INSERT and a bulk UPDATE by primary key. On PostgreSQL the rows
+    are merged through COPY instead (see app/sql/pg_copy.py). Does not commit.
+    Returns a dict of inserted/updated/skipped counts.
+    """
+    stats = {"inserted": 0, "updated": 0, "skipped": 0}
+
+    # Collapse duplicate ids within the payload; the last occurrence wins.
+    unique_rows = {}
+    for row in rows:
+        if row:
+            unique_rows[row["transaction_id"]] = {
+                **row,
+                "content_hash": transaction_content_hash(row),
+            }
+    if unique_rows and pg_copy.copy_ingest_enabled():
+        stats = pg_copy.copy_upsert_transactions(list(unique_rows.values()))
+        if stats["inserted"] or stats["updated"]:
+            invalidate_transaction_counts()
+        logger.debug("COPY transaction upsert complete: %s", stats)
+        return stats
+    txn_ids = list(unique_rows)
+
+    columns = [Transaction.id, Transaction.transaction_id, Transaction.content_hash]
+    for start in range(0, len(txn_ids), chunk_size):
+        chunk = txn_ids[start : start + chunk_size]
+        existing = {
+            found.transaction_id: found
+            for found in db.session.execute(
+                select(*columns).where(Transaction.transaction_id.in_(chunk))
+            )
+        }
+
+        inserts = []
+        updates = []
+        for txn_id in chunk:
+            row = unique_rows[txn_id]
+            current = existing.get(txn_id)
+            if current is None:
+                inserts.append(row)
+            elif current.content_hash != row["content_hash"]:
+                updates.append({"id": current.id, **row})
+            else:
+                stats["skipped"] += 1
+
+        if inserts:
+            db.session.execute(insert(Transaction), inserts)
+        if updates:
+            db.session.execute(update(Transaction), updates)
+        stats["inserted"] += len(inserts)
+        stats["updated"] += len(updates)
+
+    # Updates can move rows in or out of a filtered count, not just inserts.
+    if stats["inserted"] or stats["updated"]:
+        invalidate_transaction_counts()
+    logger.debug("Bulk transaction upsert complete: %s", stats)
+    return stats
+
+
+def fetch_url_with_backoff(
+    url, cert, auth, max_retries=3, initial_delay=1, stream=False
 ):
     """
-    Refreshes account balance and transactions by querying the Teller API.
-    Updates the account balance and adds/updates transactions accordingly.
+    Perform a Teller GET request paced by the shared Teller rate limiter.
+    On a 429 (rate-limit) response the access token's limiter is paused for the
+    Retry-After period, or a jittered exponential backoff, before retrying.
+
+    :param url: URL to request
+    :param cert: A tuple (cert_file, key_file) or None
+    :param auth: A tuple (username, password) or (token, '')
+    :param max_retries: Maximum number of total attempts before giving up
+    :param initial_delay: Base seconds for the jittered backoff when no Retry-After is sent
+    :param stream: Leave the body unread so it can be parsed incrementally
+    :return: The final response object (even if not 200 OK)
     """
-    updated = False
-    datetime.utcnow()
+    return teller_client().get(
+        url,
+        cert=cert,
+        auth=auth,
+        rate_key=auth[0] if auth else None,
+        max_retries=max_retries,
+        backoff=initial_delay,
+        stream=stream,
+    )
 
-    # --- Refresh Balance ---
-    url_balance = f"{teller_api_base_url}/accounts/{account.account_id}/balances"
+
+def fetch_teller_account_data(
+    account_id,
+    access_token,
+    teller_dot_cert,
+    teller_dot_key,
+    teller_api_base_url,
+    watermark=None,
+    on_batch=None,
+):
+    """
+    Fetches the raw balance and transactions payloads for a single Teller account.
+    Only performs network I/O (no database access), so it is safe to call from
+    worker threads. Returns a dict with the decoded payloads, or None for any
+    payload that could not be fetched.
+
+    Transactions are read newest-first in pages of TELLER_TXN_PAGE_SIZE using
+    Teller's count/from_id parameters. When a watermark (see
+    get_teller_watermarks) is given, paging stops once it reaches transactions
+    older than the watermark date minus TELLER_PENDING_WINDOW_DAYS, which are
+    already stored and settled; the trailing window is always re-read so
+    pending transactions get re-checked.
+
+    Each page is parsed incrementally from the response stream. If on_batch
+    is given, every page of new transactions is handed to on_batch(list) as
+    soon as it is read instead of being collected, so memory use is bounded by
+    the page size rather than the account's history; "transactions" is then
+    left None and "transaction_count" / "newest_transaction" describe them.
+    """
+    fetched = {
+        "account_id": account_id,
+        "balance": None,
+        "transactions": None,
+        "transactions_complete": False,
+        "transaction_count": 0,
+        "newest_transaction": None,
+    }
+
+    # --- Fetch Balance ---
+    url_balance = f"{teller_api_base_url}/accounts/{account_id}/balances"
     resp_balance = fetch_url_with_backoff(
         url_balance, cert=(teller_dot_cert, teller_dot_key), auth=(access_token, "")
     )
     if resp_balance.status_code == 200:
-        logger.debug(
-            f"Balance response for account {account.account_id}: {resp_balance.text}"
+        logger.debug("Fetched balance for account %s", account_id)
+        fetched["balance"] = resp_balance.json()
+        raw_archive.archive(
+            "teller", "balances", fetched["balance"], account_id=account_id
+        )
+    else:
+        logger.error(
+            f"Failed to refresh balance for account {account_id}: {resp_balance.text}"
+        )
+
+    # --- Fetch Transactions ---
+    cutoff = None
+    if watermark and watermark.get("date"):
+        cutoff = (
+            watermark["date"] - timedelta(days=TELLER_PENDING_WINDOW_DAYS)
+        ).isoformat()
+    url_txns = f"{teller_api_base_url}/accounts/{account_id}/transactions"
+    transactions = []
+    seen_ids = set()
+    from_id = None
+    while True:
+        params = {"count": TELLER_TXN_PAGE_SIZE}
+        if from_id:
+            params["from_id"] = from_id
+        url_page = f"{url_txns}?{urlencode(params)}"
+        logger.debug("Requesting transactions for account %s", account_id)
+        resp_txns = fetch_url_with_backoff(
+            url_page,
+            cert=(teller_dot_cert, teller_dot_key),
+            auth=(access_token, ""),
+            stream=True,
+        )
+        with resp_txns:
+            if resp_txns.status_code != 200:
+                logger.error(
+                    f"Failed to refresh transactions for account {account_id}: {resp_txns.text}"
+                )
+                break
+            page = [
+                txn
+                for _, txn in StreamingJSONParser.from_response(resp_txns).items(
+                    ("transactions",)
+                )
+            ]
+        raw_archive.archive("teller", "transactions", page, account_id=account_id)
+        new_txns = [txn for txn in page if txn.get("id") not in seen_ids]
+        seen_ids.update(txn.get("id") for txn in new_txns)
+        fetched["transaction_count"] += len(new_txns)
+        for txn in new_txns:
+            newest = fetched["newest_transaction"]
+            if txn.get("id") and txn.get("date"):
+                if newest is None or txn["date"] > newest["date"]:
+                    fetched["newest_transaction"] = {
+                        "id": txn["id"],
+                        "date": txn["date"],
+                    }
+        if on_batch is None:
+            transactions.extend(new_txns)
+        elif new_txns:
+            on_batch(new_txns)
+
+        reached_known = cutoff is not None and any(
+            (txn.get("date") or "") < cutoff for txn in new_txns
         )
-        balance_json = resp_balance.json()
+        if reached_known or len(page) < TELLER_TXN_PAGE_SIZE or not new_txns:
+            fetched["transactions_complete"] = True
+            break
+        from_id = new_txns[-1].get("id")
+
+    if on_batch is None and (transactions or fetched["transactions_complete"]):
+        fetched["transactions"] = transactions
+    logger.debug(
+        "Fetched %d transactions for account %s (watermark cutoff %s).",
+        fetched["transaction_count"],
+        account_id,
+        cutoff,
+    )
+    return fetched
+
+
+def get_teller_watermarks(account_ids):
+    """
+    Load the stored transaction watermarks for the given accounts in one query.
+    Returns {account_id: {"id": newest_txn_id, "date": newest_txn_date}}.
+    """
+    rows = db.session.execute(
+        select(
+            AccountDetails.account_id,
+            AccountDetails.txn_watermark_id,
+            AccountDetails.txn_watermark_date,
+        ).where(AccountDetails.account_id.in_(list(account_ids)))
+    )
+    return {
+        account_id: {"id": watermark_id, "date": watermark_date}
+        for account_id, watermark_id, watermark_date in rows
+        if watermark_date
+    }
+
+
+def update_teller_watermark(account, txns_list):
+    """
+    Advance the account's watermark to the newest transaction in txns_list.
+    """
+    dated = [txn for txn in txns_list if txn.get("id") and txn.get("date")]
+    if not dated:
+        return
+    newest = max(dated, key=lambda txn: txn["date"])
+    try:
+        newest_date = datetime.strptime(newest["date"][:10], "%Y-%m-%d").date()
+    except ValueError:
+        logger.warning(f"Unparseable transaction date {newest['date']!r}")
+        return
+
+    details = account.details
+    if details is None:
+        details = AccountDetails(account_id=account.account_id)
+        db.session.add(details)
+    if details.txn_watermark_date and details.txn_watermark_date > newest_date:
+        return
+    details.txn_watermark_id = newest["id"]
+    details.txn_watermark_date = newest_date
+
+
+def merge_stats(stats, more):
+    """
+    Add the counts in `more` to the stats dict in place.
+    """
+    for key, value in more.items():
+        stats[key] = stats.get(key, 0) + value
+    return stats
+
+
+def ingest_teller_transactions(account_id, txns_list):
+    """
+    Normalize and bulk upsert one batch of raw Teller transactions for an
+    account. Does not commit. Returns the bulk_upsert_transactions stats.
+    """
+    return bulk_upsert_transactions(
+        normalize_teller_transaction(txn, account_id) for txn in txns_list
+    )
+
+
+def apply_teller_account_data(account, fetched, stats=None):
+    """
+    Applies payloads returned by fetch_teller_account_data to the database.
+    Updates the account balance, bulk upserts transactions and records today's
+    balance history. Must run on the thread that owns the database session.
+    If a stats dict is given, transaction ingest counts are added to it.
+    Returns True if any update occurred.
+    """
+    updated = False
+
+    # --- Refresh Balance ---
+    balance_json = fetched.get("balance")
+    if balance_json is not None:
         new_balance = account.balance  # default fallback
 
         # Check if response contains the "available" key
@@ -207,10 +646,13 @@ def refresh_data_for_teller_account(
             # For credit/liability accounts: use the ledger value and invert its sign
             if account_type in ["credit", "liability"]:
                 try:
-                    ledger_value = float(balance_json.get("ledger", account.balance))
+                    ledger_value = to_decimal(
+                        balance_json.get("ledger", account.balance)
+                    )
                     new_balance = -ledger_value  # Invert the sign for credit accounts
                     logger.debug(
-                        f"Inverting ledger balance for credit account {account.account_id}: {ledger_value} -> {new_balance}"
+                        "Inverting ledger balance for credit account %s",
+                        account.account_id,
                     )
                 except Exception as e:
                     logger.error(f"Error parsing 'ledger' balance: {e}", exc_info=True)
@@ -218,9 +660,12 @@ def refresh_data_for_teller_account(
             else:
                 # For depository accounts: use the available value
                 try:
-                    new_balance = float(balance_json.get("available", account.balance))
+                    new_balance = to_decimal(
+                        balance_json.get("available", account.balance)
+                    )
                     logger.debug(
-                        f"Using available balance for depository account {account.account_id}: {new_balance}"
+                        "Using available balance for depository account %s",
+                        account.account_id,
                     )
                 except Exception as e:
                     logger.error(
@@ -230,14 +675,16 @@ def refresh_data_for_teller_account(
 
         # Fallback: Check if response contains a nested "balance" key
         elif isinstance(balance_json, dict) and "balance" in balance_json:
-            new_balance = (
+            new_balance = to_decimal(
                 balance_json.get("balance", {}).get("current", account.balance) or 0
             )
             logger.debug("Extracted balance using nested 'balance' key.")
         elif isinstance(balance_json, dict) and "balances" in balance_json:
             balances_list = balance_json.get("balances", [])
             if balances_list:
-                new_balance = balances_list[0].get("current", account.balance) or 0
+                new_balance = to_decimal(
+                    balances_list[0].get("current", account.balance) or 0
+                )
                 logger.debug(
                     "Extracted balance from the first element of 'balances' list."
                 )
@@ -248,163 +695,137 @@ def refresh_data_for_teller_account(
                 new_balance = account.balance
         else:
             logger.warning(
-                f"Unexpected balance response format for account {account.account_id}: {balance_json}"
+                "Unexpected balance response format for account %s (keys: %s)",
+                account.account_id,
+                sorted(balance_json) if isinstance(balance_json, dict) else None,
             )
             new_balance = account.balance
 
         if new_balance != account.balance:
-            logger.debug(
-                f"Account {account.account_id}: Balance updated from {account.balance} to {new_balance}"
-            )
+            logger.debug("Account %s: balance updated", account.account_id)
             account.balance = new_balance
             updated = True
         else:
-            logger.debug(
-                f"Account {account.account_id}: Balance remains unchanged: {account.balance}"
-            )
-    else:
-        logger.error(
-            f"Failed to refresh balance for account {account.account_id}: {resp_balance.text}"
-        )
+            logger.debug("Account %s: balance unchanged", account.account_id)
 
     # --- Refresh Transactions ---
-    url_txns = f"{teller_api_base_url}/accounts/{account.account_id}/transactions"
-    logger.debug(
-        f"Requesting transactions for account {account.account_id} from {url_txns}"
-    )
-    resp_txns = fetch_url_with_backoff(
-        url_txns, cert=(teller_dot_cert, teller_dot_key), auth=(access_token, "")
-    )
-    if resp_txns.status_code == 200:
+    txns_list = fetched.get("transactions")
+    if txns_list is not None:
+        ingest_stats = ingest_teller_transactions(account.account_id, txns_list)
         logger.debug(
-            f"Transactions response for account {account.account_id}: {resp_txns.text}"
+            "Transactions for account %s: %s", account.account_id, ingest_stats
         )
-        txns_json = resp_txns.json()
-        with open(TRANSACTIONS_RAW, "w") as f:
-            json.dump(txns_json, f, indent=4)
-        if isinstance(txns_json, dict) and "transactions" in txns_json:
-            txns_list = txns_json.get("transactions", [])
-        elif isinstance(txns_json, list):
-            txns_list = txns_json
-        else:
-            txns_list = []
-
-        for txn in txns_list:
-            txn_id = txn.get("id")
-            if not txn_id:
-                logger.warning(
-                    "Encountered a transaction without an 'id'; skipping this transaction."
-                )
-                continue
-
-            try:
-                existing_txn = Transaction.query.filter_by(
-                    transaction_id=txn_id
-                ).first()
-            except Exception as ex:
-                logger.error(
-                    f"Error querying transaction {txn_id}: {ex}", exc_info=True
-                )
-                existing_txn = None
-
-            # Process transaction details.
-            details = txn.get("details", {}) or {}
-            category = details.get("category")
-            if isinstance(category, list) and category:
-                category = category[-1] or "Unknown"
-            else:
-                category = category or "Unknown"
-
-            counterparty = details.get("counterparty")
-            merchant_name = "Unknown"
-            merchant_typ = "Unknown"
-            if isinstance(counterparty, list):
-                if counterparty and isinstance(counterparty[0], dict):
-                    merchant_name = counterparty[0].get("name", "Unknown")
-                    merchant_typ = counterparty[0].get("type", "Unknown")
-                else:
-                    logger.debug(
-                        f"Counterparty list for transaction {txn_id} is empty or improperly formatted."
-                    )
-            elif isinstance(counterparty, dict):
-                merchant_name = counterparty.get("name", "Unknown")
-                merchant_typ = counterparty.get("type", "Unknown")
-            else:
-                logger.debug(
-                    f"Counterparty for transaction {txn_id} is of unexpected type: {type(counterparty)}"
-                )
-
-            if existing_txn:
-                logger.debug(
-                    f"Updating existing transaction {txn_id} for account {account.account_id}."
-                )
-                existing_txn.amount = txn.get("amount") or 0
-                existing_txn.date = txn.get("date") or ""
-                existing_txn.description = txn.get("description") or ""
-                existing_txn.category = category
-                existing_txn.merchant_name = merchant_name
-                existing_txn.merchant_typ = merchant_typ
-            else:
-                logger.debug(
-                    f"Inserting new transaction {txn_id} for account {account.account_id}."
-                )
-                new_txn = Transaction(
-                    transaction_id=txn_id,
-                    account_id=account.account_id,
-                    amount=txn.get("amount") or 0,
-                    date=txn.get("date") or "",
-                    description=txn.get("description") or "",
-                    category=category,
-                    merchant_name=merchant_name,
-                    merchant_typ=merchant_typ,
-                )
-                db.session.add(new_txn)
+        if stats is not None:
+            merge_stats(stats, ingest_stats)
         updated = True
-    else:
-        logger.error(
-            f"Failed to refresh transactions for account {account.account_id}: {resp_txns.text}"
-        )
+    elif fetched.get("transaction_count"):
+        # Already ingested batch by batch through fetch's on_batch.
+        updated = True
+    if fetched.get("transactions_complete") and fetched.get("newest_transaction"):
+        update_teller_watermark(account, [fetched["newest_transaction"]])
 
     # --- Update Last Refreshed and Account History ---
-    today = datetime.today()
+    today = date.today()
     existing_history = AccountHistory.query.filter_by(
         account_id=account.account_id, date=today
     ).first()
     if not existing_history:
-        logger.debug(
-            f"Creating new history record for account {account.account_id} for date {today}."
-        )
+        logger.debug("Creating history record for account %s", account.account_id)
         history_record = AccountHistory(
             account_id=account.account_id, date=today, balance=account.balance
         )
         db.session.add(history_record)
         updated = True
     else:
-        logger.debug(
-            f"History record already exists for account {account.account_id} for date {today}."
-        )
+        logger.debug("History record already exists for account %s", account.account_id)
 
     return updated
 
 
-def refresh_data_for_plaid_account(account, access_token, plaid_base_url):
+def refresh_data_for_teller_account(
+    account, access_token, teller_dot_cert, teller_dot_key, teller_api_base_url
+):
     """
-    Refreshes a Plaid-linked account by querying the Plaid API.
-    It refreshes the account balance and transactions by calling:
-      - /accounts/get to fetch balance information.
-      - /transactions/get to fetch recent transactions.
-    Updates the account record in the SQL database accordingly.
-    Also upserts each transaction in the Transactions table.
-    Returns True if any update occurred.
+    Refreshes account balance and transactions by querying the Teller API.
+    Updates the account balance and adds/updates transactions accordingly.
+    """
+    fetched = fetch_teller_account_data(
+        account.account_id,
+        access_token,
+        teller_dot_cert,
+        teller_dot_key,
+        teller_api_base_url,
+        watermark=get_teller_watermarks([account.account_id]).get(account.account_id),
+    )
+    return apply_teller_account_data(account, fetched)
+
+
+def fetch_plaid_transactions(access_token, plaid_base_url, days=30, page_size=500):
+    """
+    Fetch every transaction of an item for the last `days` days from Plaid's
+    /transactions/get, following offset pagination until total_transactions
+    have been read. Each page is parsed incrementally from the response
+    stream and yielded as a list of at most page_size raw transactions (for
+    all accounts of the item), so callers can ingest batch by batch.
+    """
+    url_txns = f"{plaid_base_url}/transactions/get"
+    start_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    end_date = datetime.now().strftime("%Y-%m-%d")
+    offset = 0
+    while True:
+        payload_txns = {
+            "client_id": PLAID_CLIENT_ID,
+            "secret": PLAID_SECRET,
+            "access_token": access_token,
+            "start_date": start_date,
+            "end_date": end_date,
+            "options": {"count": page_size, "offset": offset},
+        }
+        resp_txns = plaid_client().post(
+            url_txns, json=payload_txns, rate_key=access_token, stream=True
+        )
+        with resp_txns:
+            logger.debug("Plaid transactions response: %s", resp_txns.status_code)
+            if resp_txns.status_code != 200:
+                raise RuntimeError(
+                    f"Plaid /transactions/get failed: {resp_txns.status_code} - {resp_txns.text}"
+                )
+            parser = StreamingJSONParser.from_response(resp_txns)
+            page = [txn for _, txn in parser.items(("transactions",))]
+        raw_archive.archive(
+            "plaid",
+            "transactions",
+            {**parser.fields, "transactions": page},
+            item_id=parser.fields.get("item", {}).get("item_id"),
+        )
+        offset += len(page)
+        if page:
+            yield page
+        total = parser.fields.get("total_transactions", offset)
+        if not page or offset >= total:
+            return
+
+
+def refresh_plaid_item(access_token, accounts, plaid_base_url, mode="get"):
+    """
+    Refreshes every account that shares one Plaid access token (item) with a
+    single round of API calls, fanning the results out to each account:
+      - one /accounts/get for all balances,
+      - one paginated /transactions/get when mode is "get", or an incremental
+        /transactions/sync through the item's cursor when mode is "sync"
+        (mode None refreshes balances only).
+    Does not commit. Returns a dict with the ids of accounts that changed and
+    ingest stats. If fetching transactions fails, everything they wrote is
+    rolled back, last_refreshed is left alone and the dict carries "error".
     """
-    updated = False
     now = datetime.utcnow()
+    accounts_by_id = {account.account_id: account for account in accounts}
+    updated_ids = set()
+    stats = {}
 
-    logger.debug(
-        f"Called refresh_data_for_plaid_account for account {account.account_id}"
-    )
+    logger.debug("Refreshing Plaid item with %d accounts", len(accounts_by_id))
 
-    # --- Refresh Balance ---
+    # --- Refresh Balances ---
     url_balance = f"{plaid_base_url}/accounts/get"
     payload_balance = {
         "client_id": PLAID_CLIENT_ID,
@@ -412,161 +833,239 @@ def refresh_data_for_plaid_account(account, access_token, plaid_base_url):
         "access_token": access_token,
     }
     try:
-        resp_balance = requests.post(url_balance, json=payload_balance)
-        logger.debug(
-            f"Plaid balance response for account {account.account_id}: {resp_balance.status_code} - {resp_balance.text}"
+        resp_balance = plaid_client().post(
+            url_balance, json=payload_balance, rate_key=access_token
         )
+        logger.debug("Plaid balance response: %s", resp_balance.status_code)
         if resp_balance.status_code == 200:
             data = resp_balance.json()
-            # Optional: Save raw response for debugging.
-            with open(TRANSACTIONS_RAW_ENRICHED, "w") as f:
-                json.dump(data, f, indent=4)
-            accounts_list = data.get("accounts", [])
-            plaid_account = next(
-                (
-                    acc
-                    for acc in accounts_list
-                    if acc.get("account_id") == account.account_id
-                ),
-                None,
+            raw_archive.archive(
+                "plaid",
+                "accounts",
+                data,
+                item_id=data.get("item", {}).get("item_id"),
             )
-            if plaid_account:
+            plaid_accounts = {
+                acc.get("account_id"): acc for acc in data.get("accounts", [])
+            }
+            for account_id, account in accounts_by_id.items():
+                plaid_account = plaid_accounts.get(account_id)
+                if not plaid_account:
+                    logger.warning(
+                        f"Account {account_id} not found in Plaid balance response."
+                    )
+                    continue
                 try:
-                    new_balance = float(
+                    new_balance = to_decimal(
                         plaid_account.get("balances", {}).get(
                             "current", account.balance
                         )
                     )
                 except Exception as e:
                     logger.error(
-                        f"Error parsing Plaid balance for account {account.account_id}: {e}",
+                        f"Error parsing Plaid balance for account {account_id}: {e}",
                         exc_info=True,
                     )
                     new_balance = account.balance
 
                 if new_balance != account.balance:
-                    logger.debug(
-                        f"Account {account.account_id}: Balance updated from {account.balance} to {new_balance}"
-                    )
+                    logger.debug("Account %s: balance updated", account_id)
                     account.balance = new_balance
-                    updated = True
+                    updated_ids.add(account_id)
                 else:
-                    logger.debug(
-                        f"Account {account.account_id}: Balance remains unchanged: {account.balance}"
-                    )
-            else:
-                logger.warning(
-                    f"Account {account.account_id} not found in Plaid balance response."
-                )
+                    logger.debug("Account %s: balance unchanged", account_id)
         else:
-            logger.error(
-                f"Failed to refresh Plaid balance for account {account.account_id}: {resp_balance.text}"
-            )
+            logger.error(f"Failed to refresh Plaid balances: {resp_balance.text}")
     except Exception as e:
-        logger.error(
-            f"Exception while refreshing Plaid balance for account {account.account_id}: {e}",
-            exc_info=True,
-        )
+        logger.error(f"Exception while refreshing Plaid balances: {e}", exc_info=True)
 
     # --- Refresh Transactions ---
-    url_txns = f"{plaid_base_url}/transactions/get"
-    start_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-    end_date = datetime.now().strftime("%Y-%m-%d")
-    payload_txns = {
-        "client_id": PLAID_CLIENT_ID,
-        "secret": PLAID_SECRET,
-        "access_token": access_token,
-        "start_date": start_date,
-        "end_date": end_date,
-    }
+    # Pages are written inside a savepoint so a failed fetch leaves none of
+    # them behind (and, in sync mode, no cursor that skips past them).
+    savepoint = db.session.begin_nested()
     try:
-        resp_txns = requests.post(url_txns, json=payload_txns, timeout=10)
-        logger.debug(
-            f"Plaid transactions response for account {account.account_id}: {resp_txns.status_code} - {resp_txns.text}"
-        )
-        if resp_txns.status_code == 200:
-            txns_json = resp_txns.json()
-            # Optional: Save raw transactions response for auditing.
-            with open(TRANSACTIONS_RAW_ENRICHED, "w") as f:
-                json.dump(txns_json, f, indent=4)
-            transactions = txns_json.get("transactions", [])
-            if transactions:
-                for txn in transactions:
-                    txn_id = txn.get("transaction_id")
-                    if not txn_id:
-                        logger.warning(
-                            "Encountered a transaction without a 'transaction_id'; skipping."
-                        )
-                        continue
-
-                    existing_txn = Transaction.query.filter_by(
-                        transaction_id=txn_id
-                    ).first()
-
-                    # Extract common fields
-                    amount = txn.get("amount") or 0
-                    date_str = txn.get("date") or txn.get("authorized_date") or ""
-                    # Use the 'name' field as description if available; fallback to merchant_name.
-                    description = txn.get("name") or txn.get("merchant_name") or ""
-
-                    # Process category: if a list is provided, use the last element.
-                    category_list = txn.get("category")
-                    if isinstance(category_list, list) and category_list:
-                        category = category_list[-1] or "Unknown"
-                    else:
-                        category = "Unknown"
-
-                    # Process merchant details:
-                    merchant_name = txn.get("merchant_name") or "Unknown"
-                    merchant_typ = "Unknown"
-                    counterparties = txn.get("counterparties")
-                    if isinstance(counterparties, list) and counterparties:
-                        merchant_typ = counterparties[0].get("type", "Unknown")
-
-                    if existing_txn:
-                        logger.debug(
-                            f"Updating existing transaction {txn_id} for account {account.account_id}."
-                        )
-                        existing_txn.amount = amount
-                        existing_txn.date = date_str
-                        existing_txn.description = description
-                        existing_txn.category = category
-                        existing_txn.merchant_name = merchant_name
-                        existing_txn.merchant_typ = merchant_typ
-                    else:
-                        logger.debug(
-                            f"Inserting new transaction {txn_id} for account {account.account_id}."
-                        )
-                        new_txn = Transaction(
-                            transaction_id=txn_id,
-                            account_id=account.account_id,
-                            amount=amount,
-                            date=date_str,
-                            description=description,
-                            category=category,
-                            merchant_name=merchant_name,
-                            merchant_typ=merchant_typ,
-                        )
-                        db.session.add(new_txn)
-                updated = True
+        if mode == "get":
+            stats = {"inserted": 0, "updated": 0, "skipped": 0}
+            for page in fetch_plaid_transactions(access_token, plaid_base_url):
+                rows = []
+                for txn in page:
+                    # Attribute each transaction to its own account within the item.
+                    account_id = txn.get("account_id")
+                    if account_id in accounts_by_id:
+                        rows.append(normalize_plaid_transaction(txn, account_id))
+                        updated_ids.add(account_id)
+                merge_stats(stats, bulk_upsert_transactions(rows))
+        elif mode == "sync":
+            item = PlaidItem.query.filter_by(access_token=access_token).first()
+            if item:
+                stats = sync_plaid_item_transactions(item, plaid_base_url)
+                if stats["inserted"] or stats["updated"] or stats["removed"]:
+                    updated_ids.update(accounts_by_id)
             else:
-                logger.debug(
-                    f"No transactions found in Plaid response for account {account.account_id}."
+                logger.warning(
+                    "No PlaidItem stored for this access token; skipping sync."
                 )
-        else:
-            logger.error(
-                f"Failed to refresh Plaid transactions for account {account.account_id}: {resp_txns.text}"
-            )
+        savepoint.commit()
+        logger.debug("Plaid item transactions refreshed: %s", stats)
     except Exception as e:
+        savepoint.rollback()
         logger.error(
-            f"Exception while refreshing Plaid transactions for account {account.account_id}: {e}",
-            exc_info=True,
+            f"Exception while refreshing Plaid transactions: {e}", exc_info=True
         )
+        return {"updated_accounts": set(), "transactions": {}, "error": str(e)}
 
     # --- Update Last Refreshed ---
-    account.last_refreshed = now
+    for account in accounts_by_id.values():
+        account.last_refreshed = now
 
-    return updated
+    return {"updated_accounts": updated_ids, "transactions": stats}
+
+
+def refresh_data_for_plaid_account(
+    account, access_token, plaid_base_url, fetch_transactions=True
+):
+    """
+    Refreshes a single Plaid-linked account by querying the Plaid API.
+    Prefer refresh_plaid_item when several accounts share an access token,
+    since this still pulls the whole item's balances and transactions.
+    Returns True if any update occurred.
+    """
+    result = refresh_plaid_item(
+        access_token,
+        [account],
+        plaid_base_url,
+        mode="get" if fetch_transactions else None,
+    )
+    return account.account_id in result["updated_accounts"]
+
+
+def fetch_plaid_transactions_sync(
+    access_token,
+    cursor,
+    plaid_base_url,
+    page_size=500,
+    max_restarts=3,
+    on_batch=None,
+):
+    """
+    Page through Plaid's /transactions/sync starting at cursor until has_more
+    is false. If Plaid reports the data changed mid-pagination, the whole
+    pass restarts from the original cursor as Plaid recommends.
+    Returns a dict with the added, modified and removed lists plus next_cursor.
+
+    Pages are parsed incrementally from the response stream. If on_batch is
+    given, each page's added and modified transactions are passed to
+    on_batch(list) as they arrive instead of being returned (upserts are
+    idempotent, so a restart simply replays them).
+    """
+    url = f"{plaid_base_url}/transactions/sync"
+    for attempt in range(1, max_restarts + 1):
+        deltas = {"added": [], "modified": [], "removed": [], "next_cursor": cursor}
+        page_cursor = cursor
+        restart = False
+        while True:
+            payload = {
+                "client_id": PLAID_CLIENT_ID,
+                "secret": PLAID_SECRET,
+                "access_token": access_token,
+                "count": page_size,
+            }
+            if page_cursor:
+                payload["cursor"] = page_cursor
+            resp = plaid_client().post(
+                url, json=payload, rate_key=access_token, stream=True
+            )
+            with resp:
+                if resp.status_code != 200:
+                    if (
+                        resp.json().get("error_code")
+                        == "TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION"
+                    ):
+                        logger.warning(
+                            f"Plaid data changed during sync pagination; restarting (attempt {attempt})."
+                        )
+                        restart = True
+                        break
+                    raise RuntimeError(
+                        f"Plaid /transactions/sync failed: {resp.status_code} - {resp.text}"
+                    )
+                parser = StreamingJSONParser.from_response(resp)
+                page = {"added": [], "modified": [], "removed": []}
+                for key, txn in parser.items(tuple(page)):
+                    page[key].append(txn)
+            data = {**parser.fields, **page}
+
+            raw_archive.archive(
+                "plaid",
+                "transactions_sync",
+                data,
+                item_id=data.get("item", {}).get("item_id"),
+            )
+            if on_batch is None:
+                deltas["added"].extend(page["added"])
+                deltas["modified"].extend(page["modified"])
+            elif page["added"] or page["modified"]:
+                on_batch(page["added"] + page["modified"])
+            deltas["removed"].extend(page["removed"])
+            page_cursor = data.get("next_cursor")
+            deltas["next_cursor"] = page_cursor
+            if not data.get("has_more"):
+                break
+        if not restart:
+            return deltas
+    raise RuntimeError("Plaid /transactions/sync kept changing during pagination.")
+
+
+def sync_plaid_item_transactions(item, plaid_base_url):
+    """
+    Incrementally sync transactions for one PlaidItem using its stored cursor.
+    Added and modified transactions are bulk upserted onto their own accounts,
+    removed transactions are deleted, and the new cursor is saved only once
+    all deltas are written. Transactions are upserted page by page as they
+    stream in. Does not commit, so the caller commits the pages together with
+    the cursor that covers them. Returns a stats dict.
+    """
+    # Only keep transactions for accounts we actually track.
+    known_accounts = set(
+        db.session.execute(
+            select(Account.account_id).where(Account.access_token == item.access_token)
+        ).scalars()
+    )
+    stats = {"inserted": 0, "updated": 0, "skipped": 0}
+
+    def ingest(txns):
+        rows = [
+            normalize_plaid_transaction(txn, txn.get("account_id"))
+            for txn in txns
+            if txn.get("account_id") in known_accounts
+        ]
+        merge_stats(stats, bulk_upsert_transactions(rows))
+
+    deltas = fetch_plaid_transactions_sync(
+        item.access_token, item.sync_cursor, plaid_base_url, on_batch=ingest
+    )
+
+    removed_ids = [
+        txn.get("transaction_id")
+        for txn in deltas["removed"]
+        if txn.get("transaction_id")
+    ]
+    stats["removed"] = 0
+    for start in range(0, len(removed_ids), 500):
+        result = db.session.execute(
+            delete(Transaction).where(
+                Transaction.transaction_id.in_(removed_ids[start : start + 500])
+            )
+        )
+        stats["removed"] += result.rowcount
+    if stats["removed"]:
+        invalidate_transaction_counts()
+
+    item.sync_cursor = deltas["next_cursor"]
+    item.updated_at = datetime.utcnow()
+    db.session.flush()
+    logger.debug("Plaid sync for item %s complete: %s", item.item_id, stats)
+    return stats
 
 
 def get_accounts_from_db():
@@ -585,7 +1084,8 @@ def get_accounts_from_db():
                 "subtype": acc.subtype or "Unknown",
                 "status": acc.status or "Unknown",
                 "institution_name": acc.institution_name or "Unknown",
-                "balance": acc.balance if acc.balance is not None else 0,
+                "balance": to_json(acc.balance),
+                "iso_currency_code": acc.iso_currency_code,
                 "last_refreshed": acc.last_refreshed.isoformat()
                 if acc.last_refreshed
                 else None,
@@ -595,32 +1095,347 @@ def get_accounts_from_db():
     return serialized
 
 
-def get_paginated_transactions(page, page_size):
+def serialize_transaction(txn, acc):
     """
-    Returns a tuple (transactions_list, total_count) where each transaction record
-    includes fields from both the Transaction and the associated Account.
+    Serialize a transaction together with fields of its account.
     """
-    query = (
+    return {
+        "transaction_id": txn.transaction_id,
+        "date": txn.date.isoformat() if txn.date else "",
+        "posted_at": txn.posted_at.isoformat() if txn.posted_at else None,
+        "amount": to_json(txn.amount),
+        "iso_currency_code": txn.iso_currency_code,
+        "description": txn.description or "",
+        "category": txn.category or "Unknown",
+        "merchant_name": txn.merchant_name or "Unknown",
+        # Account fields:
+        "account_name": acc.name or "Unnamed Account",
+        "institution_name": acc.institution_name or "Unknown",
+        "subtype": acc.subtype or "Unknown",
+    }
+
+
+# Server-side sort keys of the listing. Each is backed by an index on
+# (column, id), or (column, date, id) for the filterable text columns, so
+# ordering and keyset seeks never sort the table.
+TRANSACTION_SORT_KEYS = {
+    "date": Transaction.date,
+    "amount": Transaction.amount,
+    "category": Transaction.category,
+    "merchant_name": Transaction.merchant_name,
+}
+
+
+def parse_transaction_filters(args):
+    """
+    Build a listing filter set from request arguments: start_date and
+    end_date (inclusive, YYYY-MM-DD), account_id, category, merchant_name,
+    min_amount and max_amount (inclusive) and user_modified (true/false).
+    Missing or empty arguments are left out. Raises ValueError on malformed
+    values.
+    """
+    filters = {}
+    for name in ("start_date", "end_date"):
+        if args.get(name):
+            try:
+                filters[name] = date.fromisoformat(args[name])
+            except ValueError:
+                raise ValueError(f"Invalid {name} '{args[name]}'") from None
+    for name in ("account_id", "category", "merchant_name"):
+        if args.get(name):
+            filters[name] = args[name]
+    for name in ("min_amount", "max_amount"):
+        if args.get(name):
+            filters[name] = to_decimal(args[name])
+    if args.get("user_modified"):
+        value = args["user_modified"].lower()
+        if value not in ("true", "false"):
+            raise ValueError(f"Invalid user_modified '{args['user_modified']}'")
+        filters["user_modified"] = value == "true"
+    return filters
+
+
+def _filter_conditions(filters):
+    conditions = []
+    if "start_date" in filters:
+        conditions.append(Transaction.date >= filters["start_date"])
+    if "end_date" in filters:
+        conditions.append(Transaction.date <= filters["end_date"])
+    for name in ("account_id", "category", "merchant_name"):
+        if name in filters:
+            conditions.append(getattr(Transaction, name) == filters[name])
+    if "min_amount" in filters:
+        conditions.append(Transaction.amount >= filters["min_amount"])
+    if "max_amount" in filters:
+        conditions.append(Transaction.amount <= filters["max_amount"])
+    if "user_modified" in filters:
+        # Rows from before user_modified existed hold NULL, i.e. false.
+        conditions.append(
+            func.coalesce(Transaction.user_modified, False) == filters["user_modified"]
+        )
+    return conditions
+
+
+def _listing_query(filters=None):
+    return (
         db.session.query(Transaction, Account)
         .join(Account, Transaction.account_id == Account.account_id)
-        .order_by(Transaction.date.desc())
+        .filter(*_filter_conditions(filters or {}))
     )
-    total = query.count()
+
+
+def _sort_column(sort):
+    if sort not in TRANSACTION_SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort}'")
+    return TRANSACTION_SORT_KEYS[sort]
+
+
+def _check_order(order):
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Unknown sort order '{order}'")
+
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def invalidate_transaction_counts():
+    with _count_lock:
+        _count_cache.clear()
+
+
+def count_transactions(filters=None):
+    """
+    Return the number of listed transactions matching `filters`. Each filter
+    set's count is cached for TRANSACTION_COUNT_CACHE_TTL seconds and every
+    count is dropped whenever ingest inserts, updates or removes
+    transactions, so paging does not pay for a full count each time.
+    """
+    filters = filters or {}
+    key = tuple(sorted(filters.items()))
+    with _count_lock:
+        cached = _count_cache.get(key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+    total = _listing_query(filters).with_entities(func.count(Transaction.id)).scalar()
+    with _count_lock:
+        _count_cache[key] = (total, time.monotonic() + TRANSACTION_COUNT_CACHE_TTL)
+    return total
+
+
+def get_paginated_transactions(
+    page, page_size, include_total=True, filters=None, sort="date", order="desc"
+):
+    """
+    Returns a tuple (transactions_list, total_count) where each transaction record
+    includes fields from both the Transaction and the associated Account.
+    `filters` is a parse_transaction_filters() dict; rows are ordered by the
+    `sort` key (see TRANSACTION_SORT_KEYS) in `order`, then by id, with
+    missing values last. total_count is None unless include_total. Deep pages
+    get slower with OFFSET; prefer get_transactions_page.
+    """
+    column = _sort_column(sort)
+    _check_order(order)
+    if order == "desc":
+        ordering = (column.desc().nulls_last(), Transaction.id.desc())
+    else:
+        ordering = (column.asc().nulls_last(), Transaction.id.asc())
+    query = _listing_query(filters).order_by(*ordering)
+    total = count_transactions(filters) if include_total else None
     results = query.offset((page - 1) * page_size).limit(page_size).all()
-    serialized = []
-    for txn, acc in results:
-        serialized.append(
-            {
-                "transaction_id": txn.transaction_id,
-                "date": txn.date or "",
-                "amount": txn.amount if txn.amount is not None else 0,
-                "description": txn.description or "",
-                "category": txn.category or "Unknown",
-                "merchant_name": txn.merchant_name or "Unknown",
-                # Account fields:
-                "account_name": acc.name or "Unnamed Account",
-                "institution_name": acc.institution_name or "Unknown",
-                "subtype": acc.subtype or "Unknown",
-            }
+    return [serialize_transaction(txn, acc) for txn, acc in results], total
+
+
+def encode_cursor(txn, sort="date", order="desc"):
+    """
+    Return an opaque cursor pointing at a transaction's place in the listing
+    ordered by `sort` and `order`.
+    """
+    value = getattr(txn, sort)
+    if isinstance(value, date):
+        value = value.isoformat()
+    elif value is not None and sort == "amount":
+        value = str(value)
+    raw = json.dumps([sort, order, value, txn.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort="date", order="desc"):
+    """
+    Return the (sort value, id) a cursor points at. Raises ValueError if it
+    is malformed or was issued for a different sort key or order.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_order, value, txn_id = json.loads(raw)
+        if value is not None:
+            if sort == "date":
+                value = date.fromisoformat(value)
+            elif sort == "amount":
+                value = to_decimal(value)
+            elif not isinstance(value, str):
+                raise ValueError(value)
+        position = (value, int(txn_id))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor '{cursor}'") from None
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError(f"Cursor '{cursor}' belongs to another sort order")
+    return position
+
+
+def _keyset_segments(column, descending, position, backwards):
+    """
+    Return the (filter, ordering) segments to read after (or, backwards,
+    before) a (value, id) position, in reading order. The listing is rows
+    with a `column` value by (value, id), then rows without one by id, all
+    descending or all ascending. Each segment is a plain range on the
+    (column, id) index; NULLs live in their own segment because mixing them
+    into one OR condition stops SQLite from seeking.
+    """
+    present, missing = column.isnot(None), column.is_(None)
+    key = tuple_(column, Transaction.id)
+    # Reading backwards walks the listing in the opposite direction.
+    reading_desc = descending != backwards
+    if reading_desc:
+        ordering = (column.desc(), Transaction.id.desc())
+        id_ordering = (Transaction.id.desc(),)
+    else:
+        ordering = (column.asc(), Transaction.id.asc())
+        id_ordering = (Transaction.id.asc(),)
+
+    def beyond(left, right):
+        return left < right if reading_desc else left > right
+
+    value, txn_id = position or (None, None)
+    if not backwards:
+        if position is None:
+            return [(present, ordering), (missing, id_ordering)]
+        if value is not None:
+            return [
+                (and_(present, beyond(key, (value, txn_id))), ordering),
+                (missing, id_ordering),
+            ]
+        return [(and_(missing, beyond(Transaction.id, txn_id)), id_ordering)]
+    if value is not None:
+        return [(and_(present, beyond(key, (value, txn_id))), ordering)]
+    return [
+        (and_(missing, beyond(Transaction.id, txn_id)), id_ordering),
+        (present, ordering),
+    ]
+
+
+def get_transactions_page(
+    page_size,
+    cursor=None,
+    direction="next",
+    include_total=False,
+    filters=None,
+    sort="date",
+    order="desc",
+):
+    """
+    Keyset pagination over the transaction listing, filtered by `filters` (a
+    parse_transaction_filters() dict) and ordered by the `sort` key in
+    `order` (default: newest first). Returns the page_size transactions after
+    `cursor` (direction "next") or before it ("prev"; requires a cursor),
+    seeking on (sort value, id) so every page costs the same however deep it
+    is. A cursor is only valid for the sort and order it was issued for.
+
+    Returns a dict with "transactions", "next_cursor" and "prev_cursor"
+    (None at either end of the listing) and, if include_total, the cached
+    "total" of the filter set.
+    """
+    column = _sort_column(sort)
+    _check_order(order)
+    if direction not in ("next", "prev"):
+        raise ValueError(f"Unknown direction '{direction}'")
+    backwards = direction == "prev"
+    if backwards and not cursor:
+        raise ValueError("direction 'prev' requires a cursor")
+    position = decode_cursor(cursor, sort, order) if cursor else None
+
+    # Read one extra row to learn whether another page follows.
+    rows = []
+    segments = _keyset_segments(column, order == "desc", position, backwards)
+    for condition, ordering in segments:
+        remaining = page_size + 1 - len(rows)
+        if remaining <= 0:
+            break
+        rows += (
+            _listing_query(filters)
+            .filter(condition)
+            .order_by(*ordering)
+            .limit(remaining)
+            .all()
+        )
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    more_after = has_more if not backwards else bool(rows)
+    more_before = has_more if backwards else position is not None
+    page = {
+        "transactions": [serialize_transaction(txn, acc) for txn, acc in rows],
+        "next_cursor": (
+            encode_cursor(rows[-1][0], sort, order) if rows and more_after else None
+        ),
+        "prev_cursor": (
+            encode_cursor(rows[0][0], sort, order) if rows and more_before else None
+        ),
+    }
+    if include_total:
+        page["total"] = count_transactions(filters)
+    return page
+
+
+def search_transactions(query, limit=50, offset=0, filters=None, include_total=False):
+    """
+    Full-text search of transaction descriptions and merchant names (see
+    transaction_search), best matches first, optionally narrowed by
+    `filters` (a parse_transaction_filters() dict). Each result is a
+    serialized transaction with a "snippet" of the matched text. Raises
+    ValueError if the query has no searchable words.
+
+    Returns a dict with "transactions" and, if include_total, "total".
+    """
+    terms = transaction_search.search_terms(query)
+    if not terms:
+        raise ValueError("Search query has no searchable words")
+    matches = transaction_search.match_query(terms, db.engine.dialect.name)
+    if filters:
+        # Rank the matches once, then keep those that pass the filters. The
+        # CTE is materialized so the database cannot turn it into a search
+        # per filtered row.
+        ranked = matches.cte("matches").prefix_with("MATERIALIZED")
+        listing = _listing_query(filters).join(ranked, ranked.c.id == Transaction.id)
+        listing = listing.order_by(ranked.c.rank, Transaction.id.desc())
+        rows = listing.offset(offset).limit(limit).all()
+    else:
+        # Rank and page inside the search index, then load only the rows of
+        # the page.
+        ranked = (
+            matches.order_by(literal_column("rank"), literal_column("id").desc())
+            .offset(offset)
+            .limit(limit)
+            .subquery()
+        )
+        listing = _listing_query().join(ranked, ranked.c.id == Transaction.id)
+        rows = listing.order_by(ranked.c.rank, Transaction.id.desc()).all()
+    results = []
+    for txn, acc in rows:
+        serialized = serialize_transaction(txn, acc)
+        serialized["snippet"] = transaction_search.snippet(
+            terms, txn.description, txn.merchant_name
+        )
+        results.append(serialized)
+    page = {"transactions": results}
+    if include_total:
+        matching_ids = select(matches.subquery().c.id)
+        page["total"] = (
+            _listing_query(filters)
+            .filter(Transaction.id.in_(matching_ids))
+            .with_entities(func.count(Transaction.id))
+            .scalar()
         )
-    return serialized, total
+    return page
@@ -0,0 +1,67 @@
+# File: app/sql/dialect.py
+
+"""
+SQL constructs whose spelling differs between the supported databases
+(SQLite and PostgreSQL). Each compiles to the native function of the
+dialect in use, so queries stay portable and can still use indexes.
+"""
+
+from sqlalchemy import String
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+# granularity -> (SQLite strftime format, PostgreSQL to_char format)
+DATE_BUCKET_FORMATS = {
+    "day": ("%Y-%m-%d", "YYYY-MM-DD"),
+    "month": ("%m-%Y", "MM-YYYY"),
+}
+
+
+class _DateBucket(FunctionElement):
+    type = String()
+    inherit_cache = True
+    granularity = None
+
+
+class _DayBucket(_DateBucket):
+    inherit_cache = True
+    granularity = "day"
+
+
+class _MonthBucket(_DateBucket):
+    inherit_cache = True
+    granularity = "month"
+
+
+_BUCKETS = {bucket.granularity: bucket for bucket in (_DayBucket, _MonthBucket)}
+
+
+def date_bucket(column, granularity):
+    """
+    Label a date column with its day ("YYYY-MM-DD") or month ("MM-YYYY") as
+    text, for GROUP BY.
+    """
+    if granularity not in _BUCKETS:
+        raise ValueError(f"Unknown date bucket granularity '{granularity}'")
+    return _BUCKETS[granularity](column)
+
+
+@compiles(_DateBucket)
+def _compile_date_bucket(element, compiler, **kw):
+    raise CompileError(
+        f"date_bucket is not supported on {compiler.dialect.name}; "
+        "add a compiler for it in app/sql/dialect.py"
+    )
+
+
+@compiles(_DateBucket, "sqlite")
+def _compile_date_bucket_sqlite(element, compiler, **kw):
+    fmt = DATE_BUCKET_FORMATS[element.granularity][0]
+    return f"strftime('{fmt}', {compiler.process(element.clauses, **kw)})"
+
+
+@compiles(_DateBucket, "postgresql")
+def _compile_date_bucket_postgresql(element, compiler, **kw):
+    fmt = DATE_BUCKET_FORMATS[element.granularity][1]
+    return f"to_char({compiler.process(element.clauses, **kw)}, '{fmt}')"
@@ -0,0 +1,316 @@
+# File: app/sql/investment_logic.py
+
+from datetime import date, datetime
+
+from app.config import logger
+from app.extensions import db
+from app.helpers.plaid_helpers import get_investments
+from app.models import Holding, PlaidItem, Security
+from sqlalchemy import and_, delete, func, insert, select, update
+
+SECURITY_FIELDS = (
+    "name",
+    "ticker_symbol",
+    "type",
+    "cusip",
+    "isin",
+    "iso_currency_code",
+    "close_price",
+    "close_price_as_of",
+)
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        logger.warning(f"Unparseable date {value!r}")
+        return None
+
+
+def normalize_security(security):
+    """
+    Map a raw Plaid security onto Security column values.
+    Returns None if the security has no security_id.
+    """
+    security_id = security.get("security_id")
+    if not security_id:
+        logger.warning("Encountered a security without a 'security_id'; skipping.")
+        return None
+    return {
+        "security_id": security_id,
+        "name": security.get("name") or "Unknown",
+        "ticker_symbol": security.get("ticker_symbol"),
+        "type": security.get("type") or "Unknown",
+        "cusip": security.get("cusip"),
+        "isin": security.get("isin"),
+        "iso_currency_code": security.get("iso_currency_code"),
+        "close_price": security.get("close_price"),
+        "close_price_as_of": _parse_date(security.get("close_price_as_of")),
+    }
+
+
+def bulk_upsert_securities(securities, chunk_size=500):
+    """
+    Insert or update raw Plaid securities with one prefetch query and bulk
+    INSERT/UPDATE statements per chunk. Does not commit.
+    Returns a dict of inserted/updated/unchanged counts.
+    """
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0}
+    unique_rows = {}
+    for security in securities:
+        row = normalize_security(security)
+        if row:
+            unique_rows[row["security_id"]] = row
+    security_ids = list(unique_rows)
+
+    columns = [Security.id, Security.security_id] + [
+        getattr(Security, field) for field in SECURITY_FIELDS
+    ]
+    for start in range(0, len(security_ids), chunk_size):
+        chunk = security_ids[start : start + chunk_size]
+        existing = {
+            found.security_id: found
+            for found in db.session.execute(
+                select(*columns).where(Security.security_id.in_(chunk))
+            )
+        }
+        inserts = []
+        updates = []
+        for security_id in chunk:
+            row = unique_rows[security_id]
+            current = existing.get(security_id)
+            if current is None:
+                inserts.append(row)
+            elif any(
+                getattr(current, field) != row[field] for field in SECURITY_FIELDS
+            ):
+                updates.append(
+                    {"id": current.id, "updated_at": datetime.utcnow(), **row}
+                )
+            else:
+                stats["unchanged"] += 1
+        if inserts:
+            db.session.execute(insert(Security), inserts)
+        if updates:
+            db.session.execute(update(Security), updates)
+        stats["inserted"] += len(inserts)
+        stats["updated"] += len(updates)
+    return stats
+
+
+def save_holdings_snapshot(item_id, holdings, accounts, snapshot_date=None):
+    """
+    Replace an item's holdings snapshot for snapshot_date (default today) with
+    the given raw Plaid holdings, in one DELETE and one bulk INSERT.
+    `accounts` are the raw Plaid accounts of the same response, used for the
+    account names. Does not commit. Returns the number of holdings stored.
+    """
+    snapshot_date = snapshot_date or date.today()
+    account_names = {
+        account.get("account_id"): account.get("name") or account.get("official_name")
+        for account in accounts
+    }
+
+    rows = {}
+    for holding in holdings:
+        account_id = holding.get("account_id")
+        security_id = holding.get("security_id")
+        if not account_id or not security_id:
+            logger.warning("Encountered a holding without account or security id.")
+            continue
+        # One row per position; Plaid may split lots, so add them up.
+        key = (account_id, security_id)
+        row = rows.get(key)
+        if row is None:
+            rows[key] = {
+                "item_id": item_id,
+                "account_id": account_id,
+                "account_name": account_names.get(account_id) or "Unnamed Account",
+                "security_id": security_id,
+                "snapshot_date": snapshot_date,
+                "quantity": float(holding.get("quantity") or 0),
+                "institution_price": holding.get("institution_price"),
+                "institution_value": float(holding.get("institution_value") or 0),
+                "cost_basis": holding.get("cost_basis"),
+                "iso_currency_code": holding.get("iso_currency_code"),
+            }
+        else:
+            row["quantity"] += float(holding.get("quantity") or 0)
+            row["institution_value"] += float(holding.get("institution_value") or 0)
+            if holding.get("cost_basis") is not None:
+                row["cost_basis"] = (row["cost_basis"] or 0) + holding["cost_basis"]
+
+    db.session.execute(
+        delete(Holding).where(
+            Holding.item_id == item_id, Holding.snapshot_date == snapshot_date
+        )
+    )
+    if rows:
+        db.session.execute(insert(Holding), list(rows.values()))
+    return len(rows)
+
+
+def refresh_investments_item(item, snapshot_date=None):
+    """
+    Fetch an investments item's holdings from Plaid and store them as today's
+    snapshot along with their securities. Commits and returns a stats dict.
+    """
+    data = get_investments(item.access_token)
+    securities = bulk_upsert_securities(data.get("securities", []))
+    held = save_holdings_snapshot(
+        item.item_id,
+        data.get("holdings", []),
+        data.get("accounts", []),
+        snapshot_date=snapshot_date,
+    )
+    item.updated_at = datetime.utcnow()
+    db.session.commit()
+    stats = {"holdings": held, "securities": securities}
+    logger.debug(f"Investments snapshot for item {item.item_id}: {stats}")
+    return stats
+
+
+def _item_filter(query, user_id):
+    if user_id:
+        item_ids = select(PlaidItem.item_id).where(PlaidItem.user_id == user_id)
+        query = query.where(Holding.item_id.in_(item_ids))
+    return query
+
+
+def _latest_snapshots(user_id=None, as_of=None):
+    """
+    Subquery of (item_id, snapshot_date): each item's newest snapshot, or its
+    newest one on or before as_of. Items are refreshed independently and
+    every refresh replaces the whole item's snapshot, so the current
+    portfolio is each item's own latest snapshot, not one global date.
+    """
+    query = select(
+        Holding.item_id, func.max(Holding.snapshot_date).label("snapshot_date")
+    ).group_by(Holding.item_id)
+    if as_of:
+        query = query.where(Holding.snapshot_date <= as_of)
+    return _item_filter(query, user_id).subquery()
+
+
+def _join_latest(query, latest):
+    return query.join_from(
+        Holding,
+        latest,
+        and_(
+            Holding.item_id == latest.c.item_id,
+            Holding.snapshot_date == latest.c.snapshot_date,
+        ),
+    )
+
+
+def get_holdings(user_id=None, account_id=None, snapshot_date=None):
+    """
+    Return the holdings of each item's latest snapshot (on or before
+    snapshot_date, if given) joined with their securities, largest positions
+    first.
+    """
+    latest = _latest_snapshots(user_id, snapshot_date)
+    query = (
+        _join_latest(select(Holding, Security), latest)
+        .join(Security, Holding.security_id == Security.security_id)
+        .order_by(Holding.institution_value.desc())
+    )
+    if account_id:
+        query = query.where(Holding.account_id == account_id)
+    serialized = []
+    for holding, security in db.session.execute(query):
+        serialized.append(
+            {
+                "account_id": holding.account_id,
+                "account_name": holding.account_name,
+                "security_id": security.security_id,
+                "name": security.name,
+                "ticker_symbol": security.ticker_symbol,
+                "type": security.type,
+                "quantity": holding.quantity,
+                "price": holding.institution_price,
+                "value": holding.institution_value,
+                "cost_basis": holding.cost_basis,
+                "iso_currency_code": holding.iso_currency_code,
+                "snapshot_date": holding.snapshot_date.isoformat(),
+            }
+        )
+    return serialized
+
+
+def get_composition(user_id=None, group_by="type", snapshot_date=None):
+    """
+    Aggregate the value of each item's latest snapshot (on or before
+    snapshot_date, if given) by security type, security or account, computed
+    in SQL. Each group includes its share of the total value; "snapshot_date"
+    is the newest snapshot included.
+    """
+    columns = {
+        "type": (Security.type,),
+        "security": (Security.security_id, Security.name, Security.ticker_symbol),
+        "account": (Holding.account_id, Holding.account_name),
+    }
+    if group_by not in columns:
+        raise ValueError(f"Unknown group_by '{group_by}'")
+    latest = _latest_snapshots(user_id, snapshot_date)
+    snapshot_date = db.session.execute(
+        select(func.max(latest.c.snapshot_date))
+    ).scalar()
+    if snapshot_date is None:
+        return {"snapshot_date": None, "total_value": 0, "groups": []}
+
+    group_columns = columns[group_by]
+    value = func.sum(Holding.institution_value)
+    query = (
+        _join_latest(select(*group_columns, value.label("value")), latest)
+        .join(Security, Holding.security_id == Security.security_id)
+        .group_by(*group_columns)
+        .order_by(value.desc())
+    )
+    rows = db.session.execute(query).all()
+    total = sum(row.value or 0 for row in rows)
+    groups = []
+    for row in rows:
+        group = {column.name: getattr(row, column.name) for column in group_columns}
+        group["value"] = round(row.value or 0, 2)
+        group["share"] = round((row.value or 0) / total, 4) if total else 0
+        groups.append(group)
+    return {
+        "snapshot_date": snapshot_date.isoformat(),
+        "total_value": round(total, 2),
+        "groups": groups,
+    }
+
+
+def get_value_history(user_id=None):
+    """
+    Return the total holdings value on every snapshot date, oldest first.
+    Each date counts every item at its latest snapshot on or before that
+    date, so items refreshed on different days are all included.
+    """
+    dates = _item_filter(select(Holding.snapshot_date).distinct(), user_id).subquery()
+    item_dates = _item_filter(
+        select(Holding.item_id, Holding.snapshot_date).distinct(), user_id
+    ).subquery()
+    as_of = (
+        select(
+            dates.c.snapshot_date.label("as_of"),
+            item_dates.c.item_id,
+            func.max(item_dates.c.snapshot_date).label("snapshot_date"),
+        )
+        .join(item_dates, item_dates.c.snapshot_date <= dates.c.snapshot_date)
+        .group_by(dates.c.snapshot_date, item_dates.c.item_id)
+        .subquery()
+    )
+    query = (
+        _join_latest(select(as_of.c.as_of, func.sum(Holding.institution_value)), as_of)
+        .group_by(as_of.c.as_of)
+        .order_by(as_of.c.as_of)
+    )
+    return [
+        {"date": snapshot_date.isoformat(), "value": round(total or 0, 2)}
+        for snapshot_date, total in db.session.execute(query)
+    ]
@@ -0,0 +1,273 @@
+# File: app/sql/job_queue.py
+
+"""
+A small persistent job queue for background refreshes.
+
+Jobs live in the refresh_jobs table, so anything queued (or interrupted
+mid-run) is picked up again after a restart. Worker threads started by
+init_app claim jobs one at a time with a conditional UPDATE and run the
+handler registered for the job's type inside an application context.
+
+A claimed job records this process as its owner, and a heartbeat thread
+renews the lease of every job the process is running. Only running jobs
+whose lease has expired (their process died) are requeued, so several
+processes can share the queue.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from app.config import JOB_LEASE_SECONDS, JOB_POLL_INTERVAL, JOB_WORKERS, logger
+from app.extensions import db
+from app.models import RefreshJob
+from sqlalchemy import or_, select, update
+
+HANDLERS = {}
+
+# Identifies this process as the owner of the jobs it claims
+OWNER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_wakeup = threading.Event()
+_workers = []
+
+
+def job_handler(job_type):
+    """
+    Register handler(params, report_progress) for a job type. The handler
+    returns a JSON-serializable result; report_progress(dict) stores progress.
+    """
+
+    def register(fn):
+        HANDLERS[job_type] = fn
+        return fn
+
+    return register
+
+
+def enqueue(job_type, params=None, dedupe_key=None, delay=0):
+    """
+    Persist a new queued job, wake the workers and return the job.
+
+    With a dedupe_key, a job that is still queued under the same key is
+    returned instead of adding another one, so a burst of requests collapses
+    into a single run. delay (seconds) holds the job back before it can be
+    claimed, which turns that into a debounce window.
+    """
+    if job_type not in HANDLERS:
+        raise ValueError(f"Unknown job type '{job_type}'")
+    if dedupe_key:
+        existing = RefreshJob.query.filter_by(
+            dedupe_key=dedupe_key, status="queued"
+        ).first()
+        if existing:
+            logger.debug(f"Coalesced {job_type} into queued job {existing.id}")
+            return existing
+    job = RefreshJob(
+        job_type=job_type,
+        status="queued",
+        params=json.dumps(params or {}),
+        dedupe_key=dedupe_key,
+        run_after=datetime.utcnow() + timedelta(seconds=delay) if delay else None,
+    )
+    db.session.add(job)
+    db.session.commit()
+    logger.debug(f"Enqueued job {job.id} ({job_type})")
+    _wakeup.set()
+    return job
+
+
+def serialize_job(job):
+    return {
+        "job_id": job.id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "params": json.loads(job.params) if job.params else {},
+        "progress": json.loads(job.progress) if job.progress else {},
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "run_after": job.run_after.isoformat() if job.run_after else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "owner": job.owner,
+        "heartbeat_at": job.heartbeat_at.isoformat() if job.heartbeat_at else None,
+    }
+
+
+def get_job(job_id):
+    """
+    Return a serialized job or None.
+    """
+    job = db.session.get(RefreshJob, job_id)
+    return serialize_job(job) if job else None
+
+
+def list_jobs(limit=20):
+    jobs = RefreshJob.query.order_by(RefreshJob.id.desc()).limit(limit).all()
+    return [serialize_job(job) for job in jobs]
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest queued job that is due to running, owned by
+    this process. Returns its id or None. The status check in the UPDATE
+    makes the claim safe across processes.
+    """
+    job_id = db.session.execute(
+        select(RefreshJob.id)
+        .where(
+            RefreshJob.status == "queued",
+            or_(
+                RefreshJob.run_after.is_(None),
+                RefreshJob.run_after <= datetime.utcnow(),
+            ),
+        )
+        .order_by(RefreshJob.id)
+        .limit(1)
+    ).scalar()
+    if job_id is None:
+        return None
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        update(RefreshJob)
+        .where(RefreshJob.id == job_id, RefreshJob.status == "queued")
+        .values(status="running", started_at=now, owner=OWNER_ID, heartbeat_at=now)
+    ).rowcount
+    db.session.commit()
+    return job_id if claimed else None
+
+
+def run_job(job_id):
+    """
+    Run a claimed job to completion, recording progress, result or error.
+    The outcome is only recorded while this process still owns the job; if
+    its lease expired meanwhile, the job was requeued and runs again.
+    """
+    job = db.session.get(RefreshJob, job_id)
+    handler = HANDLERS.get(job.job_type)
+    params = json.loads(job.params) if job.params else {}
+
+    def report_progress(progress):
+        db.session.execute(
+            update(RefreshJob)
+            .where(RefreshJob.id == job_id)
+            .values(progress=json.dumps(progress))
+        )
+        db.session.commit()
+
+    logger.debug(f"Running job {job_id} ({job.job_type})")
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job type '{job.job_type}'")
+        result = handler(params, report_progress)
+        values = {"status": "succeeded", "result": json.dumps(result)}
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+        values = {"status": "failed", "error": str(e)}
+    recorded = db.session.execute(
+        update(RefreshJob)
+        .where(RefreshJob.id == job_id, RefreshJob.owner == OWNER_ID)
+        .values(finished_at=datetime.utcnow(), **values)
+    ).rowcount
+    db.session.commit()
+    if not recorded:
+        logger.warning(f"Lost the lease on job {job_id}; its outcome was dropped.")
+
+
+def renew_leases():
+    """
+    Refresh the heartbeat of every job this process is running.
+    """
+    db.session.execute(
+        update(RefreshJob)
+        .where(RefreshJob.owner == OWNER_ID, RefreshJob.status == "running")
+        .values(heartbeat_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+
+def requeue_interrupted_jobs():
+    """
+    Queue running jobs again whose owner stopped heartbeating more than
+    JOB_LEASE_SECONDS ago, i.e. whose process died mid-run. Jobs held by
+    live processes are left alone.
+    """
+    expired = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    count = db.session.execute(
+        update(RefreshJob)
+        .where(
+            RefreshJob.status == "running",
+            or_(
+                RefreshJob.heartbeat_at.is_(None),
+                RefreshJob.heartbeat_at < expired,
+            ),
+        )
+        .values(status="queued", started_at=None, owner=None, heartbeat_at=None)
+    ).rowcount
+    db.session.commit()
+    if count:
+        logger.info(f"Re-queued {count} interrupted job(s).")
+        _wakeup.set()
+    return count
+
+
+def workers_running():
+    return bool(_workers)
+
+
+def _worker_loop(app):
+    while True:
+        try:
+            with app.app_context():
+                job_id = claim_next_job()
+                if job_id is not None:
+                    run_job(job_id)
+                    continue
+        except Exception as e:
+            logger.error(f"Job worker error: {e}", exc_info=True)
+        _wakeup.wait(JOB_POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def _heartbeat_loop(app):
+    # Renew this process's leases well within JOB_LEASE_SECONDS, and pick up
+    # jobs left behind by processes that died while this one keeps running.
+    while True:
+        try:
+            with app.app_context():
+                renew_leases()
+                requeue_interrupted_jobs()
+        except Exception as e:
+            logger.error(f"Job heartbeat error: {e}", exc_info=True)
+        time.sleep(JOB_LEASE_SECONDS / 3)
+
+
+def init_app(app):
+    """
+    Recover interrupted jobs and start the background workers and their
+    heartbeat thread. Skipped when
+    JOB_WORKERS is 0, and in the Werkzeug reloader's parent process so only
+    the serving process runs jobs.
+    """
+    if JOB_WORKERS <= 0 or _workers:
+        return
+    if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        return
+    with app.app_context():
+        requeue_interrupted_jobs()
+    for index in range(JOB_WORKERS):
+        worker = threading.Thread(
+            target=_worker_loop, args=(app,), name=f"job-worker-{index}", daemon=True
+        )
+        worker.start()
+        _workers.append(worker)
+    threading.Thread(
+        target=_heartbeat_loop, args=(app,), name="job-heartbeat", daemon=True
+    ).start()
+    logger.debug(f"Started {JOB_WORKERS} background job worker(s).")
@@ -0,0 +1,265 @@
+# File: app/sql/migrations.py
+
+"""
+Lightweight schema migrations for existing databases.
+
+db.create_all() only creates missing tables, it never alters tables that
+already exist. Each migration below brings an older database file up to date
+with models.py; they are applied in order, once, and recorded in the
+schema_migrations table. Migrations must be safe to run against a database
+freshly created by create_all (i.e. check before altering), and on both
+SQLite and PostgreSQL. A PostgreSQL database always starts out from the
+current models, so SQLite-only repairs (table rebuilds) never run there.
+"""
+
+from datetime import datetime, timezone
+
+from app.config import logger
+from app.models import (
+    Account,
+    AccountDetails,
+    AccountHistory,
+    PlaidItem,
+    RefreshJob,
+    Transaction,
+)
+from app.sql import transaction_search
+from sqlalchemy import Integer, MetaData, Table, inspect, text
+
+MIGRATIONS = []
+
+
+def migration(name):
+    """
+    Register a migration function under a unique, never-changing name.
+    """
+
+    def register(fn):
+        MIGRATIONS.append((name, fn))
+        return fn
+
+    return register
+
+
+def add_column_if_missing(conn, table, column):
+    """
+    Add a model column to an existing table if it is not there yet.
+    Only the column name and type are used.
+    """
+    existing = {col["name"] for col in inspect(conn).get_columns(table)}
+    if column.name in existing:
+        return False
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column.name} {column_type}"))
+    logger.info(f"Added column {table}.{column.name} ({column_type})")
+    return True
+
+
+def create_index_if_missing(conn, index):
+    """
+    Create a model-declared index on an existing table if it is not there yet.
+    """
+    existing = {idx["name"] for idx in inspect(conn).get_indexes(index.table.name)}
+    if index.name in existing:
+        return False
+    index.create(conn)
+    logger.info(f"Created index {index.name}")
+    return True
+
+
+def rebuild_table(conn, model, transform=None, batch_size=1000):
+    """
+    Recreate a model's table from its current definition and copy the rows
+    across, for changes ALTER TABLE cannot make in SQLite (e.g. column types).
+    Columns that no longer exist are dropped. transform, if given, receives
+    each old row as a dict and returns the row to insert. Values are bound
+    through the model's column types, so e.g. floats become Money cents.
+    Triggers go with the old table: rebuilding transactions must be followed
+    by transaction_search.install().
+    """
+    table = model.__table__
+    old_name = f"_old_{table.name}"
+    if conn.dialect.name != "sqlite":
+        # Other databases can ALTER COLUMN TYPE in place; none needs a
+        # rebuild yet because they are always created with the current schema.
+        raise NotImplementedError(f"rebuild_table is SQLite only ({table.name})")
+    # Without legacy_alter_table, SQLite would repoint other tables' foreign
+    # keys at the renamed copy; they must keep naming the rebuilt table.
+    conn.execute(text("PRAGMA legacy_alter_table=ON"))
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+    conn.execute(text("PRAGMA legacy_alter_table=OFF"))
+    # Renamed tables keep their index names, which the new table needs.
+    for index in inspect(conn).get_indexes(old_name):
+        conn.execute(text(f"DROP INDEX {index['name']}"))
+    table.create(conn)
+
+    # Read through the reflected old table so values load with their old
+    # types (e.g. DATETIME text becomes datetime) before the new types bind.
+    old_table = Table(old_name, MetaData(), autoload_with=conn)
+    columns = {column.name for column in table.columns}
+    old_rows = conn.execute(old_table.select()).mappings()
+    copied = 0
+    while True:
+        batch = []
+        for old_row in old_rows.fetchmany(batch_size):
+            row = {key: value for key, value in old_row.items() if key in columns}
+            batch.append(transform(row) if transform else row)
+        if not batch:
+            break
+        conn.execute(table.insert(), batch)
+        copied += len(batch)
+    conn.execute(text(f"DROP TABLE {old_name}"))
+    logger.info(f"Rebuilt table {table.name} ({copied} rows)")
+
+
+def run_migrations(engine):
+    """
+    Apply every registered migration that has not run yet.
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "name VARCHAR(128) PRIMARY KEY, applied_at VARCHAR(32))"
+            )
+        )
+        applied = set(
+            conn.execute(text("SELECT name FROM schema_migrations")).scalars()
+        )
+        for name, fn in MIGRATIONS:
+            if name in applied:
+                continue
+            logger.info(f"Applying migration {name}")
+            fn(conn)
+            conn.execute(
+                text(
+                    "INSERT INTO schema_migrations (name, applied_at) "
+                    "VALUES (:name, :applied_at)"
+                ),
+                {"name": name, "applied_at": datetime.utcnow().isoformat()},
+            )
+
+
+# --- Migrations (append only) ---
+
+
+@migration("0001_plaid_item_sync_cursor")
+def _plaid_item_sync_cursor(conn):
+    add_column_if_missing(conn, "plaid_items", PlaidItem.__table__.c.sync_cursor)
+
+
+@migration("0002_account_details_txn_watermark")
+def _account_details_txn_watermark(conn):
+    columns = AccountDetails.__table__.c
+    add_column_if_missing(conn, "account_details", columns.txn_watermark_id)
+    add_column_if_missing(conn, "account_details", columns.txn_watermark_date)
+
+
+@migration("0003_account_refresh_ttl")
+def _account_refresh_ttl(conn):
+    add_column_if_missing(conn, "accounts", Account.__table__.c.refresh_ttl_minutes)
+
+
+@migration("0004_refresh_job_debounce")
+def _refresh_job_debounce(conn):
+    columns = RefreshJob.__table__.c
+    add_column_if_missing(conn, "refresh_jobs", columns.dedupe_key)
+    add_column_if_missing(conn, "refresh_jobs", columns.run_after)
+
+
+@migration("0005_transaction_content_hash")
+def _transaction_content_hash(conn):
+    # Existing rows keep a NULL hash and are rewritten (and hashed) once by
+    # their next refresh.
+    add_column_if_missing(conn, "transactions", Transaction.__table__.c.content_hash)
+
+
+def _split_transaction_date(row):
+    # Dates were free-form strings: keep the day, and the time (if any) as
+    # posted_at in UTC. Unparseable values become NULL.
+    value = (row.get("date") or "").strip()
+    row["date"] = row["posted_at"] = None
+    try:
+        row["date"] = datetime.strptime(value[:10], "%Y-%m-%d").date()
+        if len(value) > 10:
+            posted = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if posted.tzinfo:
+                posted = posted.astimezone(timezone.utc).replace(tzinfo=None)
+            row["posted_at"] = posted
+    except ValueError:
+        if value:
+            logger.warning(f"Dropping unparseable transaction date {value!r}")
+    return row
+
+
+@migration("0006_transaction_native_date")
+def _transaction_native_date(conn):
+    columns = {col["name"] for col in inspect(conn).get_columns("transactions")}
+    if "posted_at" in columns:
+        return  # created by create_all with the current schema
+    rebuild_table(conn, Transaction, transform=_split_transaction_date)
+
+
+@migration("0007_query_path_indexes")
+def _query_path_indexes(conn):
+    # Keep the newest row of any duplicated (account_id, date) before the
+    # unique index goes on.
+    removed = conn.execute(
+        text(
+            "DELETE FROM account_history WHERE id NOT IN ("
+            "SELECT MAX(id) FROM account_history GROUP BY account_id, date)"
+        )
+    ).rowcount
+    if removed:
+        logger.info(f"Removed {removed} duplicate account_history rows")
+    # Superseded by ix_transactions_date_amount.
+    conn.execute(text("DROP INDEX IF EXISTS ix_transactions_date"))
+    for model in (AccountHistory, Transaction):
+        for index in model.__table__.indexes:
+            create_index_if_missing(conn, index)
+
+
+@migration("0008_money_minor_units")
+def _money_minor_units(conn):
+    # Float balances and amounts become integer cents (the Money type); the
+    # rebuild converts every value as it is copied. Tables already rebuilt
+    # with the current schema (e.g. transactions by 0006) are skipped.
+    for model, column in (
+        (Account, "balance"),
+        (AccountHistory, "balance"),
+        (Transaction, "amount"),
+    ):
+        table = model.__table__.name
+        types = {col["name"]: col["type"] for col in inspect(conn).get_columns(table)}
+        if not isinstance(types[column], Integer):
+            rebuild_table(conn, model)
+
+
+@migration("0009_transaction_keyset_index")
+def _transaction_keyset_index(conn):
+    for index in Transaction.__table__.indexes:
+        if index.name == "ix_transactions_date_id":
+            create_index_if_missing(conn, index)
+
+
+@migration("0010_transaction_listing_indexes")
+def _transaction_listing_indexes(conn):
+    for index in Transaction.__table__.indexes:
+        create_index_if_missing(conn, index)
+
+
+@migration("0011_transaction_search")
+def _transaction_search(conn):
+    # Creates the full-text index and fills it from the existing rows.
+    transaction_search.install(conn)
+
+
+@migration("0012_account_refresh_attempt")
+def _account_refresh_attempt(conn):
+    add_column_if_missing(conn, "accounts", Account.__table__.c.last_refresh_attempt)
+
+
+@migration("0013_refresh_job_lease")
+def _refresh_job_lease(conn):
+    for column in ("owner", "heartbeat_at"):
+        add_column_if_missing(conn, "refresh_jobs", RefreshJob.__table__.c[column])
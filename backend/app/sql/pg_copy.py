@@ -0,0 +1,122 @@
+# File: app/sql/pg_copy.py
+
+"""
+PostgreSQL fast path for transaction ingest.
+
+Instead of per-chunk prefetch queries and executemany INSERT/UPDATEs, a batch
+of normalized rows is streamed with COPY into a session-local staging table
+and merged into transactions with a single INSERT ... ON CONFLICT DO UPDATE.
+The merge only rewrites rows whose content_hash changed, matching the
+generic path in account_logic.bulk_upsert_transactions.
+"""
+
+import io
+from datetime import date, datetime
+
+from app.config import DB_DIALECT, PG_COPY_INGEST
+from app.extensions import db
+from app.helpers.money import to_minor_units
+from app.models import Transaction
+from sqlalchemy import Column, MetaData, Table, false, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.schema import CreateTable
+
+COPY_COLUMNS = (
+    "transaction_id",
+    "account_id",
+    "amount",
+    "iso_currency_code",
+    "date",
+    "posted_at",
+    "description",
+    "category",
+    "merchant_name",
+    "merchant_typ",
+    "content_hash",
+)
+
+# Temporary, so each connection gets its own; emptied at every commit.
+staging = Table(
+    "transactions_staging",
+    MetaData(),
+    *(Column(name, Transaction.__table__.c[name].type.copy()) for name in COPY_COLUMNS),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DELETE ROWS",
+)
+
+
+def copy_ingest_enabled():
+    """
+    True when transactions can be ingested through COPY: PostgreSQL with the
+    psycopg2 driver and PG_COPY_INGEST on.
+    """
+    if not PG_COPY_INGEST or DB_DIALECT != "postgresql":
+        return False
+    return db.engine.dialect.driver == "psycopg2"
+
+
+def _copy_value(value):
+    """
+    Encode one value for COPY's text format.
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_rows(rows):
+    buffer = io.StringIO()
+    for row in rows:
+        values = dict(row, amount=to_minor_units(row["amount"]))
+        buffer.write("\t".join(_copy_value(values[name]) for name in COPY_COLUMNS))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def copy_upsert_transactions(rows):
+    """
+    Upsert normalized transaction rows (unique transaction_ids, content_hash
+    already set) through the staging table, in the session's transaction.
+    Does not commit. Returns a dict of inserted/updated/skipped counts.
+    """
+    connection = db.session.connection()
+    connection.execute(CreateTable(staging, if_not_exists=True))
+    connection.execute(staging.delete())
+
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {staging.name} ({', '.join(COPY_COLUMNS)}) FROM STDIN",
+            _copy_rows(rows),
+        )
+    finally:
+        cursor.close()
+
+    transactions = Transaction.__table__
+    merge = pg_insert(transactions).from_select(
+        [*COPY_COLUMNS, "user_modified"],
+        select(*(staging.c[name] for name in COPY_COLUMNS), false()),
+    )
+    merge = merge.on_conflict_do_update(
+        index_elements=[transactions.c.transaction_id],
+        set_={name: merge.excluded[name] for name in COPY_COLUMNS[1:]},
+        where=transactions.c.content_hash.is_distinct_from(merge.excluded.content_hash),
+    ).returning(literal_column("xmax = 0").label("inserted"))
+    # xmax is 0 only for freshly inserted rows; rows left alone by the WHERE
+    # are not returned at all.
+    written = connection.execute(merge).scalars().all()
+    inserted = sum(1 for flag in written if flag)
+    return {
+        "inserted": inserted,
+        "updated": len(written) - inserted,
+        "skipped": len(rows) - len(written),
+    }
@@ -0,0 +1,378 @@
+# File: app/sql/refresh_engine.py
+
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.config import (
+    FILES,
+    PLAID_BASE_URL,
+    TELLER_API_BASE_URL,
+    TELLER_REFRESH_MAX_WORKERS,
+    TELLER_REFRESH_QUEUE_PAGES,
+    logger,
+)
+from app.extensions import db
+from app.helpers.provider_client import get_client_stats
+from app.helpers.token_store import teller_tokens
+from app.models import Account, PlaidItem
+from app.sql import account_logic, investment_logic, job_queue
+
+
+def _timed_fetch(fetch_fn, *args):
+    """
+    Run a provider fetch in a worker thread, capturing its duration and any
+    exception so a single failing account never aborts the whole refresh.
+    """
+    started = time.perf_counter()
+    try:
+        fetched = fetch_fn(*args)
+        error = None
+    except Exception as e:
+        logger.error(f"Error fetching provider data: {e}", exc_info=True)
+        fetched = None
+        error = str(e)
+    return fetched, error, (time.perf_counter() - started) * 1000
+
+
+def refresh_teller_accounts(
+    accounts,
+    tokens_by_user,
+    teller_dot_cert,
+    teller_dot_key,
+    teller_api_base_url,
+    max_workers=None,
+    on_result=None,
+):
+    """
+    Refresh many Teller accounts at once, resolving each account's access
+    token from tokens_by_user (see TokenStore.by_user).
+
+    Balance and transaction requests are fanned out over a bounded thread pool,
+    while every database write happens on the calling thread (the single
+    writer). Workers stream each page of transactions to the writer through a
+    bounded queue as soon as it is parsed, and the writer commits it as one
+    batch, so memory stays proportional to the page size and queue length
+    rather than to account history; balances, history and the watermark are
+    applied and committed once the account's fetch completes.
+
+    Returns a list with one result dict per account containing its status,
+    fetch/apply timings in milliseconds and transaction ingest counts;
+    on_result, if given, is called with each one as soon as that account is
+    done.
+    """
+    max_workers = max_workers or TELLER_REFRESH_MAX_WORKERS
+    results = []
+    pending = []
+
+    def record(result):
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    for account in accounts:
+        access_token = tokens_by_user.get(account.user_id)
+        if not access_token:
+            logger.warning(f"No access token found for user {account.user_id}")
+            record(
+                {
+                    "account_id": account.account_id,
+                    "account_name": account.name,
+                    "status": "skipped",
+                    "error": "No access token found",
+                    "fetch_ms": 0,
+                    "apply_ms": 0,
+                    "transactions": {},
+                }
+            )
+            continue
+        pending.append((account, access_token))
+
+    if not pending:
+        return results
+
+    # Workers only ever see plain values: ORM attributes can expire after a
+    # commit and must not be loaded off the writer thread.
+    accounts_by_id = {account.account_id: account for account, _ in pending}
+    watermarks = account_logic.get_teller_watermarks(accounts_by_id)
+    logger.debug(
+        f"Refreshing {len(pending)} Teller accounts with {max_workers} workers."
+    )
+    pool_size = min(max_workers, len(pending))
+    work = queue.Queue(maxsize=pool_size * TELLER_REFRESH_QUEUE_PAGES)
+
+    def fetch(account_id, access_token, watermark):
+        def on_batch(txns):
+            work.put(("batch", account_id, txns))
+
+        fetched = (None, "Fetch did not complete", 0)
+        try:
+            fetched = _timed_fetch(
+                account_logic.fetch_teller_account_data,
+                account_id,
+                access_token,
+                teller_dot_cert,
+                teller_dot_key,
+                teller_api_base_url,
+                watermark,
+                on_batch,
+            )
+        finally:
+            # The writer waits for exactly one "done" per submitted fetch.
+            work.put(("done", account_id, fetched))
+
+    results_by_id = {
+        account_id: {
+            "account_id": account_id,
+            "account_name": account.name,
+            "status": "error",
+            "error": None,
+            "fetch_ms": 0,
+            "apply_ms": 0,
+            "transactions": {},
+        }
+        for account_id, account in accounts_by_id.items()
+    }
+    with ThreadPoolExecutor(
+        max_workers=pool_size, thread_name_prefix="teller-refresh"
+    ) as pool:
+        for account, access_token in pending:
+            account_id = account.account_id
+            pool.submit(fetch, account_id, access_token, watermarks.get(account_id))
+
+        remaining = len(pending)
+        while remaining:
+            kind, account_id, payload = work.get()
+            account = accounts_by_id[account_id]
+            result = results_by_id[account_id]
+            started = time.perf_counter()
+            if kind == "batch":
+                try:
+                    account_logic.merge_stats(
+                        result["transactions"],
+                        account_logic.ingest_teller_transactions(account_id, payload),
+                    )
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(
+                        f"Error ingesting Teller transactions for account {account_id}: {e}",
+                        exc_info=True,
+                    )
+                    result["error"] = str(e)
+                result["apply_ms"] += (time.perf_counter() - started) * 1000
+                continue
+
+            remaining -= 1
+            fetched, error, fetch_ms = payload
+            result["fetch_ms"] = round(fetch_ms, 1)
+            result["error"] = result["error"] or error
+            if fetched is not None and not result["error"]:
+                try:
+                    updated = account_logic.apply_teller_account_data(
+                        account, fetched, stats=result["transactions"]
+                    )
+                    # Fetched successfully, so the account is fresh either way.
+                    account.last_refreshed = datetime.utcnow()
+                    db.session.commit()
+                    result["status"] = "updated" if updated else "unchanged"
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(
+                        f"Error applying Teller data for account {account_id}: {e}",
+                        exc_info=True,
+                    )
+                    result["error"] = str(e)
+            result["apply_ms"] = round(
+                result["apply_ms"] + (time.perf_counter() - started) * 1000, 1
+            )
+            record(result)
+
+    logger.debug(f"Provider connection stats: {get_client_stats()}")
+    return results
+
+
+def refresh_plaid_accounts(accounts, plaid_base_url, mode="get", on_result=None):
+    """
+    Refresh Plaid accounts grouped by access token, so each Plaid item is
+    fetched once (see account_logic.refresh_plaid_item), committing per item.
+    Returns one result dict per account, shaped like refresh_teller_accounts
+    results; "transactions" holds the ingest counts of the account's item.
+    """
+    results = []
+
+    def record(result):
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    # Group accounts by access token so each Plaid item is fetched once.
+    accounts_by_token = {}
+    for account in accounts:
+        if not account.access_token:
+            logger.warning(
+                f"No Plaid access token found for account {account.account_id} (user {account.user_id})"
+            )
+            record(
+                {
+                    "account_id": account.account_id,
+                    "account_name": account.name,
+                    "status": "skipped",
+                    "error": "No access token found",
+                    "fetch_ms": 0,
+                    "transactions": {},
+                }
+            )
+            continue
+        accounts_by_token.setdefault(account.access_token, []).append(account)
+
+    for access_token, item_accounts in accounts_by_token.items():
+        logger.debug(
+            f"Refreshing {len(item_accounts)} Plaid accounts sharing one item token."
+        )
+        started = time.perf_counter()
+        error = None
+        try:
+            item_result = account_logic.refresh_plaid_item(
+                access_token, item_accounts, plaid_base_url, mode=mode
+            )
+            db.session.commit()
+            error = item_result.get("error")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error refreshing Plaid item: {e}", exc_info=True)
+            item_result = {"updated_accounts": set(), "transactions": {}}
+            error = str(e)
+        fetch_ms = round((time.perf_counter() - started) * 1000, 1)
+        for account in item_accounts:
+            if error:
+                status = "error"
+            elif account.account_id in item_result["updated_accounts"]:
+                status = "updated"
+            else:
+                status = "unchanged"
+            record(
+                {
+                    "account_id": account.account_id,
+                    "account_name": account.name,
+                    "status": status,
+                    "error": error,
+                    "fetch_ms": fetch_ms,
+                    "transactions": item_result["transactions"],
+                }
+            )
+
+    logger.debug(f"Provider connection stats: {get_client_stats()}")
+    return results
+
+
+def summarize_results(results):
+    """
+    Collapse per-account refresh results into counts by status.
+    """
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return summary
+
+
+# --- Background jobs ---
+
+
+def _progress_reporter(report_progress, total):
+    """
+    Build an on_result callback that records per-account job progress.
+    """
+    progress = {"total": total, "completed": 0, "accounts": {}}
+    report_progress(progress)
+
+    def on_result(result):
+        progress["completed"] += 1
+        progress["accounts"][result["account_id"]] = {
+            "account_name": result["account_name"],
+            "status": result["status"],
+            "error": result["error"],
+        }
+        report_progress(progress)
+
+    return on_result
+
+
+@job_queue.job_handler("teller_refresh")
+def run_teller_refresh_job(params, report_progress):
+    """
+    Job params: optional "account_ids" to limit the refresh.
+    """
+    query = Account.query
+    if params.get("account_ids"):
+        query = query.filter(Account.account_id.in_(params["account_ids"]))
+    accounts = query.all()
+    results = refresh_teller_accounts(
+        accounts,
+        teller_tokens().by_user(),
+        FILES["TELLER_DOT_CERT"],
+        FILES["TELLER_DOT_KEY"],
+        TELLER_API_BASE_URL,
+        on_result=_progress_reporter(report_progress, len(accounts)),
+    )
+    return {"summary": summarize_results(results), "results": results}
+
+
+def _raise_on_errors(results):
+    """
+    Fail the job when any item errored, so it is recorded as failed rather
+    than succeeded with a summary nobody reads.
+    """
+    errors = sorted({r["error"] for r in results if r["status"] == "error"})
+    if errors:
+        failed = sum(1 for r in results if r["status"] == "error")
+        raise RuntimeError(
+            f"{failed} account(s) failed to refresh: {'; '.join(errors)}"
+        )
+
+
+@job_queue.job_handler("plaid_refresh")
+def run_plaid_refresh_job(params, report_progress):
+    """
+    Job params: "user_id" or "account_ids", and optional "mode" ("get"/"sync").
+    """
+    query = Account.query.filter_by(link_type="Plaid")
+    if params.get("user_id"):
+        query = query.filter_by(user_id=params["user_id"])
+    if params.get("account_ids"):
+        query = query.filter(Account.account_id.in_(params["account_ids"]))
+    accounts = query.all()
+    results = refresh_plaid_accounts(
+        accounts,
+        PLAID_BASE_URL,
+        mode=params.get("mode", "get"),
+        on_result=_progress_reporter(report_progress, len(accounts)),
+    )
+    _raise_on_errors(results)
+    return {"summary": summarize_results(results), "results": results}
+
+
+@job_queue.job_handler("plaid_item_refresh")
+def run_plaid_item_refresh_job(params, report_progress):
+    """
+    Job params: "item_id", and "product" ("transactions", the default, or
+    "investments"). Refreshes just that Plaid item; queued by the webhook
+    receiver. Transactions use "mode" ("sync" by default).
+    """
+    item = PlaidItem.query.filter_by(item_id=params["item_id"]).first()
+    if item is None:
+        raise ValueError(f"Unknown Plaid item '{params['item_id']}'")
+    if params.get("product") == "investments":
+        return {"investments": investment_logic.refresh_investments_item(item)}
+    accounts = Account.query.filter_by(
+        link_type="Plaid", access_token=item.access_token
+    ).all()
+    results = refresh_plaid_accounts(
+        accounts,
+        PLAID_BASE_URL,
+        mode=params.get("mode", "sync"),
+        on_result=_progress_reporter(report_progress, len(accounts)),
+    )
+    _raise_on_errors(results)
+    return {"summary": summarize_results(results), "results": results}
@@ -0,0 +1,140 @@
+# File: app/sql/scheduler.py
+
+"""
+Staleness-driven background refresh scheduler.
+
+Every REFRESH_SCHEDULER_INTERVAL seconds the scheduler looks for accounts
+whose last_refreshed is older than their TTL (Account.refresh_ttl_minutes, or
+the provider default in REFRESH_TTL_MINUTES), takes the ones it has touched
+least recently first, up to REFRESH_SCHEDULER_BATCH per provider, and queues a
+refresh job for them. Each pick is stamped in last_refresh_attempt and an
+account is not picked again until its TTL has passed since that attempt, so
+accounts that never refresh (no token, a broken item) are retried once per
+TTL instead of filling every batch ahead of healthy ones.
+A provider that still has a queued or running refresh job is skipped, so at
+most one refresh per provider is in flight and user clicks never pile up on
+top of scheduled work.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+from app.config import (
+    PLAID_SCHEDULED_MODE,
+    REFRESH_SCHEDULER_BATCH,
+    REFRESH_SCHEDULER_INTERVAL,
+    REFRESH_TTL_MINUTES,
+    logger,
+)
+from app.models import Account, RefreshJob
+from app.sql import job_queue
+from sqlalchemy import func
+
+# Account.link_type -> job type that refreshes it
+JOB_TYPES = {"Teller": "teller_refresh", "Plaid": "plaid_refresh"}
+
+_scheduler = []
+
+
+def find_stale_accounts(link_type, now=None, limit=REFRESH_SCHEDULER_BATCH):
+    """
+    Return up to `limit` accounts of a provider that are past their TTL and
+    were not attempted within it, least recently refreshed or attempted
+    first (never-touched accounts before all others).
+    """
+    now = now or datetime.utcnow()
+    default_ttl = REFRESH_TTL_MINUTES[link_type]
+    last_touched = func.coalesce(Account.last_refresh_attempt, Account.last_refreshed)
+    candidates = (
+        Account.query.filter(Account.link_type == link_type)
+        .filter(
+            (Account.last_refreshed.is_(None))
+            | (Account.last_refreshed < now - timedelta(minutes=default_ttl))
+            | (Account.refresh_ttl_minutes.isnot(None))
+        )
+        .order_by(last_touched.is_(None).desc(), last_touched, Account.id)
+        .all()
+    )
+    stale = []
+    for account in candidates:
+        cutoff = now - timedelta(minutes=account.refresh_ttl_minutes or default_ttl)
+        if account.last_refreshed is not None and account.last_refreshed >= cutoff:
+            continue
+        if account.last_refresh_attempt and account.last_refresh_attempt >= cutoff:
+            continue  # attempted within its TTL and still not refreshed
+        stale.append(account)
+        if len(stale) >= limit:
+            break
+    return stale
+
+
+def has_pending_job(job_type):
+    return (
+        RefreshJob.query.filter(
+            RefreshJob.job_type == job_type,
+            RefreshJob.status.in_(("queued", "running")),
+        ).first()
+        is not None
+    )
+
+
+def schedule_stale_refreshes(now=None):
+    """
+    Queue one refresh job per provider for its stalest accounts.
+    Returns {job_type: job_id} for the jobs that were queued.
+    """
+    now = now or datetime.utcnow()
+    queued = {}
+    for link_type, job_type in JOB_TYPES.items():
+        if has_pending_job(job_type):
+            logger.debug(
+                f"Skipping scheduled {job_type}: a refresh is already pending."
+            )
+            continue
+        stale = find_stale_accounts(link_type, now=now)
+        if not stale:
+            continue
+        for account in stale:
+            account.last_refresh_attempt = now
+        params = {
+            "account_ids": [account.account_id for account in stale],
+            "scheduled": True,
+        }
+        if job_type == "plaid_refresh":
+            params["mode"] = PLAID_SCHEDULED_MODE
+        job = job_queue.enqueue(job_type, params)
+        queued[job_type] = job.id
+        logger.info(
+            f"Scheduled {job_type} job {job.id} for {len(stale)} stale {link_type} account(s)."
+        )
+    return queued
+
+
+def _scheduler_loop(app, stop):
+    while not stop.wait(REFRESH_SCHEDULER_INTERVAL):
+        try:
+            with app.app_context():
+                schedule_stale_refreshes()
+        except Exception as e:
+            logger.error(f"Refresh scheduler error: {e}", exc_info=True)
+
+
+def init_app(app):
+    """
+    Start the scheduler thread. Disabled when REFRESH_SCHEDULER_INTERVAL is 0
+    or no job workers run, and skipped in the Werkzeug reloader's parent.
+    """
+    if REFRESH_SCHEDULER_INTERVAL <= 0 or not job_queue.workers_running() or _scheduler:
+        return
+    if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        return
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=_scheduler_loop, args=(app, stop), name="refresh-scheduler", daemon=True
+    )
+    thread.start()
+    _scheduler.append((thread, stop))
+    logger.debug(
+        f"Refresh scheduler started (every {REFRESH_SCHEDULER_INTERVAL}s, TTLs {REFRESH_TTL_MINUTES})."
+    )
@@ -0,0 +1,171 @@
+# File: app/sql/transaction_search.py
+
+"""
+Full-text search over transaction descriptions and merchant names.
+
+On SQLite the text lives in an FTS5 table, transactions_fts, that indexes
+transactions as external content (rowid = transactions.id) and is kept in
+sync by triggers, so every write path (bulk upserts, user edits, deletes)
+updates it without any help from the ingest code. Matches are ranked with
+bm25. On PostgreSQL the same search runs against a GIN index over a tsvector
+of the two columns, ranked with ts_rank.
+
+Search terms are reduced to words and each one matches as a prefix, so
+"star coff" finds "STARBUCKS COFFEE #123". Snippets are cut from the returned
+rows in Python: FTS5's snippet() has to re-run a prefix MATCH for every row,
+which costs more than the search itself.
+"""
+
+import re
+import unicodedata
+
+from app.models import Transaction
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import to_tsquery, to_tsvector
+
+FTS_TABLE = "transactions_fts"
+SNIPPET_START = "["
+SNIPPET_END = "]"
+SNIPPET_TOKENS = 12
+
+_WORD = re.compile(r"\w+")
+
+# prefix='2 3' keeps extra indexes of 2- and 3-character prefixes, so short
+# search-as-you-type terms do not scan the whole term list.
+_SQLITE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "description, merchant_name, content='transactions', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+_SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_insert": (
+        "AFTER INSERT ON transactions BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, description, merchant_name) "
+        "VALUES (new.id, new.description, new.merchant_name); END"
+    ),
+    f"{FTS_TABLE}_delete": (
+        "AFTER DELETE ON transactions BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, merchant_name) "
+        "VALUES ('delete', old.id, old.description, old.merchant_name); END"
+    ),
+    f"{FTS_TABLE}_update": (
+        "AFTER UPDATE OF description, merchant_name ON transactions BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, merchant_name) "
+        "VALUES ('delete', old.id, old.description, old.merchant_name); "
+        f"INSERT INTO {FTS_TABLE}(rowid, description, merchant_name) "
+        "VALUES (new.id, new.description, new.merchant_name); END"
+    ),
+}
+
+# PostgreSQL: queries must spell the indexed expression exactly like this.
+_PG_INDEX = (
+    "CREATE INDEX IF NOT EXISTS ix_transactions_search ON transactions "
+    "USING gin (to_tsvector('simple', "
+    "coalesce(description, '') || ' ' || coalesce(merchant_name, '')))"
+)
+_PG_CONFIG = literal_column("'simple'")
+_pg_document = to_tsvector(
+    _PG_CONFIG,
+    func.coalesce(Transaction.description, "")
+    + literal_column("' '")
+    + func.coalesce(Transaction.merchant_name, ""),
+)
+
+
+def install(conn):
+    """
+    Create the search index if missing. On SQLite this also (re)creates the
+    sync triggers and, when any were missing, refills the index from
+    transactions. Safe to run repeatedly; table rebuilds drop the triggers,
+    so run it again after rebuilding transactions.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(_PG_INDEX))
+        return
+    if conn.dialect.name != "sqlite":
+        raise NotImplementedError(f"No transaction search on {conn.dialect.name}")
+    existing = set(
+        conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        ).scalars()
+    )
+    conn.execute(text(_SQLITE_TABLE))
+    missing = [name for name in _SQLITE_TRIGGERS if name not in existing]
+    for name in missing:
+        conn.execute(text(f"CREATE TRIGGER {name} {_SQLITE_TRIGGERS[name]}"))
+    if missing:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def search_terms(query):
+    """
+    Split a user search string into lower-case words; punctuation and
+    search syntax are dropped.
+    """
+    return _WORD.findall((query or "").lower())
+
+
+def _sqlite_match(terms):
+    return literal_column(FTS_TABLE).op("MATCH")(
+        " ".join(f'"{term}"*' for term in terms)
+    )
+
+
+def _pg_tsquery(terms):
+    return to_tsquery(_PG_CONFIG, " & ".join(f"{term}:*" for term in terms))
+
+
+def match_query(terms, dialect_name):
+    """
+    Return a query of the transactions matching every term as a prefix,
+    with columns id and rank (lower is better).
+    """
+    if dialect_name == "sqlite":
+        return (
+            select(
+                literal_column("rowid").label("id"),
+                literal_column("rank").label("rank"),
+            )
+            .select_from(text(FTS_TABLE))
+            .where(_sqlite_match(terms))
+        )
+    if dialect_name == "postgresql":
+        tsquery = _pg_tsquery(terms)
+        return select(
+            Transaction.id.label("id"),
+            (-func.ts_rank(_pg_document, tsquery)).label("rank"),
+        ).where(_pg_document.op("@@")(tsquery))
+    raise NotImplementedError(f"No transaction search on {dialect_name}")
+
+
+def _fold(word):
+    # Lower-case without accents, like the FTS5 tokenizer.
+    decomposed = unicodedata.normalize("NFKD", word.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def snippet(terms, *values):
+    """
+    Return the first of `values` containing a match, cut to SNIPPET_TOKENS
+    words from around its first match, with matched words wrapped in
+    SNIPPET_START/SNIPPET_END. None if no value matches.
+    """
+    folded = [_fold(term) for term in terms]
+
+    def mark(match):
+        word = match.group()
+        if any(_fold(word).startswith(term) for term in folded):
+            return f"{SNIPPET_START}{word}{SNIPPET_END}"
+        return word
+
+    for value in values:
+        words = (value or "").split()
+        marked = [_WORD.sub(mark, word) for word in words]
+        hits = [i for i, word in enumerate(marked) if word != words[i]]
+        if not hits:
+            continue
+        start = max(0, min(hits[0] - 2, len(words) - SNIPPET_TOKENS))
+        end = start + SNIPPET_TOKENS
+        excerpt = " ".join(marked[start:end])
+        return ("…" if start else "") + excerpt + ("…" if end < len(words) else "")
+    return None
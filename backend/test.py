@@ -8,7 +8,6 @@ fetches account data from Teller, and upserts the data into the database.
 import json
 import sys
 
-import requests
 from app import create_app
 from app.config import (
     FILES,
@@ -17,6 +16,7 @@ from app.config import (
     VARIABLE_ENV_TOKEN,
     logger,
 )
+from app.helpers.provider_client import teller_client
 from app.sql import account_logic
 
 # Use the shared certificate paths from config.
@@ -54,7 +54,7 @@ def dev_write_token_info(token_info):
 
     url_accounts = f"{TELLER_API_BASE_URL}/accounts"
     try:
-        response = requests.get(
+        response = teller_client().get(
             url_accounts,
             cert=(TELLER_DOT_CERT, TELLER_DOT_KEY),
             auth=(access_token, ""),
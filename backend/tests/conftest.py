@@ -0,0 +1,104 @@
+"""
+Shared fixtures. app.config reads the environment once, at import, so the
+test database and settings are set here before any test imports the app:
+a throwaway SQLite file, no background workers or scheduler, no raw archive.
+"""
+
+import json
+import os
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="pynance-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DATA_DIR, 'test.db')}"
+os.environ["JOB_WORKERS"] = "0"
+os.environ["REFRESH_SCHEDULER_INTERVAL"] = "0"
+os.environ["RAW_ARCHIVE_ENABLED"] = "false"
+os.environ["LOG_LEVEL"] = "WARNING"
+
+import pytest
+from app import create_app
+from app.extensions import db
+from app.sql import account_logic
+
+
+@pytest.fixture(scope="session")
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def session(app):
+    """
+    The app's database session inside an application context. Every table
+    is emptied afterwards.
+    """
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        account_logic.invalidate_transaction_counts()
+
+
+class FakeResponse:
+    """
+    Just enough of a streamed requests.Response for the provider code.
+    """
+
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self._data = data
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self._data
+
+    def iter_content(self, chunk_size=1):
+        # Small chunks so the streaming parser sees split tokens.
+        body = self.text.encode("utf-8")
+        return (body[i : i + 7] for i in range(0, len(body), 7))
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakePlaid:
+    """
+    Stands in for the pooled Plaid client. `handlers` maps an endpoint path
+    (e.g. "/transactions/sync") to fn(payload) returning a FakeResponse;
+    every request's path and payload is recorded in `calls`.
+    """
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.calls = []
+
+    def post(self, url, json=None, **kwargs):
+        path = "/" + url.split("/", 3)[-1]
+        self.calls.append((path, json))
+        return self.handlers[path](json)
+
+
+@pytest.fixture
+def fake_plaid(monkeypatch):
+    """
+    Install a FakePlaid built from a handlers dict; returns the installer.
+    """
+
+    def install(handlers):
+        client = FakePlaid(handlers)
+        monkeypatch.setattr(account_logic, "plaid_client", lambda: client)
+        return client
+
+    return install
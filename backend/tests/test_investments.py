@@ -0,0 +1,120 @@
+from datetime import date
+
+import pytest
+from app.models import PlaidItem
+from app.sql import investment_logic
+
+JAN_1, JAN_2, JAN_3 = date(2025, 1, 1), date(2025, 1, 2), date(2025, 1, 3)
+
+
+def snapshot(item_id, account_id, on, **values):
+    investment_logic.save_holdings_snapshot(
+        item_id,
+        [
+            {
+                "account_id": account_id,
+                "security_id": security_id,
+                "quantity": 1,
+                "institution_value": value,
+            }
+            for security_id, value in values.items()
+        ],
+        [{"account_id": account_id, "name": account_id}],
+        snapshot_date=on,
+    )
+
+
+@pytest.fixture
+def portfolio(session):
+    """
+    Two items of user "u" refreshed on different days, plus another user's
+    item: "brokerage" snapshots Jan 1 and Jan 3, "ira" only Jan 2.
+    """
+    for user_id, item_id in (("u", "brokerage"), ("u", "ira"), ("v", "other")):
+        session.add(
+            PlaidItem(
+                user_id=user_id,
+                item_id=item_id,
+                access_token=f"tok-{item_id}",
+                institution_name="Broker",
+                product="investments",
+            )
+        )
+    investment_logic.bulk_upsert_securities(
+        [
+            {"security_id": "AAPL", "name": "Apple", "type": "equity"},
+            {"security_id": "VTI", "name": "Total Market", "type": "etf"},
+        ]
+    )
+    snapshot("brokerage", "acc-b", JAN_1, AAPL=100)
+    snapshot("brokerage", "acc-b", JAN_3, AAPL=120, VTI=30)
+    snapshot("ira", "acc-i", JAN_2, VTI=50)
+    snapshot("other", "acc-o", JAN_3, AAPL=999)
+    session.commit()
+
+
+def test_holdings_take_each_items_latest_snapshot(portfolio):
+    holdings = investment_logic.get_holdings(user_id="u")
+
+    assert [
+        (h["account_id"], h["security_id"], h["snapshot_date"]) for h in holdings
+    ] == [
+        ("acc-b", "AAPL", "2025-01-03"),
+        ("acc-i", "VTI", "2025-01-02"),
+        ("acc-b", "VTI", "2025-01-03"),
+    ]
+
+
+def test_holdings_as_of_a_date(portfolio):
+    holdings = investment_logic.get_holdings(user_id="u", snapshot_date=JAN_2)
+
+    assert {(h["account_id"], h["value"]) for h in holdings} == {
+        ("acc-b", 100),
+        ("acc-i", 50),
+    }
+    assert [h["value"] for h in investment_logic.get_holdings(account_id="acc-i")] == [
+        50
+    ]
+
+
+def test_composition_covers_every_item(portfolio):
+    composition = investment_logic.get_composition(user_id="u", group_by="account")
+
+    assert composition["snapshot_date"] == "2025-01-03"
+    assert composition["total_value"] == 200
+    assert [(g["account_id"], g["value"]) for g in composition["groups"]] == [
+        ("acc-b", 150),
+        ("acc-i", 50),
+    ]
+    by_type = investment_logic.get_composition(user_id="u")["groups"]
+    assert {g["type"]: g["share"] for g in by_type} == {"equity": 0.6, "etf": 0.4}
+
+
+def test_value_history_carries_items_forward(portfolio):
+    assert investment_logic.get_value_history(user_id="u") == [
+        {"date": "2025-01-01", "value": 100},
+        {"date": "2025-01-02", "value": 150},
+        {"date": "2025-01-03", "value": 200},
+    ]
+
+
+def test_empty_portfolio(session):
+    assert investment_logic.get_holdings() == []
+    assert investment_logic.get_composition() == {
+        "snapshot_date": None,
+        "total_value": 0,
+        "groups": [],
+    }
+    assert investment_logic.get_value_history() == []
+
+
+def test_routes(app, portfolio):
+    client = app.test_client()
+    base = "/api/plaid/investments"
+
+    history = client.get(f"{base}/history?user_id=u").get_json()["data"]
+    assert [point["value"] for point in history] == [100, 150, 200]
+    holdings = client.get(f"{base}/holdings?user_id=u&date=2025-01-02")
+    assert len(holdings.get_json()["data"]) == 2
+    assert client.get(f"{base}/holdings?date=Jan-2").status_code == 400
+    assert client.get(f"{base}/composition?group_by=colour").status_code == 400
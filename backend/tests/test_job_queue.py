@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+import pytest
+from app.models import RefreshJob
+from app.sql import job_queue
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """
+    Register test job handlers; returns the registering function.
+    """
+
+    def register(job_type, fn):
+        monkeypatch.setitem(job_queue.HANDLERS, job_type, fn)
+
+    return register
+
+
+def running_job(session, owner, heartbeat_age):
+    job = RefreshJob(
+        job_type="echo",
+        status="running",
+        params="{}",
+        owner=owner,
+        started_at=datetime.utcnow(),
+        heartbeat_at=datetime.utcnow() - timedelta(seconds=heartbeat_age),
+    )
+    session.add(job)
+    session.commit()
+    return job.id
+
+
+def status(session, job_id):
+    session.expire_all()
+    return session.get(RefreshJob, job_id)
+
+
+def test_enqueue_coalesces_and_delays(session, handlers):
+    handlers("echo", lambda params, report: params)
+    with pytest.raises(ValueError):
+        job_queue.enqueue("nope")
+
+    first = job_queue.enqueue("echo", {"n": 1}, dedupe_key="k", delay=60)
+    again = job_queue.enqueue("echo", {"n": 2}, dedupe_key="k")
+
+    assert again.id == first.id
+    assert job_queue.claim_next_job() is None  # still inside its delay
+    ready = job_queue.enqueue("echo", {"n": 3})
+    assert job_queue.claim_next_job() == ready.id
+
+
+def test_claim_run_and_record(session, handlers):
+    def echo(params, report_progress):
+        report_progress({"step": 1})
+        return {"echo": params["n"]}
+
+    handlers("echo", echo)
+    job = job_queue.enqueue("echo", {"n": 7})
+
+    job_id = job_queue.claim_next_job()
+    claimed = status(session, job_id)
+    assert (claimed.status, claimed.owner) == ("running", job_queue.OWNER_ID)
+    assert claimed.heartbeat_at is not None
+    assert job_queue.claim_next_job() is None
+
+    job_queue.run_job(job_id)
+    done = job_queue.get_job(job.id)
+    assert done["status"] == "succeeded"
+    assert done["result"] == {"echo": 7}
+    assert done["progress"] == {"step": 1}
+
+
+def test_failed_job_records_error(session, handlers):
+    def fail(params, report_progress):
+        raise RuntimeError("provider down")
+
+    handlers("fail", fail)
+    job_queue.enqueue("fail")
+
+    job_queue.run_job(job_queue.claim_next_job())
+
+    (job,) = job_queue.list_jobs()
+    assert (job["status"], job["error"]) == ("failed", "provider down")
+
+
+def test_only_expired_leases_are_requeued(session, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 60)
+    live_other = running_job(session, "other-host:1", heartbeat_age=5)
+    dead_other = running_job(session, "other-host:2", heartbeat_age=600)
+    stale_mine = running_job(session, job_queue.OWNER_ID, heartbeat_age=50)
+
+    # Our heartbeat renews our own lease before it can expire.
+    job_queue.renew_leases()
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 30)
+
+    assert job_queue.requeue_interrupted_jobs() == 1
+    assert status(session, live_other).status == "running"
+    assert status(session, stale_mine).status == "running"
+    requeued = status(session, dead_other)
+    assert (requeued.status, requeued.owner, requeued.heartbeat_at) == (
+        "queued",
+        None,
+        None,
+    )
+
+
+def test_outcome_is_dropped_after_losing_the_lease(session, handlers):
+    def slow(params, report_progress):
+        # Meanwhile our lease expired and another process took the job over.
+        session.execute(
+            RefreshJob.__table__.update()
+            .where(RefreshJob.id == job_id)
+            .values(owner="other-host:3")
+        )
+        session.commit()
+        return {"done": True}
+
+    handlers("slow", slow)
+    job_queue.enqueue("slow")
+    job_id = job_queue.claim_next_job()
+
+    job_queue.run_job(job_id)
+
+    job = status(session, job_id)
+    assert (job.status, job.owner, job.result) == ("running", "other-host:3", None)
@@ -0,0 +1,55 @@
+import logging
+
+from app.config import ModuleLevelFilter, RateLimitFilter, parse_module_levels
+
+
+def record(level=logging.DEBUG, lineno=10, module="account_logic", msg="row %s"):
+    rec = logging.LogRecord(
+        "app.config", level, f"/app/sql/{module}.py", lineno, msg, (1,), None
+    )
+    rec.module = module
+    return rec
+
+
+def passed(log_filter, records):
+    return [rec for rec in records if log_filter.filter(rec)]
+
+
+def test_rate_limit_drops_debug_per_call_site_and_reports_it(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("app.config.time.monotonic", lambda: clock[0])
+    log_filter = RateLimitFilter(limit=2, window=10)
+
+    assert len(passed(log_filter, [record() for _ in range(5)])) == 2
+    # Another call site has its own budget.
+    assert len(passed(log_filter, [record(lineno=11) for _ in range(3)])) == 2
+
+    clock[0] += 10
+    first = record()
+    assert log_filter.filter(first)
+    assert first.getMessage() == "row 1 [3 similar messages suppressed]"
+
+
+def test_rate_limit_only_applies_up_to_max_level():
+    log_filter = RateLimitFilter(limit=1, window=60)
+    for level in (logging.INFO, logging.WARNING, logging.ERROR):
+        assert len(passed(log_filter, [record(level) for _ in range(5)])) == 5
+
+    info_too = RateLimitFilter(limit=1, window=60, max_level=logging.INFO)
+    assert len(passed(info_too, [record(logging.INFO) for _ in range(5)])) == 1
+    assert len(passed(info_too, [record(logging.WARNING) for _ in range(5)])) == 5
+
+
+def test_rate_limit_zero_disables_it():
+    assert len(passed(RateLimitFilter(limit=0, window=60), [record()] * 5)) == 5
+
+
+def test_module_levels():
+    levels = parse_module_levels("account_logic=INFO, refresh_engine=warning,x=NOPE,")
+    assert levels == {"account_logic": logging.INFO, "refresh_engine": logging.WARNING}
+
+    log_filter = ModuleLevelFilter(logging.DEBUG, levels)
+    assert not log_filter.filter(record(logging.DEBUG))
+    assert log_filter.filter(record(logging.INFO))
+    assert not log_filter.filter(record(logging.INFO, module="refresh_engine"))
+    assert log_filter.filter(record(logging.DEBUG, module="charts"))
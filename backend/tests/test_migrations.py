@@ -0,0 +1,225 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from app.extensions import configure_engine, db
+from app.models import Account, AccountDetails, AccountHistory, Transaction
+from app.sql import transaction_search
+from app.sql.migrations import MIGRATIONS, run_migrations
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.orm import Session
+
+# The schema of the original release, as its create_all made it on SQLite.
+BASELINE_SCHEMA = """
+CREATE TABLE accounts (
+    id INTEGER NOT NULL,
+    account_id VARCHAR(64) NOT NULL,
+    user_id VARCHAR(64) NOT NULL,
+    access_token VARCHAR(256),
+    name VARCHAR(128),
+    type VARCHAR(64),
+    subtype VARCHAR(64),
+    status VARCHAR(64),
+    institution_name VARCHAR(128),
+    balance FLOAT,
+    last_refreshed DATETIME,
+    link_type VARCHAR(64),
+    PRIMARY KEY (id),
+    UNIQUE (account_id)
+);
+CREATE TABLE plaid_items (
+    id INTEGER NOT NULL,
+    user_id VARCHAR(64) NOT NULL,
+    item_id VARCHAR(64) NOT NULL,
+    access_token VARCHAR(256) NOT NULL,
+    institution_name VARCHAR(128) NOT NULL,
+    product VARCHAR(32) NOT NULL,
+    created_at DATETIME,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    UNIQUE (item_id)
+);
+CREATE TABLE account_details (
+    id INTEGER NOT NULL,
+    account_id VARCHAR(64) NOT NULL,
+    enrollment_id VARCHAR(64),
+    refresh_links TEXT,
+    PRIMARY KEY (id),
+    UNIQUE (account_id),
+    FOREIGN KEY(account_id) REFERENCES accounts (account_id)
+);
+CREATE TABLE account_history (
+    id INTEGER NOT NULL,
+    account_id VARCHAR(64) NOT NULL,
+    date DATE NOT NULL,
+    balance FLOAT,
+    PRIMARY KEY (id),
+    FOREIGN KEY(account_id) REFERENCES accounts (account_id)
+);
+CREATE TABLE transactions (
+    id INTEGER NOT NULL,
+    transaction_id VARCHAR(64) NOT NULL,
+    account_id VARCHAR(64),
+    amount FLOAT,
+    date VARCHAR(64),
+    description VARCHAR(256),
+    category VARCHAR(128),
+    merchant_name VARCHAR(128),
+    merchant_typ VARCHAR(64),
+    user_modified BOOLEAN,
+    user_modified_fields TEXT,
+    PRIMARY KEY (id),
+    UNIQUE (transaction_id),
+    FOREIGN KEY(account_id) REFERENCES accounts (account_id)
+);
+"""
+
+BASELINE_ROWS = """
+INSERT INTO accounts (id, account_id, user_id, name, type, balance, last_refreshed,
+    link_type) VALUES
+    (1, 'chk', 'u', 'Checking', 'depository', 1234.56, '2024-01-01 00:00:00', 'Teller'),
+    (2, 'cc', 'u', 'Card', 'credit', -50.5, '2024-01-01 00:00:00', 'Plaid');
+INSERT INTO plaid_items (id, user_id, item_id, access_token, institution_name, product)
+    VALUES (1, 'u', 'item', 'tok', 'Bank', 'transactions');
+INSERT INTO account_details (id, account_id, enrollment_id, refresh_links)
+    VALUES (1, 'chk', 'enr', '{}');
+INSERT INTO account_history (id, account_id, date, balance) VALUES
+    (1, 'chk', '2024-01-01', 1000.1),
+    (2, 'chk', '2024-01-01', 1000.2),
+    (3, 'chk', '2024-01-02', 1234.56);
+INSERT INTO transactions (id, transaction_id, account_id, amount, date, description,
+    merchant_name) VALUES
+    (1, 't1', 'chk', 19.99, '2024-01-15T10:30:00Z', 'STARBUCKS COFFEE #123', 'Starbucks'),
+    (2, 't2', 'chk', -0.1, '2024-02-01', 'Payroll', NULL),
+    (3, 't3', 'cc', 0.3, 'garbage', 'Café Crème', 'Bistro');
+"""
+
+
+def make_engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    configure_engine(engine)
+    return engine
+
+
+def migrate(engine):
+    # Mirrors create_app: create missing tables, then migrate.
+    db.metadata.create_all(engine)
+    run_migrations(engine)
+
+
+def schema(engine):
+    inspector = inspect(engine)
+    return {
+        table.name: (
+            {column["name"] for column in inspector.get_columns(table.name)},
+            {index["name"] for index in inspector.get_indexes(table.name)},
+        )
+        for table in db.metadata.sorted_tables
+    }
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    engine = make_engine(tmp_path / "baseline.db")
+    with engine.begin() as conn:
+        raw = conn.connection.driver_connection
+        raw.executescript(BASELINE_SCHEMA + BASELINE_ROWS)
+    yield engine
+    engine.dispose()
+
+
+def test_baseline_database_reaches_the_current_schema(baseline, tmp_path):
+    migrate(baseline)
+
+    with baseline.connect() as conn:
+        applied = conn.execute(text("SELECT name FROM schema_migrations")).scalars()
+        assert set(applied) == {name for name, _ in MIGRATIONS}
+        assert conn.execute(text("PRAGMA foreign_key_check")).all() == []
+        assert conn.execute(text("PRAGMA integrity_check")).scalar() == "ok"
+        assert not [
+            name for name in inspect(conn).get_table_names() if name.startswith("_old_")
+        ]
+
+    fresh = make_engine(tmp_path / "fresh.db")
+    migrate(fresh)
+    assert schema(baseline) == schema(fresh)
+    fresh.dispose()
+
+
+def test_baseline_rows_survive_migration(baseline):
+    migrate(baseline)
+
+    with Session(baseline) as session:
+        balances = dict(
+            session.execute(select(Account.account_id, Account.balance)).all()
+        )
+        assert balances == {"chk": Decimal("1234.56"), "cc": Decimal("-50.50")}
+        assert session.get(AccountDetails, 1).enrollment_id == "enr"
+
+        # Duplicate history rows for a day collapse to the newest one.
+        history = session.execute(
+            select(AccountHistory.date, AccountHistory.balance).order_by(
+                AccountHistory.date
+            )
+        ).all()
+        assert history == [
+            (date(2024, 1, 1), Decimal("1000.20")),
+            (date(2024, 1, 2), Decimal("1234.56")),
+        ]
+
+        rows = {
+            txn.transaction_id: txn
+            for txn in session.scalars(select(Transaction).order_by(Transaction.id))
+        }
+        assert [rows[t].amount for t in ("t1", "t2", "t3")] == [
+            Decimal("19.99"),
+            Decimal("-0.10"),
+            Decimal("0.30"),
+        ]
+        assert rows["t1"].date == date(2024, 1, 15)
+        assert rows["t1"].posted_at == datetime(2024, 1, 15, 10, 30)
+        assert (rows["t2"].date, rows["t2"].posted_at) == (date(2024, 2, 1), None)
+        assert rows["t3"].date is None
+
+
+def test_migrated_rows_are_searchable(baseline):
+    migrate(baseline)
+
+    def search(conn, query):
+        terms = transaction_search.search_terms(query)
+        matches = transaction_search.match_query(terms, "sqlite")
+        return sorted(
+            conn.execute(
+                select(Transaction.transaction_id).where(
+                    Transaction.id.in_(select(matches.subquery().c.id))
+                )
+            ).scalars()
+        )
+
+    with baseline.begin() as conn:
+        assert search(conn, "star coff") == ["t1"]
+        assert search(conn, "creme") == ["t3"]
+        # The sync triggers survive the table rebuilds.
+        conn.execute(
+            text(
+                "UPDATE transactions SET description = 'Corner Coffee' "
+                "WHERE transaction_id = 't2'"
+            )
+        )
+        assert search(conn, "coffee") == ["t1", "t2"]
+
+
+def test_migrations_run_once(baseline):
+    migrate(baseline)
+    before = schema(baseline)
+    with baseline.connect() as conn:
+        applied = conn.execute(text("SELECT COUNT(*) FROM schema_migrations")).scalar()
+
+    migrate(baseline)
+
+    assert schema(baseline) == before
+    with baseline.connect() as conn:
+        assert (
+            conn.execute(text("SELECT COUNT(*) FROM schema_migrations")).scalar()
+            == applied
+        )
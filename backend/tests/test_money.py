@@ -0,0 +1,93 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from app.helpers.money import from_minor_units, to_decimal, to_json, to_minor_units
+from app.models import Account, AccountHistory, Transaction
+from app.sql import account_logic
+from sqlalchemy import func, select, text
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (0.1, Decimal("0.10")),
+        (0.1 + 0.2, Decimal("0.30")),
+        ("12.345", Decimal("12.35")),
+        ("-12.345", Decimal("-12.35")),
+        (" 7 ", Decimal("7.00")),
+        (19.99, Decimal("19.99")),
+        (Decimal("1.005"), Decimal("1.01")),
+    ],
+)
+def test_to_decimal_rounds_half_up_to_cents(value, expected):
+    assert to_decimal(value) == expected
+    assert to_decimal(value).as_tuple().exponent == -2
+
+
+@pytest.mark.parametrize("value", ["abc", "", None, "nan", "inf", float("inf")])
+def test_to_decimal_rejects_non_amounts(value):
+    with pytest.raises(ValueError):
+        to_decimal(value)
+
+
+@pytest.mark.parametrize(
+    "value", ["0", "0.01", "-0.01", "19.99", "-1234.56", "123456789012.34"]
+)
+def test_minor_units_round_trip(value):
+    units = to_minor_units(value)
+    assert isinstance(units, int)
+    assert from_minor_units(units) == Decimal(value)
+
+
+def test_to_json():
+    assert to_json(Decimal("-1234.56")) == -1234.56
+    assert to_json(None) == 0
+
+
+def test_money_columns_store_cents(session):
+    session.add(
+        Account(account_id="acc", user_id="u", name="Checking", balance=0.1 + 0.2)
+    )
+    session.add(AccountHistory(account_id="acc", date=date.today()))
+    session.commit()
+
+    raw = session.execute(text("SELECT balance FROM accounts")).scalar()
+    assert raw == 30
+    session.expire_all()
+    assert session.get(Account, 1).balance == Decimal("0.30")
+    assert AccountHistory.query.one().balance == Decimal("0.00")
+
+
+def test_transaction_amounts_survive_ingest_and_serialization(session):
+    session.add(Account(account_id="acc", user_id="u", name="Checking"))
+    session.commit()
+    amounts = [19.99, "-5.5", 0.1, 0.1, 0.1, "1234567.89"]
+    rows = [
+        account_logic.normalize_plaid_transaction(
+            {
+                "transaction_id": f"t{i}",
+                "amount": amount,
+                "date": "2025-01-0%d" % (i + 1),
+            },
+            "acc",
+        )
+        for i, amount in enumerate(amounts)
+    ]
+    account_logic.bulk_upsert_transactions(rows)
+    session.commit()
+
+    stored = session.execute(
+        select(Transaction.transaction_id, Transaction.amount).order_by(Transaction.id)
+    ).all()
+    assert [amount for _, amount in stored] == [to_decimal(a) for a in amounts]
+    # Sums are exact in SQL and load as Decimals.
+    total = session.execute(
+        select(func.sum(Transaction.amount, type_=Transaction.amount.type))
+    ).scalar()
+    assert total == Decimal("1234582.68")
+
+    listed, _ = account_logic.get_paginated_transactions(
+        1, 10, sort="date", order="asc"
+    )
+    assert [txn["amount"] for txn in listed] == [19.99, -5.5, 0.1, 0.1, 0.1, 1234567.89]
@@ -0,0 +1,192 @@
+from datetime import date
+
+import pytest
+from app.models import Account, PlaidItem, Transaction
+from app.sql import refresh_engine
+from tests.conftest import FakeResponse
+
+PLAID_URL = "https://sandbox.plaid.com"
+MUTATION = FakeResponse(
+    {"error_code": "TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION"}, status_code=400
+)
+
+
+def txn(transaction_id, account_id="acc", amount=1, name="Coffee"):
+    return {
+        "transaction_id": transaction_id,
+        "account_id": account_id,
+        "amount": amount,
+        "date": "2025-01-02",
+        "name": name,
+    }
+
+
+def page(next_cursor, has_more=False, added=(), modified=(), removed=()):
+    return FakeResponse(
+        {
+            "added": list(added),
+            "modified": list(modified),
+            "removed": [{"transaction_id": tid} for tid in removed],
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        }
+    )
+
+
+@pytest.fixture
+def item(session):
+    for account_id in ("acc", "acc2"):
+        session.add(
+            Account(
+                account_id=account_id,
+                user_id="u",
+                name=account_id,
+                access_token="tok",
+                link_type="Plaid",
+            )
+        )
+    item = PlaidItem(
+        user_id="u",
+        item_id="item",
+        access_token="tok",
+        institution_name="Bank",
+        product="transactions",
+        sync_cursor="c0",
+    )
+    session.add(item)
+    session.commit()
+    return item
+
+
+@pytest.fixture
+def plaid_sync(fake_plaid):
+    """
+    Install a fake Plaid whose /transactions/sync answers with `responses`
+    in order; returns the fake, whose sync_cursors lists the cursor of each
+    sync request.
+    """
+
+    def install(responses):
+        responses = list(responses)
+        client = fake_plaid(
+            {
+                "/accounts/get": lambda payload: FakeResponse({"accounts": []}),
+                "/transactions/sync": lambda payload: responses.pop(0),
+            }
+        )
+        client.sync_cursors = lambda: [
+            payload.get("cursor")
+            for path, payload in client.calls
+            if path == "/transactions/sync"
+        ]
+        return client
+
+    return install
+
+
+def refresh(session):
+    accounts = Account.query.order_by(Account.id).all()
+    results = refresh_engine.refresh_plaid_accounts(accounts, PLAID_URL, mode="sync")
+    session.expire_all()
+    return results
+
+
+def stored(session):
+    return {
+        t.transaction_id: t.account_id
+        for t in Transaction.query.order_by(Transaction.id)
+    }
+
+
+def test_sync_restarts_from_original_cursor_on_mutation(session, item, plaid_sync):
+    client = plaid_sync(
+        [
+            page("c1", has_more=True, added=[txn("t1"), txn("t2")]),
+            MUTATION,
+            page("c1b", has_more=True, added=[txn("t1"), txn("t2", name="Tea")]),
+            page("c2", added=[txn("t3", account_id="acc2")]),
+        ]
+    )
+
+    results = refresh(session)
+
+    assert client.sync_cursors() == ["c0", "c1", "c0", "c1b"]
+    assert {result["status"] for result in results} == {"updated"}
+    # The replayed page is upserted again, not duplicated.
+    assert stored(session) == {"t1": "acc", "t2": "acc", "t3": "acc2"}
+    assert Transaction.query.filter_by(transaction_id="t2").one().description == "Tea"
+    assert PlaidItem.query.one().sync_cursor == "c2"
+
+
+def test_sync_gives_up_after_repeated_mutations(session, item, plaid_sync):
+    plaid_sync([page("c1", has_more=True, added=[txn("t1")]), MUTATION] * 3)
+
+    results = refresh(session)
+
+    assert {result["status"] for result in results} == {"error"}
+    assert "kept changing" in results[0]["error"]
+    assert stored(session) == {}
+    assert PlaidItem.query.one().sync_cursor == "c0"
+
+
+def test_sync_applies_removals(session, item, plaid_sync):
+    for tid in ("old1", "old2", "keep"):
+        session.add(
+            Transaction(transaction_id=tid, account_id="acc", date=date(2025, 1, 1))
+        )
+    session.commit()
+    plaid_sync(
+        [
+            page("c1", has_more=True, added=[txn("t1")], removed=["old1"]),
+            # Unknown ids are ignored; removals are applied after all pages.
+            page("c2", removed=["old2", "never-stored"]),
+        ]
+    )
+
+    results = refresh(session)
+
+    assert results[0]["transactions"]["removed"] == 2
+    assert stored(session) == {"keep": "acc", "t1": "acc"}
+    assert PlaidItem.query.one().sync_cursor == "c2"
+
+
+def test_sync_skips_untracked_accounts(session, item, plaid_sync):
+    plaid_sync([page("c1", added=[txn("t1"), txn("t2", account_id="other")])])
+
+    refresh(session)
+
+    assert stored(session) == {"t1": "acc"}
+
+
+def test_failed_sync_keeps_no_pages_and_the_old_cursor(session, item, plaid_sync):
+    plaid_sync(
+        [
+            page("c1", has_more=True, added=[txn("t1")]),
+            FakeResponse({"error_code": "INTERNAL_SERVER_ERROR"}, status_code=500),
+        ]
+    )
+    last_refreshed = [a.last_refreshed for a in Account.query.order_by(Account.id)]
+
+    results = refresh(session)
+
+    assert {result["status"] for result in results} == {"error"}
+    assert stored(session) == {}
+    assert PlaidItem.query.one().sync_cursor == "c0"
+    assert [a.last_refreshed for a in Account.query.order_by(Account.id)] == (
+        last_refreshed
+    )
+
+    # The next sync resumes from the old cursor and picks the page up.
+    plaid_sync([page("c1", added=[txn("t1")])])
+    assert {result["status"] for result in refresh(session)} == {"updated"}
+    assert stored(session) == {"t1": "acc"}
+    assert PlaidItem.query.one().sync_cursor == "c1"
+
+
+def test_sync_job_fails_when_an_item_errors(session, item, plaid_sync):
+    plaid_sync([MUTATION] * 3)
+
+    with pytest.raises(RuntimeError, match="failed to refresh"):
+        refresh_engine.run_plaid_item_refresh_job(
+            {"item_id": "item"}, lambda progress: None
+        )
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import time
+
+import jwt
+import pytest
+from app.helpers import plaid_helpers
+from app.models import PlaidItem, RefreshJob
+from app.routes import plaid_webhooks
+from cryptography.hazmat.primitives.asymmetric import ec
+from tests.conftest import FakePlaid, FakeResponse
+
+URL = "/api/plaid/webhooks/"
+BODY = json.dumps(
+    {
+        "webhook_type": "TRANSACTIONS",
+        "webhook_code": "SYNC_UPDATES_AVAILABLE",
+        "item_id": "item",
+    }
+).encode()
+PLAID_KEY = ec.generate_private_key(ec.SECP256R1())
+
+
+def jwk(expired_at=None):
+    key = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(PLAID_KEY.public_key()))
+    key.update(kid="k1", alg="ES256", use="sig", created_at=1, expired_at=expired_at)
+    return key
+
+
+def sign(body=BODY, iat=None, key=PLAID_KEY, kid="k1"):
+    claims = {
+        "iat": int(time.time()) if iat is None else iat,
+        "request_body_sha256": hashlib.sha256(body).hexdigest(),
+    }
+    return jwt.encode(claims, key, algorithm="ES256", headers={"kid": kid})
+
+
+@pytest.fixture
+def plaid_keys(session, monkeypatch):
+    """
+    A known Plaid item, verification on, and a fake key endpoint serving
+    PLAID_KEY as "k1". Returns the fake client and its key.
+    """
+    session.add(
+        PlaidItem(
+            user_id="u",
+            item_id="item",
+            access_token="tok",
+            institution_name="Bank",
+            product="transactions",
+        )
+    )
+    session.commit()
+    key = jwk()
+    client = FakePlaid(
+        {"/webhook_verification_key/get": lambda payload: FakeResponse({"key": key})}
+    )
+    monkeypatch.setattr(plaid_helpers, "plaid_client", lambda: client)
+    monkeypatch.setattr(plaid_helpers, "_webhook_keys", {})
+    monkeypatch.setattr(plaid_webhooks, "PLAID_WEBHOOK_VERIFY", True)
+    return client, key
+
+
+def post(app, token, body=BODY):
+    headers = {"Content-Type": "application/json"}
+    if token is not None:
+        headers["Plaid-Verification"] = token
+    return app.test_client().post(URL, data=body, headers=headers)
+
+
+def test_verified_webhook_queues_one_refresh(app, plaid_keys):
+    client, _ = plaid_keys
+
+    first = post(app, sign())
+    second = post(app, sign())
+
+    assert first.status_code == second.status_code == 200
+    assert RefreshJob.query.count() == 1
+    # The key is fetched once and cached.
+    assert [payload["key_id"] for _, payload in client.calls] == ["k1"]
+
+
+@pytest.mark.parametrize(
+    "token, body",
+    [
+        (None, BODY),
+        ("not-a-jwt", BODY),
+        (sign(), BODY.replace(b'"item"', b'"other"')),
+        (sign(iat=int(time.time()) - 3600), BODY),
+        (sign(key=ec.generate_private_key(ec.SECP256R1())), BODY),
+        (
+            jwt.encode({"iat": 1}, "s" * 32, algorithm="HS256", headers={"kid": "k1"}),
+            BODY,
+        ),
+    ],
+    ids=["missing", "malformed", "tampered", "too-old", "wrong-key", "hs256"],
+)
+def test_unverified_webhooks_are_rejected(app, plaid_keys, token, body):
+    resp = post(app, token, body)
+
+    assert resp.status_code == 401
+    assert RefreshJob.query.count() == 0
+
+
+def test_expired_key_is_refetched_and_rejected(app, plaid_keys):
+    client, key = plaid_keys
+    assert post(app, sign()).status_code == 200
+
+    key["expired_at"] = int(time.time())
+    assert post(app, sign()).status_code == 401
+    assert post(app, sign()).status_code == 401
+    assert len(client.calls) == 3
+
+
+def test_verify_webhook_checks_the_body_hash(plaid_keys):
+    plaid_helpers.verify_webhook(BODY, sign())
+    with pytest.raises(ValueError, match="does not match"):
+        plaid_helpers.verify_webhook(BODY + b" ", sign())
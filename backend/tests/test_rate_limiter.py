@@ -0,0 +1,109 @@
+import time
+
+import pytest
+from app.helpers import rate_limiter
+from app.helpers.provider_client import ProviderClient
+from app.helpers.rate_limiter import RateLimited, TokenBucket
+from tests.conftest import FakeResponse
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    """
+    Fresh buckets for a fast "teller" provider with a 1 second max_backoff.
+    """
+    monkeypatch.setattr(rate_limiter, "_buckets", {})
+    monkeypatch.setitem(
+        rate_limiter.RATE_LIMITS,
+        "teller",
+        {
+            "rate": 1000,
+            "burst": 100,
+            "token_rate": 50,
+            "token_burst": 2,
+            "max_backoff": 1.0,
+        },
+    )
+
+
+def remaining_pause(bucket):
+    return bucket._paused_until - time.monotonic()
+
+
+def test_acquire_spends_the_burst_then_paces():
+    bucket = TokenBucket(rate=50, capacity=2)
+
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    started = time.monotonic()
+    waited = bucket.acquire()
+
+    assert waited == pytest.approx(0.02, abs=0.01)
+    assert time.monotonic() - started >= 0.015
+
+
+def test_pause_blocks_acquire_until_it_ends():
+    bucket = TokenBucket(rate=1000, capacity=5)
+    bucket.pause(0.05)
+    bucket.pause(0.01)  # never shortens the pause
+
+    assert bucket.acquire() >= 0.04
+
+
+def test_acquire_raises_instead_of_waiting_past_max_wait():
+    bucket = TokenBucket(rate=1000, capacity=5)
+    bucket.pause(60)
+
+    started = time.monotonic()
+    with pytest.raises(RateLimited) as exc:
+        bucket.acquire(max_wait=1)
+
+    assert time.monotonic() - started < 0.5
+    assert exc.value.retry_after == pytest.approx(60, abs=1)
+    # Short waits still sleep through.
+    assert TokenBucket(rate=1000, capacity=1).acquire(max_wait=1) == 0
+
+
+def test_throttle_honours_retry_after_for_a_token(limits):
+    delay = rate_limiter.throttle("teller", "tok", 120, attempt=0, base=1)
+
+    assert delay == 120
+    assert remaining_pause(rate_limiter.get_bucket("teller", "tok")) > 100
+    assert remaining_pause(rate_limiter.get_bucket("teller")) <= 0
+    with pytest.raises(RateLimited):
+        rate_limiter.acquire("teller", "tok")
+    # Other tokens of the provider are unaffected.
+    assert rate_limiter.acquire("teller", "other") == 0
+
+
+def test_throttle_caps_a_provider_wide_pause_at_max_backoff(limits):
+    delay = rate_limiter.throttle("teller", None, 120, attempt=0, base=1)
+
+    assert delay == 120
+    assert 0 < remaining_pause(rate_limiter.get_bucket("teller")) <= 1.0
+    assert rate_limiter.acquire("teller", "tok") <= 1.0
+
+
+def test_throttle_backoff_without_retry_after_is_capped(limits):
+    for attempt in range(10):
+        delay = rate_limiter.throttle("teller", "tok", None, attempt, base=0.5)
+        assert 0 <= delay <= 1.0
+
+
+def test_client_returns_long_retry_after_and_then_fails_fast(limits, monkeypatch):
+    client = ProviderClient("teller")
+    throttled = FakeResponse({}, status_code=429)
+    throttled.headers = {"Retry-After": "120"}
+    sent = []
+
+    def send(method, url, **kwargs):
+        sent.append(url)
+        return throttled
+
+    monkeypatch.setattr(client.session, "request", send)
+
+    assert client.get("https://teller.test/a", rate_key="tok").status_code == 429
+    assert len(sent) == 1
+    with pytest.raises(RateLimited):
+        client.get("https://teller.test/b", rate_key="tok")
+    assert len(sent) == 1
@@ -0,0 +1,122 @@
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from app.models import Account, Transaction
+from app.sql import account_logic, refresh_engine
+from tests.conftest import FakeResponse
+
+TELLER_URL = "https://api.teller.test"
+
+
+def teller_txns(account_id, n):
+    # Newest first, the order Teller pages in.
+    return [
+        {
+            "id": f"{account_id}-t{i}",
+            "date": f"2025-01-{28 - i:02d}",
+            "amount": "-1.25",
+            "description": f"Purchase {i}",
+        }
+        for i in range(n)
+    ]
+
+
+class FakeTeller:
+    """
+    Serves balances and count/from_id transaction pages for the accounts in
+    `history`; any other account fails with a connection error.
+    """
+
+    def __init__(self, history):
+        self.history = history
+
+    def get(self, url, **kwargs):
+        parts = urlsplit(url)
+        _, _, account_id, resource = parts.path.split("/")
+        if account_id not in self.history:
+            raise ConnectionError(f"cannot reach {account_id}")
+        if resource == "balances":
+            return FakeResponse({"available": "10.00", "ledger": "10.00"})
+        params = parse_qs(parts.query)
+        txns = self.history[account_id]
+        start = 0
+        if "from_id" in params:
+            start = [t["id"] for t in txns].index(params["from_id"][0]) + 1
+        return FakeResponse(txns[start : start + int(params["count"][0])])
+
+
+@pytest.fixture
+def teller(session, monkeypatch):
+    """
+    Four linked Teller accounts with five transactions each, one of them
+    unreachable, read two transactions per page.
+    """
+    ids = ["t1", "t2", "t3", "t-down"]
+    for account_id in ids:
+        session.add(
+            Account(
+                account_id=account_id,
+                user_id="u",
+                name=account_id,
+                access_token="tok",
+                type="depository",
+                link_type="Teller",
+            )
+        )
+    session.commit()
+    client = FakeTeller({a: teller_txns(a, 5) for a in ids if a != "t-down"})
+    monkeypatch.setattr(account_logic, "teller_client", lambda: client)
+    monkeypatch.setattr(account_logic, "TELLER_TXN_PAGE_SIZE", 2)
+    monkeypatch.setattr(refresh_engine, "TELLER_REFRESH_QUEUE_PAGES", 1)
+    return ids
+
+
+def run_refresh(app, max_workers):
+    # On its own thread so a writer stuck on the queue fails the test
+    # instead of hanging it.
+    outcome = {}
+
+    def target():
+        with app.app_context():
+            accounts = Account.query.order_by(Account.account_id).all()
+            outcome["results"] = refresh_engine.refresh_teller_accounts(
+                accounts, {"u": "tok"}, "cert", "key", TELLER_URL, max_workers
+            )
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), "refresh did not finish"
+    return outcome["results"]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_refresh_streams_every_account_through_a_small_pool(
+    app, session, teller, max_workers
+):
+    results = {r["account_id"]: r for r in run_refresh(app, max_workers)}
+
+    assert sorted(results) == sorted(teller)
+    for account_id in ("t1", "t2", "t3"):
+        assert results[account_id]["status"] == "updated"
+        assert results[account_id]["error"] is None
+        assert results[account_id]["transactions"]["inserted"] == 5
+        stored = Transaction.query.filter_by(account_id=account_id).count()
+        assert stored == 5
+    assert results["t-down"]["status"] == "error"
+    assert "cannot reach" in results["t-down"]["error"]
+
+    session.expire_all()
+    accounts = {a.account_id: a for a in Account.query}
+    assert accounts["t1"].balance == accounts["t3"].balance == 10
+
+
+def test_refresh_resumes_from_watermark(app, session, teller):
+    run_refresh(app, 2)
+    results = {r["account_id"]: r for r in run_refresh(app, 2)}
+
+    # Only the trailing pending window is re-read and nothing is duplicated.
+    assert results["t1"]["status"] in ("updated", "unchanged")
+    assert results["t1"]["transactions"].get("inserted", 0) == 0
+    assert Transaction.query.filter_by(account_id="t1").count() == 5
@@ -0,0 +1,104 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from app.models import Account, RefreshJob
+from app.sql import scheduler
+
+NOW = datetime(2025, 3, 1, 12, 0)
+
+
+def minutes_ago(minutes):
+    return NOW - timedelta(minutes=minutes)
+
+
+@pytest.fixture
+def accounts(session, monkeypatch):
+    """
+    Teller accounts against a 60 minute default TTL, and one Plaid account.
+    """
+    monkeypatch.setattr(scheduler, "REFRESH_TTL_MINUTES", {"Teller": 60, "Plaid": 60})
+    rows = [
+        # account_id, last_refreshed, own TTL
+        ("fresh", minutes_ago(10), None),
+        ("old", minutes_ago(300), None),
+        ("older", minutes_ago(900), None),
+        ("never", None, None),
+        ("short-ttl", minutes_ago(10), 5),
+        ("long-ttl", minutes_ago(120), 600),
+    ]
+    for account_id, last_refreshed, ttl in rows:
+        session.add(
+            Account(
+                account_id=account_id,
+                user_id="u",
+                name=account_id,
+                link_type="Teller",
+                last_refreshed=last_refreshed,
+                refresh_ttl_minutes=ttl,
+            )
+        )
+    session.add(
+        Account(
+            account_id="plaid-old",
+            user_id="u",
+            name="plaid-old",
+            link_type="Plaid",
+            last_refreshed=minutes_ago(300),
+        )
+    )
+    session.commit()
+    # last_refreshed defaults to the insert time; clear it after the fact.
+    Account.query.filter_by(account_id="never").update({"last_refreshed": None})
+    session.commit()
+
+
+def stale_ids(now=NOW, **kwargs):
+    return [
+        account.account_id
+        for account in scheduler.find_stale_accounts("Teller", now=now, **kwargs)
+    ]
+
+
+def test_stale_accounts_least_recently_touched_first(accounts):
+    assert stale_ids() == ["never", "older", "old", "short-ttl"]
+    assert stale_ids(limit=2) == ["never", "older"]
+
+
+def test_schedules_one_job_per_provider_and_waits_for_it(session, accounts):
+    queued = scheduler.schedule_stale_refreshes(now=NOW)
+
+    assert set(queued) == {"teller_refresh", "plaid_refresh"}
+    params = json.loads(session.get(RefreshJob, queued["teller_refresh"]).params)
+    assert params == {
+        "account_ids": ["never", "older", "old", "short-ttl"],
+        "scheduled": True,
+    }
+    assert json.loads(session.get(RefreshJob, queued["plaid_refresh"]).params)[
+        "account_ids"
+    ] == ["plaid-old"]
+    # Nothing more while those jobs are pending.
+    assert scheduler.schedule_stale_refreshes(now=NOW) == {}
+
+
+def test_failed_attempts_are_retried_once_per_ttl(session, accounts):
+    scheduler.schedule_stale_refreshes(now=NOW)
+    # The jobs finished without refreshing anything.
+    RefreshJob.query.update({"status": "failed"})
+    session.commit()
+
+    # Only short-ttl's own 5 minute TTL has passed since the attempt.
+    queued = scheduler.schedule_stale_refreshes(now=NOW + timedelta(minutes=30))
+    assert list(queued) == ["teller_refresh"]
+    params = json.loads(session.get(RefreshJob, queued["teller_refresh"]).params)
+    assert params["account_ids"] == ["short-ttl"]
+
+    # After the default TTL the rest are retried, least recently touched
+    # first; "fresh" has aged past its TTL by then too.
+    assert stale_ids(now=NOW + timedelta(minutes=61)) == [
+        "fresh",
+        "old",
+        "older",
+        "never",
+        "short-ttl",
+    ]
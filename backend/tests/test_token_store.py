@@ -0,0 +1,72 @@
+import json
+import threading
+
+from app.helpers.token_store import TokenStore, get_store
+
+
+def test_missing_or_broken_file_is_empty(tmp_path):
+    assert TokenStore(tmp_path / "missing.json").all() == []
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json")
+    assert TokenStore(broken).by_user() == {}
+
+
+def test_add_and_lookup(tmp_path):
+    path = tmp_path / "tokens.json"
+    store = TokenStore(path)
+
+    store.add("u1", "tok-a", item_id="item-a")
+    store.add("u1", "tok-b")
+    store.add("u2", "tok-c", item_id="item-c")
+    # Same access token again: replaced, not duplicated.
+    store.add("u2", "tok-c", item_id="item-c2")
+
+    assert len(store.all()) == 3
+    assert json.loads(path.read_text()) == store.all()
+    # The first token stored for a user wins.
+    assert store.by_user() == {"u1": "tok-a", "u2": "tok-c"}
+    assert store.get_for_user("u3") is None
+    assert store.get_for_item("item-c2") == "tok-c"
+    assert store.get_for_item("item-c") is None
+
+
+def test_reads_the_file_once_until_it_changes(tmp_path, monkeypatch):
+    path = tmp_path / "tokens.json"
+    path.write_text(json.dumps([{"user_id": "u1", "access_token": "tok-a"}]))
+    store = TokenStore(path)
+    reads = []
+    read_file = store._read_file
+    monkeypatch.setattr(store, "_read_file", lambda: reads.append(1) or read_file())
+
+    for _ in range(5):
+        assert store.get_for_user("u1") == "tok-a"
+    assert len(reads) == 1
+
+    # Another process rewrote the file.
+    path.write_text(json.dumps([{"user_id": "u1", "access_token": "tok-new!"}]))
+    assert store.get_for_user("u1") == "tok-new!"
+    assert len(reads) == 2
+
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    path = tmp_path / "tokens.json"
+    # Two stores on one file stand in for two processes.
+    stores = [TokenStore(path), TokenStore(path)]
+
+    def add_many(n):
+        for i in range(20):
+            stores[n % 2].add(f"u{n}", f"tok-{n}-{i}")
+
+    threads = [threading.Thread(target=add_many, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(TokenStore(path).all()) == 80
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_stores_are_shared_per_path(tmp_path):
+    assert get_store(tmp_path / "a.json") is get_store(str(tmp_path / "a.json"))
+    assert get_store(tmp_path / "a.json") is not get_store(tmp_path / "b.json")
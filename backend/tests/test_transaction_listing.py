@@ -0,0 +1,143 @@
+from datetime import date, timedelta
+
+import pytest
+from app.models import Account, Transaction
+from app.sql import account_logic
+
+SORTS = [
+    (sort, order)
+    for sort in account_logic.TRANSACTION_SORT_KEYS
+    for order in ("asc", "desc")
+]
+
+
+@pytest.fixture
+def transactions(session):
+    """
+    47 transactions with many ties and some missing sort values, so ordering
+    relies on the id tiebreak and the NULLs-last rule.
+    """
+    session.add(Account(account_id="acc", user_id="u", name="Checking"))
+    for i in range(47):
+        session.add(
+            Transaction(
+                transaction_id=f"t{i:02d}",
+                account_id="acc",
+                date=date(2025, 1, 1) + timedelta(days=i % 5) if i % 11 else None,
+                amount=(i % 7) - 3,
+                category=None if i % 6 == 0 else f"cat{i % 3}",
+                merchant_name=None if i % 4 == 0 else f"m{i % 5}",
+            )
+        )
+    session.commit()
+    return Transaction.query.all()
+
+
+def expected_order(rows, sort, order):
+    present = [row for row in rows if getattr(row, sort) is not None]
+    missing = [row for row in rows if getattr(row, sort) is None]
+    descending = order == "desc"
+    present.sort(key=lambda row: (getattr(row, sort), row.id), reverse=descending)
+    missing.sort(key=lambda row: row.id, reverse=descending)
+    return [row.transaction_id for row in present + missing]
+
+
+def offset_listing(page_size, **kwargs):
+    listed, page = [], 1
+    while True:
+        rows, _ = account_logic.get_paginated_transactions(page, page_size, **kwargs)
+        if not rows:
+            return listed
+        listed += [row["transaction_id"] for row in rows]
+        page += 1
+
+
+def keyset_listing(page_size, **kwargs):
+    listed, cursor, pages = [], None, []
+    while True:
+        page = account_logic.get_transactions_page(page_size, cursor=cursor, **kwargs)
+        pages.append(page)
+        listed += [row["transaction_id"] for row in page["transactions"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return listed, pages
+
+
+@pytest.mark.parametrize("sort, order", SORTS)
+@pytest.mark.parametrize("page_size", [1, 5, 10, 47, 50])
+def test_keyset_matches_offset_ordering(transactions, sort, order, page_size):
+    expected = expected_order(transactions, sort, order)
+    assert offset_listing(page_size, sort=sort, order=order) == expected
+    listed, _ = keyset_listing(page_size, sort=sort, order=order)
+    assert listed == expected
+
+
+@pytest.mark.parametrize("sort, order", SORTS)
+def test_keyset_prev_walks_back_over_the_same_pages(transactions, sort, order):
+    _, pages = keyset_listing(6, sort=sort, order=order)
+    assert pages[0]["prev_cursor"] is None
+    for previous, page in zip(pages, pages[1:]):
+        back = account_logic.get_transactions_page(
+            6, cursor=page["prev_cursor"], direction="prev", sort=sort, order=order
+        )
+        assert back["transactions"] == previous["transactions"]
+
+
+def test_keyset_matches_offset_with_filters(transactions):
+    filters = {"category": "cat1", "min_amount": account_logic.to_decimal(-1)}
+    kwargs = {"filters": filters, "sort": "amount", "order": "desc"}
+    listed, _ = keyset_listing(4, **kwargs)
+    assert listed == offset_listing(4, **kwargs)
+    assert listed
+    assert len(listed) == account_logic.count_transactions(filters)
+
+
+def test_cursor_is_tied_to_its_sort(transactions):
+    page = account_logic.get_transactions_page(5, sort="amount", order="asc")
+    with pytest.raises(ValueError):
+        account_logic.get_transactions_page(
+            5, cursor=page["next_cursor"], sort="date", order="asc"
+        )
+    with pytest.raises(ValueError):
+        account_logic.get_transactions_page(5, cursor="not-a-cursor")
+
+
+def teller_txn(category, txn_id="tx1"):
+    return {
+        "id": txn_id,
+        "date": "2025-02-01",
+        "amount": "-4.50",
+        "description": "Lunch",
+        "details": {"category": category},
+    }
+
+
+def test_count_cache_drops_counts_when_a_row_is_updated(session):
+    session.add(Account(account_id="acc", user_id="u", name="Checking"))
+    account_logic.ingest_teller_transactions("acc", [teller_txn("dining")])
+    session.commit()
+    assert account_logic.count_transactions({"category": "dining"}) == 1
+    assert account_logic.count_transactions({"category": "groceries"}) == 0
+
+    stats = account_logic.ingest_teller_transactions("acc", [teller_txn("groceries")])
+    session.commit()
+
+    assert stats["updated"] == 1
+    assert account_logic.count_transactions({"category": "dining"}) == 0
+    assert account_logic.count_transactions({"category": "groceries"}) == 1
+
+
+def test_count_cache_drops_counts_on_manual_edit(app, session):
+    session.add(Account(account_id="acc", user_id="u", name="Checking"))
+    account_logic.ingest_teller_transactions("acc", [teller_txn("dining")])
+    session.commit()
+    assert account_logic.count_transactions({"user_modified": True}) == 0
+
+    resp = app.test_client().put(
+        "/api/teller/transactions/update",
+        json={"transaction_id": "tx1", "category": "travel"},
+    )
+
+    assert resp.status_code == 200
+    assert account_logic.count_transactions({"user_modified": True}) == 1
+    assert account_logic.count_transactions({"category": "travel"}) == 1
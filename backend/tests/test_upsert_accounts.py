@@ -0,0 +1,130 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from app.extensions import db
+from app.models import Account, AccountDetails, AccountHistory
+from app.sql import account_logic
+from sqlalchemy import event
+
+
+def teller_account(account_id, balance, **fields):
+    return {
+        "id": account_id,
+        "name": fields.pop("name", f"Account {account_id}"),
+        "type": fields.pop("type", "depository"),
+        "subtype": "checking",
+        "status": "open",
+        "currency": "USD",
+        "balance": {"current": balance},
+        "institution": {"name": "Bank"},
+        "enrollment_id": f"enr-{account_id}",
+        "links": {"self": f"/accounts/{account_id}"},
+        **fields,
+    }
+
+
+@pytest.fixture
+def statements(session):
+    """
+    Collect the SQL statements run while the test is active.
+    """
+    seen = []
+
+    def record(conn, cursor, statement, *args):
+        seen.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(db.engine, "before_cursor_execute", record)
+
+
+def accounts(session):
+    session.expire_all()
+    return {a.account_id: a for a in Account.query.order_by(Account.id)}
+
+
+def test_inserts_accounts_details_and_history(session):
+    account_logic.upsert_accounts(
+        "u",
+        [
+            teller_account("chk", "100.10"),
+            teller_account("cc", 25.5, type="credit", name=None),
+        ],
+        "Teller",
+    )
+
+    stored = accounts(session)
+    assert stored["chk"].balance == Decimal("100.10")
+    # Liabilities are stored with the sign inverted.
+    assert stored["cc"].balance == Decimal("-25.50")
+    assert stored["cc"].name == "Unnamed Account"
+    assert {a.user_id for a in stored.values()} == {"u"}
+    assert {a.link_type for a in stored.values()} == {"Teller"}
+    assert stored["chk"].subtype == "Checking"
+    details = {d.account_id: d for d in AccountDetails.query}
+    assert details["chk"].enrollment_id == "enr-chk"
+    history = {(h.account_id, h.date): h.balance for h in AccountHistory.query}
+    assert history == {
+        ("chk", date.today()): Decimal("100.10"),
+        ("cc", date.today()): Decimal("-25.50"),
+    }
+
+
+def test_updates_existing_accounts_in_place(session):
+    account_logic.upsert_accounts("u", [teller_account("chk", 100)], "Teller")
+    first_id = accounts(session)["chk"].id
+
+    account_logic.upsert_accounts(
+        "u",
+        [teller_account("chk", 80, name="Renamed", enrollment_id="enr-2")],
+        "Teller",
+    )
+
+    stored = accounts(session)
+    assert list(stored) == ["chk"]
+    assert stored["chk"].id == first_id
+    assert (stored["chk"].name, stored["chk"].balance) == ("Renamed", Decimal("80.00"))
+    assert AccountDetails.query.one().enrollment_id == "enr-2"
+    # One history row per account and day: the first balance of the day stays.
+    assert [h.balance for h in AccountHistory.query] == [Decimal("100.00")]
+
+
+def test_mixed_batches(session):
+    account_logic.upsert_accounts(
+        "u", [teller_account(f"a{i}", i) for i in (1, 3)], "Teller"
+    )
+
+    account_logic.upsert_accounts(
+        "u",
+        [teller_account(f"a{i}", i * 10) for i in range(5)]
+        + [teller_account("a2", 999), {"name": "no id"}],
+        "Teller",
+        batch_size=2,
+    )
+
+    stored = accounts(session)
+    assert sorted(stored) == ["a0", "a1", "a2", "a3", "a4"]
+    # The first occurrence of a duplicated id wins.
+    assert [stored[f"a{i}"].balance for i in range(5)] == [
+        Decimal(i * 10) for i in range(5)
+    ]
+    assert AccountDetails.query.count() == 5
+    assert AccountHistory.query.count() == 5
+
+
+def test_statements_per_batch_do_not_grow_with_accounts(session, statements):
+    def statement_count(n, batch_size):
+        # New ids every time, so each batch does the same inserts.
+        statements.clear()
+        account_logic.upsert_accounts(
+            "u",
+            [teller_account(f"b{batch_size}-n{n}-{i}", i) for i in range(n)],
+            "Teller",
+            batch_size=batch_size,
+        )
+        return len(statements)
+
+    per_batch = statement_count(3, 100)
+    assert statement_count(40, 100) == per_batch
+    assert statement_count(40, 10) == 4 * per_batch
@@ -1,65 +1,148 @@
 // File: src/composables/useTransactions.js
-import { ref, computed, onMounted } from "vue";
+import { ref, reactive, computed, watch, onMounted } from "vue";
 import axios from "axios";
 
+// Columns the backend can sort on (indexed); other headers are not sortable
+export const SORT_KEYS = ["date", "amount", "category", "merchant_name"];
+
 export function useTransactions(pageSize = 15) {
   const transactions = ref([]);
   const searchQuery = ref("");
-  const sortKey = ref(null);
-  const sortOrder = ref(1);
+  // Sorting and filtering run on the server over every transaction
+  const sortKey = ref("date");
+  const sortOrder = ref(-1); // 1 = asc, -1 = desc
+  const filters = reactive({
+    start_date: "",
+    end_date: "",
+    account_id: "",
+    category: "",
+    merchant_name: "",
+    min_amount: "",
+    max_amount: "",
+    user_modified: "",
+  });
   const currentPage = ref(1);
   const totalPages = ref(1);
+  // Keyset cursors returned by the backend for the pages around this one
+  const nextCursor = ref(null);
+  const prevCursor = ref(null);
+
+  const setFilterParams = (params) => {
+    for (const [name, value] of Object.entries(filters)) {
+      if (value !== "" && value !== null) params.set(name, value);
+    }
+  };
 
-  const fetchTransactions = async () => {
+  const fetchTransactions = async (cursor = null, direction = "next") => {
     try {
-      const res = await axios.get(`/api/teller/transactions/get_transactions?page=${currentPage.value}&page_size=${pageSize}`);
+      const params = new URLSearchParams({
+        mode: "cursor",
+        page_size: pageSize,
+        direction,
+        include_total: "true",
+        sort: sortKey.value,
+        order: sortOrder.value === 1 ? "asc" : "desc",
+      });
+      setFilterParams(params);
+      if (cursor) params.set("cursor", cursor);
+      const res = await axios.get(`/api/teller/transactions/get_transactions?${params}`);
       if (res.data.status === "success") {
-        transactions.value = res.data.data.transactions;
-        totalPages.value = Math.ceil(res.data.data.total / pageSize);
+        const data = res.data.data;
+        transactions.value = data.transactions;
+        nextCursor.value = data.next_cursor;
+        prevCursor.value = data.prev_cursor;
+        totalPages.value = Math.max(1, Math.ceil(data.total / pageSize));
+        return true;
       }
     } catch (error) {
       console.error("Error fetching transactions:", error);
     }
+    return false;
   };
 
-  const changePage = (delta) => {
-    currentPage.value = Math.max(1, Math.min(currentPage.value + delta, totalPages.value));
-    fetchTransactions();
+  // Full-text search results are ranked, so they are paged by offset
+  const searchTransactions = async (page = 1) => {
+    try {
+      const params = new URLSearchParams({
+        q: searchQuery.value,
+        limit: pageSize,
+        offset: (page - 1) * pageSize,
+        include_total: "true",
+      });
+      setFilterParams(params);
+      const res = await axios.get(`/api/teller/transactions/search?${params}`);
+      if (res.data.status === "success") {
+        const data = res.data.data;
+        transactions.value = data.transactions;
+        totalPages.value = Math.max(1, Math.ceil(data.total / pageSize));
+        currentPage.value = page;
+        return true;
+      }
+    } catch (error) {
+      console.error("Error searching transactions:", error);
+    }
+    return false;
+  };
+
+  const isSearching = () => searchQuery.value.trim() !== "";
+
+  const changePage = async (delta) => {
+    if (isSearching()) {
+      const page = currentPage.value + Math.sign(delta);
+      if (page >= 1 && page <= totalPages.value) await searchTransactions(page);
+      return;
+    }
+    const cursor = delta > 0 ? nextCursor.value : prevCursor.value;
+    if (!cursor) return;
+    if (await fetchTransactions(cursor, delta > 0 ? "next" : "prev")) {
+      currentPage.value = Math.max(1, currentPage.value + Math.sign(delta));
+      if (!prevCursor.value) currentPage.value = 1;
+    }
+  };
+
+  // A new search, sort or filter set starts over from the first page
+  const reload = () => {
+    currentPage.value = 1;
+    return isSearching() ? searchTransactions() : fetchTransactions();
   };
 
   const setSort = (key) => {
+    if (!SORT_KEYS.includes(key)) return;
     if (sortKey.value === key) {
       sortOrder.value *= -1;
     } else {
       sortKey.value = key;
       sortOrder.value = 1;
     }
+    reload();
   };
 
-  const filteredTransactions = computed(() => {
-    let filtered = transactions.value.filter((tx) =>
-      Object.values(tx).some(val => val && val.toString().toLowerCase().includes(searchQuery.value.toLowerCase()))
-    );
-    if (sortKey.value) {
-      filtered.sort((a, b) => {
-        let valA = a[sortKey.value] || "";
-        let valB = b[sortKey.value] || "";
-        return valA.toString().localeCompare(valB.toString()) * sortOrder.value;
-      });
-    }
-    return filtered;
+  watch(filters, reload);
+
+  // Wait for a pause in typing before searching
+  let searchTimer = null;
+  watch(searchQuery, () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(reload, 250);
   });
 
-  onMounted(fetchTransactions);
+  // Rows already come back searched, filtered and sorted by the server
+  const filteredTransactions = computed(() => transactions.value);
+
+  onMounted(() => fetchTransactions());
 
   return {
     transactions,
     searchQuery,
     sortKey,
     sortOrder,
+    filters,
     currentPage,
     totalPages,
+    nextCursor,
+    prevCursor,
     fetchTransactions,
+    searchTransactions,
     changePage,
     setSort,
     filteredTransactions,